@@ -1,18 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-import random
-import requests
 import re
+import math
 import logging
-from models import db, User, Attendance, Seed, Medicine, Expense, Weather, Calendar, Contact
+import os
+from models import db, User, Attendance, Seed, Medicine, Expense, Weather, Calendar, Contact, Photo, PhotoUpload
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import func
+from db_config import init_database
+from pagination import list_response
+from serialization import json_response
+from migrations import upgrade
+from exports import export_response, parse_date_range, date_range_filters
+from batch import batch_create, batch_delete, batch_update, parse_ids
+from reports import SUMMARY_GROUPS, attendance_report, expense_summary
+from blocklist import create_blocklist
+from notifications import NotificationQueue
+from reminders import ReminderScheduler
+import otp_store
+from passwords import PasswordHasher
+from sync import sync_response
+from weather import WeatherError, WeatherService
+from diagnosis import DiagnosisEngine, DiagnosisError
+from photos import KINDS as PHOTO_KINDS, READY, OffsetMismatch, PhotoError, PhotoStore, photo_record
+import search
+from metrics import Metrics
+from ratelimit import RateLimiter
 
 
 logging.basicConfig(level=logging.INFO)
@@ -20,28 +38,69 @@ logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 
 
-# Configure SQLite database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///farmers_app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'your_secret_key'  # Replace with a secure key
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)  # Token expiration time
-db.init_app(app)
+# Where revoked tokens are stored; see blocklist.py for the supported URLs
+app.config['JWT_BLOCKLIST_URL'] = os.environ.get('JWT_BLOCKLIST_URL', 'memory://')
+# Configure the database (SQLite with WAL by default, see db_config.py)
+init_database(app, db)
 jwt = JWTManager(app)
 CORS(app)
 
-limiter = Limiter(get_remote_address, app=app)
-
-FAST2SMS_API_KEY = '0xoIc5HCCGiFECuCb2PB7DD1W9q66fLLGCZ4K8tOsEB8PQHnSiCnaIjZyFMr2EH8yPXvaIDZ0j35sk4f7CQwGeiWp1cL6oUqz9RtJxdOMnmlFbZ4OX8BGg6qitVMxhWHIo2TANJ31nbP'  # Replace with your Fast2SMS API key
-
-# Add this to store revoked tokens
-revoked_tokens = set()
+# Per-route latency, SQL and response metrics, served at /metrics
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 0))
+metrics = Metrics(app, db)
+
+# Number of reverse proxies in front of the app whose X-Forwarded-For is trusted, so that
+# request.remote_addr (and with it the per-IP rate limits) is the real client address
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
+# Per-user and per-IP limits for the auth, write and export routes; see ratelimit.py
+app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL', 'memory://')
+rate_limits = RateLimiter(app)
+
+app.config['SMS_API_KEY'] = '0xoIc5HCCGiFECuCb2PB7DD1W9q66fLLGCZ4K8tOsEB8PQHnSiCnaIjZyFMr2EH8yPXvaIDZ0j35sk4f7CQwGeiWp1cL6oUqz9RtJxdOMnmlFbZ4OX8BGg6qitVMxhWHIo2TANJ31nbP'  # Replace with your Fast2SMS API key
+app.config['SMS_GATEWAY_URL'] = os.environ.get('SMS_GATEWAY_URL', 'https://www.fast2sms.com/dev/bulkV2')
+app.config['SMS_BACKEND'] = os.environ.get('SMS_BACKEND', 'fast2sms')
+notification_queue = NotificationQueue(app)
+otps = otp_store.OTPStore(app)
+
+# SMS reminders for upcoming calendar events; off unless REMINDER_INTERVAL is set (e.g. 300)
+app.config['REMINDER_INTERVAL'] = int(os.environ.get('REMINDER_INTERVAL', 0))
+reminders = ReminderScheduler(app, notification_queue)
+
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+passwords = PasswordHasher(app)
+
+app.config['WEATHER_API_URL'] = os.environ.get('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/forecast')
+app.config['WEATHER_API_KEY'] = os.environ.get('WEATHER_API_KEY', '')  # OpenWeatherMap API key
+weather_service = WeatherService(app)
+
+# Crop disease model trained by database.py, loaded on first use
+app.config['DIAGNOSIS_MODEL_PATH'] = os.environ.get('DIAGNOSIS_MODEL_PATH', 'crop_disease_model.pth')
+app.config['DIAGNOSIS_THREADS'] = int(os.environ.get('DIAGNOSIS_THREADS', 0))
+app.config['DIAGNOSIS_MAX_IMAGE_BYTES'] = 10 * 1024 * 1024
+diagnosis_engine = DiagnosisEngine(app)
+
+# Photos attached to calendar events and expenses, uploaded in chunks; see photos.py
+app.config['PHOTO_DIR'] = os.environ.get('PHOTO_DIR', os.path.join(app.instance_path, 'photos'))
+app.config['PHOTO_WORKERS'] = int(os.environ.get('PHOTO_WORKERS', 2))
+photo_store = PhotoStore(app)
+
+# Revoked tokens are kept until they expire
+revoked_tokens = create_blocklist(app.config['JWT_BLOCKLIST_URL'])
 
 # Check if a token is revoked
 @jwt.token_in_blocklist_loader
 
 def check_if_token_revoked(jwt_header, jwt_payload):
     jti = jwt_payload['jti']
-    return jti in revoked_tokens
+    return revoked_tokens.is_revoked(jti)
 
 
 def is_valid_mobile_number(mobile_number):
@@ -50,6 +109,7 @@ def is_valid_mobile_number(mobile_number):
 
 # ---- User Authentication Endpoints ----
 @app.route('/register', methods=['POST'])
+@rate_limits.family('auth')
 def register():
     try:
         data = request.get_json()
@@ -68,7 +128,7 @@ def register():
             return jsonify({'message': 'User already exists'}), 400
 
         # Create a new user
-        hashed_password = generate_password_hash(password)  # Hash the password
+        hashed_password = passwords.hash(password)  # Hash the password
         new_user = User(username=username, mobile_number=mobile_number, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -82,20 +142,25 @@ def register():
 
 
 @app.route('/login', methods=['POST'])
+@rate_limits.family('auth')
 def login():
     data = request.get_json()
     username = data.get('username')  # Use username instead of mobile_number
     password = data.get('password')
 
     user = User.query.filter_by(username=username).first()  # Query by username
-    if user and check_password_hash(user.password, password):  # Verify the hashed password
+    if user and passwords.verify(user.password, password):  # Verify the hashed password
+        if passwords.needs_rehash(user.password):
+            # Upgrade hashes made with an older algorithm or cost
+            user.password = passwords.hash(password)
+            db.session.commit()
         access_token = create_access_token(identity=str(user.id))  # Convert user ID to string
         return jsonify({'message': 'Login successful', 'token': access_token}), 200
     return jsonify({'message': 'Invalid credentials'}), 401
 
 
 @app.route('/forgot-password', methods=['POST'])
-@limiter.limit("5 per minute")  # Allow 5 requests per minute
+@rate_limits.family('auth')
 def forgot_password():
     try:
         data = request.get_json()
@@ -108,58 +173,57 @@ def forgot_password():
             logging.error(f"Mobile number {mobile_number} not found in the database")
             return jsonify({'message': 'Mobile number not found'}), 404
 
-        # Generate a random OTP
-        otp = random.randint(100000, 999999)
-        logging.info(f"Generated OTP: {otp}")
-
-        # Send OTP via Fast2SMS
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        payload = {
-            'authorization': FAST2SMS_API_KEY,
-            'sender_id': 'FSTSMS',
-            'message': f'Your OTP for password reset is: {otp}',
-            'language': 'english',
-            'route': 'p',
-            'numbers': mobile_number
-        }
-        headers = {'cache-control': 'no-cache'}
-
-        response = requests.post(url, data=payload, headers=headers)
-        logging.info(f"Fast2SMS API response: {response.status_code}, {response.text}")
-
-        if response.status_code != 200:
-            logging.error("Failed to send OTP via Fast2SMS")
-            return jsonify({'message': 'Failed to send OTP'}), 500
-
-        # Save the OTP in the database
-        user.reset_otp = otp
-        db.session.commit()
-        logging.info("OTP saved in the database successfully")
+        # Generate a random OTP; only its hash is stored
+        otp = otps.issue(mobile_number)
 
-        return jsonify({'message': 'OTP sent to your mobile number'}), 200
+        # Send the OTP in the background so a slow SMS gateway doesn't hold up the request
+        notification_id = notification_queue.enqueue(mobile_number, f'Your OTP for password reset is: {otp}')
+
+        return jsonify({'message': 'OTP is being sent to your mobile number', 'notification_id': notification_id}), 202
 
     except Exception as e:
         logging.error(f"Error in forgot-password: {e}")
         return jsonify({'message': 'An error occurred while processing your request'}), 500
 
 
+@app.route('/forgot-password/status/<notification_id>', methods=['GET'])
+def otp_delivery_status(notification_id):
+    notification = notification_queue.status(notification_id)
+    if not notification:
+        return jsonify({'message': 'Notification not found'}), 404
+
+    return jsonify({
+        'id': notification.id,
+        'status': notification.status,
+        'attempts': notification.attempts,
+    }), 200
+
+
 @app.route('/verify-otp', methods=['POST'])
+@rate_limits.family('auth')
 def verify_otp():
     data = request.get_json()
     mobile_number = data.get('mobile_number')
     otp = data.get('otp')
     new_password = data.get('new_password')
 
-    # Check if the mobile number exists in the database
-    user = User.query.filter_by(mobile_number=mobile_number).first_or_404(description='Mobile number not found')
+    if not mobile_number or not otp or not new_password:
+        return jsonify({'message': 'Mobile number, OTP and new password are required'}), 400
 
-    # Verify the OTP
-    if user.reset_otp != otp:
+    # Verify the OTP; a valid OTP is consumed
+    result = otps.verify(mobile_number, otp)
+    if result == otp_store.EXPIRED:
+        return jsonify({'message': 'OTP has expired or was already used, please request a new one'}), 400
+    if result == otp_store.LOCKED:
+        return jsonify({'message': 'Too many invalid attempts, please request a new OTP'}), 429
+    if result != otp_store.VALID:
         return jsonify({'message': 'Invalid OTP'}), 400
 
+    # Check if the mobile number exists in the database
+    user = User.query.filter_by(mobile_number=mobile_number).first_or_404(description='Mobile number not found')
+
     # Update the user's password
-    user.password = generate_password_hash(new_password)
-    user.reset_otp = None  # Clear the OTP after successful verification
+    user.password = passwords.hash(new_password)
     db.session.commit()
 
     return jsonify({'message': 'Password reset successful'}), 200
@@ -168,8 +232,8 @@ def verify_otp():
 @jwt_required()
 def logout():
     try:
-        jti = get_jwt()['jti']  # Get the unique identifier for the token
-        revoked_tokens.add(jti)  # Add the token to the revoked list
+        token = get_jwt()
+        revoked_tokens.add(token['jti'], token['exp'])  # Revoke the token until it expires
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
         logging.error(f"Error during logout: {e}")
@@ -184,33 +248,38 @@ def protected_route():
 
 
 # ---- Attendance Endpoints ----
+ATTENDANCE_FIELDS = {
+    'id': Attendance.id,
+    'worker_name': Attendance.worker_name,
+    'attendance_date': Attendance.attendance_date,
+    'notes': Attendance.notes,
+}
+
+
+def parse_attendance(data):
+    worker_name = (data.get('worker_name') or '').strip()
+    if not worker_name:
+        raise ValueError('worker_name is required')
+    return {'worker_name': worker_name, 'attendance_date': datetime.utcnow()}
+
+
 @app.route('/attendance', methods=['GET', 'POST'])
 @jwt_required()
 def manage_attendance():
     user_id = get_jwt_identity()
 
     if request.method == 'GET':
-        # Fetch attendance records for the logged-in user
-        attendance_list = Attendance.query.filter_by(user_id=user_id).all()
-        return jsonify([{
-            'id': a.id,
-            'worker_name': a.worker_name,
-            'attendance_date': a.attendance_date.strftime('%Y-%m-%d'),
-            'notes': a.notes
-        } for a in attendance_list])
+        # Fetch a page of attendance records for the logged-in user
+        return list_response(Attendance, user_id, ATTENDANCE_FIELDS)
 
     elif request.method == 'POST':
-        data = request.get_json()
-        worker_name = data.get('worker_name', '').strip()
-        if not worker_name:
-            return jsonify({'error': 'worker_name is required'}), 400
+        try:
+            fields = parse_attendance(request.get_json())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         # Add attendance record for the logged-in user
-        new_attendance = Attendance(
-            worker_name=worker_name,
-            attendance_date=datetime.utcnow(),
-            user_id=user_id
-        )
+        new_attendance = Attendance(user_id=user_id, **fields)
         db.session.add(new_attendance)
         db.session.commit()
         return jsonify({'message': 'Attendance added successfully'}), 201
@@ -231,64 +300,126 @@ def get_attendance():
     ])
 
 
+@app.route('/attendance/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_attendance():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Attendance, user_id, data, parse_attendance)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return batch_delete(Attendance, user_id, ids)
+
+
+@app.route('/attendance/report', methods=['GET'])
+@jwt_required()
+def report_attendance():
+    month = request.args.get('month') or datetime.utcnow().strftime('%Y-%m')
+    try:
+        month = datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return jsonify({'message': 'Invalid month format. Use YYYY-MM.'}), 400
+
+    return jsonify(attendance_report(get_jwt_identity(), month.year, month.month)), 200
+
+
+@app.route('/attendance/export', methods=['GET'])
+@rate_limits.family('exports')
+@jwt_required()
+def export_attendance():
+    try:
+        start, end = parse_date_range()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    filters = date_range_filters(Attendance.attendance_date, start, end, is_datetime=True)
+    return export_response(Attendance, get_jwt_identity(), ATTENDANCE_FIELDS, filters, 'attendance')
+
+
 @app.route('/attendance/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_attendance(id):
     user_id = get_jwt_identity()
-    print(f"User ID: {user_id}, Attendance ID: {id}")  # Debug log
+    logging.debug(f"User ID: {user_id}, Attendance ID: {id}")
 
     attendance = Attendance.query.filter_by(id=id, user_id=user_id).first()
     if not attendance:
-        print("Attendance record not found")  # Debug log
+        logging.debug("Attendance record not found")
         return jsonify({'error': 'Attendance record not found'}), 404
 
     db.session.delete(attendance)
     db.session.commit()
-    print("Attendance record deleted successfully")  # Debug log
+    logging.debug("Attendance record deleted successfully")
     return jsonify({'message': 'Attendance record deleted successfully'}), 200
 
 
 # ---- Seeds Endpoints ----
+SEED_FIELDS = {
+    'id': Seed.id,
+    'name': Seed.name,
+    'price': Seed.price,
+    'quality': Seed.quality,
+    'vendor': Seed.vendor,
+    'vendor_url': Seed.vendor_url,
+}
+
+
+def parse_seed(data):
+    name = data.get('name')
+    price = data.get('price')
+    quality = data.get('quality')
+    vendor = data.get('vendor')
+    vendor_url = data.get('vendor_url')
+
+    if not name or not price or not quality or not vendor :
+        raise ValueError('All fields are required')
+    return {'name': name, 'price': price, 'quality': quality, 'vendor': vendor, 'vendor_url': vendor_url}
+
+
 @app.route('/seeds', methods=['GET', 'POST'])
 @jwt_required()
 def manage_seeds():
     user_id = get_jwt_identity()
 
     if request.method == 'GET':
-        # Fetch seeds for the logged-in user
-        seeds = Seed.query.filter_by(user_id=user_id).all()
-        seeds_list = [
-            {
-                'id': seed.id,
-                'name': seed.name,
-                'price': seed.price,
-                'quality': seed.quality,
-                'vendor': seed.vendor,
-                'vendor_url': seed.vendor_url,
-            }
-            for seed in seeds
-        ]
-        return jsonify(seeds_list), 200
+        # Fetch a page of seeds for the logged-in user
+        return list_response(Seed, user_id, SEED_FIELDS)
 
     elif request.method == 'POST':
-        data = request.get_json()
-        name = data.get('name')
-        price = data.get('price')
-        quality = data.get('quality')
-        vendor = data.get('vendor')
-        vendor_url = data.get('vendor_url')
-
-        if not name or not price or not quality or not vendor :
-            return jsonify({'message': 'All fields are required'}), 400
+        try:
+            fields = parse_seed(request.get_json())
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         # Add seed record for the logged-in user
-        new_seed = Seed(name=name, price=price, quality=quality, vendor=vendor, vendor_url=vendor_url, user_id=user_id)
+        new_seed = Seed(user_id=user_id, **fields)
         db.session.add(new_seed)
         db.session.commit()
 
         return jsonify({'message': 'Seed added successfully'}), 201
 
 
+@app.route('/seeds/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_seeds():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Seed, user_id, data, parse_seed)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return batch_delete(Seed, user_id, ids)
+
+
 @app.route('/seeds/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_seed(id):
@@ -306,45 +437,105 @@ def delete_seed(id):
 
 
 # ---- Expenses Endpoints ----
+EXPENSE_FIELDS = {
+    'id': Expense.id,
+    'name': Expense.name,
+    'amount': Expense.amount,
+    'date': Expense.date,
+    'category': Expense.category,
+    'settled': Expense.settled,
+}
+
+
+def parse_expense(data):
+    name = data.get('name')
+    amount = data.get('amount')
+    date = data.get('date')
+    category = data.get('category')
+
+    if not name or not amount or not date:
+        raise ValueError('Name, amount, and date are required')
+    try:
+        # Numeric strings such as "100" are accepted, as the mobile app sends them
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError('Amount must be a number')
+    if not math.isfinite(amount):
+        raise ValueError('Amount must be a number')
+    try:
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    return {'name': name, 'amount': amount, 'date': date, 'category': category}
+
+
 @app.route('/expenses', methods=['GET', 'POST'])
 @jwt_required()
 def manage_expenses():
     user_id = get_jwt_identity()
 
     if request.method == 'GET':
-        # Fetch expenses for the logged-in user
-        expenses = Expense.query.filter_by(user_id=user_id).all()
-        expenses_list = [
-            {
-                'id': expense.id,
-                'name': expense.name,
-                'amount': expense.amount,
-                'date': expense.date.strftime('%Y-%m-%d'),
-                'category': expense.category,
-                'settled': expense.settled,
-            }
-            for expense in expenses
-        ]
-        return jsonify(expenses_list), 200
+        # Fetch a page of expenses for the logged-in user
+        return list_response(Expense, user_id, EXPENSE_FIELDS)
 
     elif request.method == 'POST':
-        data = request.get_json()
-        name = data.get('name')
-        amount = data.get('amount')
-        date = data.get('date')
-        category = data.get('category')
-
-        if not name or not amount or not date:
-            return jsonify({'message': 'Name, amount, and date are required'}), 400
+        try:
+            fields = parse_expense(request.get_json())
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         # Add expense record for the logged-in user
-        new_expense = Expense(name=name, amount=amount, date=datetime.strptime(date, '%Y-%m-%d'), category=category, user_id=user_id)
+        new_expense = Expense(user_id=user_id, **fields)
         db.session.add(new_expense)
         db.session.commit()
 
         return jsonify({'message': 'Expense added successfully'}), 201
 
 
+@app.route('/expenses/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_expenses():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Expense, user_id, data, parse_expense)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return batch_delete(Expense, user_id, ids)
+
+
+@app.route('/expenses/summary', methods=['GET'])
+@jwt_required()
+def summarize_expenses():
+    group_by = request.args.get('group_by', 'category')
+    if group_by not in SUMMARY_GROUPS:
+        return jsonify({'message': f"group_by must be one of: {', '.join(SUMMARY_GROUPS)}"}), 400
+
+    try:
+        start, end = parse_date_range()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    return jsonify(expense_summary(get_jwt_identity(), group_by, start, end)), 200
+
+
+@app.route('/expenses/export', methods=['GET'])
+@rate_limits.family('exports')
+@jwt_required()
+def export_expenses():
+    try:
+        start, end = parse_date_range()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    filters = date_range_filters(Expense.date, start, end)
+    return export_response(Expense, get_jwt_identity(), EXPENSE_FIELDS, filters, 'expenses')
+
+
 @app.route('/expenses/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_expense(id):
@@ -365,6 +556,17 @@ def delete_expense(id):
 @jwt_required()
 def settle_expense():
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Request body must be a JSON object'}), 400
+
+    # Settle several expenses at once when a list of ids is given
+    if 'ids' in data:
+        try:
+            ids = parse_ids(data)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        return batch_update(Expense, get_jwt_identity(), ids, {'settled': True})
+
     expense_id = data.get('id')
     if not expense_id:
         return jsonify({'message': 'Expense ID is required'}), 400
@@ -379,44 +581,65 @@ def settle_expense():
 
 
 # ---- Medicines Endpoints ----
+MEDICINE_FIELDS = {
+    'id': Medicine.id,
+    'name': Medicine.name,
+    'quantity': Medicine.quantity,
+    'vendor': Medicine.vendor,
+    'vendor_url': Medicine.vendor_url,
+}
+
+
+def parse_medicine(data):
+    name = data.get('name')
+    quantity = data.get('quantity')
+    vendor = data.get('vendor')
+    vendor_url = data.get('vendor_url')
+
+    if not name or not quantity or not vendor :
+        raise ValueError('All fields are required')
+    return {'name': name, 'quantity': quantity, 'vendor': vendor, 'vendor_url': vendor_url}
+
+
 @app.route('/medicines', methods=['GET', 'POST'])
 @jwt_required()
 def manage_medicines():
     user_id = get_jwt_identity()
 
     if request.method == 'GET':
-        # Fetch medicines for the logged-in user
-        medicines = Medicine.query.filter_by(user_id=user_id).all()
-        medicines_list = [
-            {
-                'id': medicine.id,
-                'name': medicine.name,
-                'quantity': medicine.quantity,
-                'vendor': medicine.vendor,
-                'vendor_url': medicine.vendor_url,
-            }
-            for medicine in medicines
-        ]
-        return jsonify(medicines_list), 200
+        # Fetch a page of medicines for the logged-in user
+        return list_response(Medicine, user_id, MEDICINE_FIELDS)
 
     elif request.method == 'POST':
-        data = request.get_json()
-        name = data.get('name')
-        quantity = data.get('quantity')
-        vendor = data.get('vendor')
-        vendor_url = data.get('vendor_url')
-
-        if not name or not quantity or not vendor :
-            return jsonify({'message': 'All fields are required'}), 400
+        try:
+            fields = parse_medicine(request.get_json())
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         # Add medicine record for the logged-in user
-        new_medicine = Medicine(name=name, quantity=quantity, vendor=vendor, vendor_url=vendor_url, user_id=user_id)
+        new_medicine = Medicine(user_id=user_id, **fields)
         db.session.add(new_medicine)
         db.session.commit()
 
         return jsonify({'message': 'Medicine added successfully'}), 201
 
 
+@app.route('/medicines/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_medicines():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Medicine, user_id, data, parse_medicine)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return batch_delete(Medicine, user_id, ids)
+
+
 @app.route('/medicines/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_medicine(id):
@@ -434,6 +657,27 @@ def delete_medicine(id):
 
 
 # ---- Calendar Endpoints ----
+CALENDAR_FIELDS = {
+    'id': Calendar.id,
+    'date': Calendar.date,
+    'description': Calendar.description,
+}
+
+
+def parse_calendar_event(data):
+    date_str = data.get('date')
+    description = data.get('description')
+
+    if not date_str or not description:
+        raise ValueError('Date and description are required')
+    try:
+        # Convert the date string to a Python date object
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    return {'date': date, 'description': description}
+
+
 @app.route('/calendar', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @jwt_required()
 def manage_calendar():
@@ -441,35 +685,23 @@ def manage_calendar():
 
     if request.method == 'POST':
         # Add a new calendar event
-        data = request.get_json()
-        date_str = data.get('date')
-        description = data.get('description')
-
-        if not date_str or not description:
-            return jsonify({'message': 'Date and description are required'}), 400
-
         try:
-            # Convert the date string to a Python date object
-            date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+            fields = parse_calendar_event(request.get_json())
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
-        new_event = Calendar(date=date, description=description, user_id=user_id)
+        new_event = Calendar(user_id=user_id, **fields)
         db.session.add(new_event)
         db.session.commit()
         return jsonify({'message': 'Calendar event added successfully'}), 201
 
     elif request.method == 'GET':
-        # Fetch calendar events for the logged-in user
-        events = Calendar.query.filter_by(user_id=user_id).all()
-        return jsonify([
-            {
-                'id': event.id,
-                'date': event.date.strftime('%Y-%m-%d'),
-                'description': event.description
-            }
-            for event in events
-        ]), 200
+        # Fetch a page of calendar events for the logged-in user, optionally only those dated from/to
+        try:
+            start, end = parse_date_range()
+        except ValueError:
+            return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+        return list_response(Calendar, user_id, CALENDAR_FIELDS, date_range_filters(Calendar.date, start, end))
 
     elif request.method == 'PUT':
         # Update an existing calendar event
@@ -491,6 +723,9 @@ def manage_calendar():
         if not event:
             return jsonify({'message': 'Calendar event not found'}), 404
 
+        if event.date != date:
+            # Remind again about the new date
+            event.reminded_at = None
         event.date = date
         event.description = description
         db.session.commit()
@@ -513,6 +748,22 @@ def manage_calendar():
         return jsonify({'message': 'Calendar event deleted successfully'}), 200
 
 
+@app.route('/calendar/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_calendar():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Calendar, user_id, data, parse_calendar_event)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return batch_delete(Calendar, user_id, ids)
+
+
 @app.route('/calendar', methods=['DELETE'])
 @jwt_required()
 def delete_calendar_event():
@@ -533,42 +784,63 @@ def delete_calendar_event():
 
 
 # ---- Contacts Endpoints ----
+CONTACT_FIELDS = {
+    'id': Contact.id,
+    'name': Contact.name,
+    'phone_number': Contact.phone_number,
+    'email': Contact.email,
+}
+
+
+def parse_contact(data):
+    name = data.get('name')
+    phone_number = data.get('phone_number')
+    email = data.get('email')
+
+    if not name or not phone_number:
+        raise ValueError('Name and phone number are required')
+    return {'name': name, 'phone_number': phone_number, 'email': email}
+
+
 @app.route('/contacts', methods=['GET', 'POST'])
 @jwt_required()
 def manage_contacts():
     user_id = get_jwt_identity()
 
     if request.method == 'GET':
-        # Fetch contacts for the logged-in user
-        contacts = Contact.query.filter_by(user_id=user_id).all()
-        contacts_list = [
-            {
-                'id': contact.id,
-                'name': contact.name,
-                'phone_number': contact.phone_number,
-                'email': contact.email,
-            }
-            for contact in contacts
-        ]
-        return jsonify(contacts_list), 200
+        # Fetch a page of contacts for the logged-in user
+        return list_response(Contact, user_id, CONTACT_FIELDS)
 
     elif request.method == 'POST':
-        data = request.get_json()
-        name = data.get('name')
-        phone_number = data.get('phone_number')
-        email = data.get('email')
-
-        if not name or not phone_number:
-            return jsonify({'message': 'Name and phone number are required'}), 400
+        try:
+            fields = parse_contact(request.get_json())
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         # Add contact record for the logged-in user
-        new_contact = Contact(name=name, phone_number=phone_number, email=email, user_id=user_id)
+        new_contact = Contact(user_id=user_id, **fields)
         db.session.add(new_contact)
         db.session.commit()
 
         return jsonify({'message': 'Contact added successfully'}), 201
 
 
+@app.route('/contacts/batch', methods=['POST', 'DELETE'])
+@jwt_required()
+def batch_contacts():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if request.method == 'POST':
+        return batch_create(Contact, user_id, data, parse_contact)
+
+    try:
+        ids = parse_ids(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return batch_delete(Contact, user_id, ids)
+
+
 @app.route('/contacts/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_contact(id):
@@ -585,8 +857,191 @@ def delete_contact(id):
     return jsonify({'message': 'Contact deleted successfully'}), 200
 
 
+# ---- Weather Endpoint ----
+@app.route('/weather', methods=['GET'])
+@jwt_required()
+def get_weather():
+    location = request.args.get('location', '').strip()
+    if not location:
+        return jsonify({'message': 'location is required'}), 400
+
+    try:
+        return jsonify(weather_service.forecast(location)), 200
+    except WeatherError as e:
+        return jsonify({'message': str(e)}), e.status
+
+
+# ---- Diagnosis Endpoint ----
+@app.route('/diagnose', methods=['POST'])
+@rate_limits.family('diagnose')
+@jwt_required()
+def diagnose():
+    # The leaf photo comes as an 'image' form file or as the raw request body. The body is read
+    # through a stream that stops one byte past the limit (and fails if read further), so
+    # chunked uploads without a Content-Length are capped as well
+    limit = app.config['DIAGNOSIS_MAX_IMAGE_BYTES']
+    request.max_content_length = limit + 1
+    try:
+        upload = request.files.get('image')
+        data = upload.read() if upload else request.get_data()
+    except RequestEntityTooLarge:
+        return jsonify({'message': 'Image is too large'}), 413
+    if len(data) > limit:
+        return jsonify({'message': 'Image is too large'}), 413
+    if not data:
+        return jsonify({'message': 'image is required'}), 400
+
+    try:
+        return jsonify(diagnosis_engine.diagnose(data)), 200
+    except DiagnosisError as e:
+        return jsonify({'message': str(e)}), e.status
+
+
+# ---- Photo Endpoints ----
+def upload_status(upload):
+    return {'upload_id': upload.id, 'offset': upload.received, 'size': upload.size,
+            'chunk_size': app.config['PHOTO_CHUNK_BYTES']}
+
+
+@app.route('/photos/uploads', methods=['POST'])
+@jwt_required()
+def start_photo_upload():
+    # The bytes follow in PUT requests, unless the user already uploaded a photo with this sha256
+    try:
+        upload, photo = photo_store.create_upload(get_jwt_identity(), request.get_json(silent=True) or {})
+    except PhotoError as e:
+        return jsonify({'message': str(e)}), e.status
+    if photo:
+        return jsonify({'photo': photo_record(photo), 'duplicate': True}), 200
+    return jsonify(upload_status(upload)), 201
+
+
+@app.route('/photos/uploads/<upload_id>', methods=['GET', 'PUT'])
+@rate_limits.family('uploads')
+@jwt_required()
+def photo_upload(upload_id):
+    upload = PhotoUpload.query.filter_by(id=upload_id, user_id=get_jwt_identity()).first()
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    if request.method == 'GET':
+        # Where to resume an interrupted upload
+        return jsonify(upload_status(upload)), 200
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'message': 'Upload-Offset header is required'}), 400
+    try:
+        # The body is read straight from the socket into the file
+        photo = photo_store.write_chunk(upload, offset, request.stream, request.content_length)
+    except OffsetMismatch as e:
+        return jsonify({'message': str(e), 'offset': e.offset}), e.status
+    except PhotoError as e:
+        return jsonify({'message': str(e)}), e.status
+    if photo:
+        return jsonify({'photo': photo_record(photo)}), 201
+    return jsonify(upload_status(upload)), 200
+
+
+@app.route('/photos', methods=['GET'])
+@jwt_required()
+def list_photos():
+    # Photos attached to one calendar event or expense
+    filters = {}
+    for name in ('calendar_id', 'expense_id'):
+        if request.args.get(name):
+            try:
+                filters[name] = int(request.args[name])
+            except ValueError:
+                return jsonify({'message': f'{name} must be an integer'}), 400
+    if len(filters) != 1:
+        return jsonify({'message': 'Exactly one of calendar_id and expense_id is required'}), 400
+
+    photos = Photo.query.filter_by(user_id=get_jwt_identity(), **filters).order_by(Photo.id).all()
+    return jsonify([photo_record(photo) for photo in photos]), 200
+
+
+@app.route('/photos/<int:id>/<kind>', methods=['GET'])
+@jwt_required()
+def get_photo_file(id, kind):
+    # kind is original, thumbnail or input (the 224x224 image the diagnosis model takes)
+    if kind not in PHOTO_KINDS:
+        return jsonify({'message': 'Not found'}), 404
+    photo = Photo.query.filter_by(id=id, user_id=get_jwt_identity()).first()
+    if not photo:
+        return jsonify({'message': 'Photo not found'}), 404
+    if kind != 'original' and photo.status != READY:
+        return jsonify({'message': f'Photo is {photo.status}'}), 409
+
+    mimetype = {'original': photo.content_type or 'application/octet-stream',
+                'thumbnail': 'image/jpeg', 'input': 'image/png'}[kind]
+    return send_file(photo_store.path(kind, photo.sha256), mimetype=mimetype, max_age=86400)
+
+
+@app.route('/photos/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_photo(id):
+    photo = Photo.query.filter_by(id=id, user_id=get_jwt_identity()).first()
+    if not photo:
+        return jsonify({'message': 'Photo not found'}), 404
+    photo_store.delete(photo)
+    return jsonify({'message': 'Photo deleted successfully'}), 200
+
+
+# ---- Search Endpoint ----
+SEARCH_COLLECTIONS = {
+    'attendance': (Attendance, ATTENDANCE_FIELDS),
+    'seeds': (Seed, SEED_FIELDS),
+    'medicines': (Medicine, MEDICINE_FIELDS),
+    'calendar': (Calendar, CALENDAR_FIELDS),
+    'contacts': (Contact, CONTACT_FIELDS),
+}
+
+
+@app.route('/search', methods=['GET'])
+@jwt_required()
+def search_records():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'q is required'}), 400
+
+    try:
+        limit = int(request.args.get('limit', search.DEFAULT_RESULTS))
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, search.MAX_RESULTS))
+
+    return json_response(search.search(get_jwt_identity(), query, SEARCH_COLLECTIONS, limit))
+
+
+# ---- Sync Endpoint ----
+SYNC_COLLECTIONS = {
+    'attendance': (Attendance, ATTENDANCE_FIELDS),
+    'seeds': (Seed, SEED_FIELDS),
+    'expenses': (Expense, EXPENSE_FIELDS),
+    'medicines': (Medicine, MEDICINE_FIELDS),
+    'calendar': (Calendar, CALENDAR_FIELDS),
+    'contacts': (Contact, CONTACT_FIELDS),
+}
+
+
+@app.route('/sync', methods=['GET'])
+@jwt_required()
+def sync():
+    # Return every record created, updated or deleted since the client's last sync token
+    return sync_response(get_jwt_identity(), SYNC_COLLECTIONS)
+
+
+# ---- Metrics Endpoint ----
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus scrape target; not behind JWT, so restrict access at the proxy
+    return metrics.response()
+
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade(db.engine)
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -0,0 +1,99 @@
+from flask import jsonify
+
+from models import db
+
+# Largest number of items accepted by a single batch request
+MAX_BATCH_SIZE = 500
+
+
+def _check_size(items, name):
+    if not isinstance(items, list) or not items:
+        return f'{name} must be a non-empty list'
+    if len(items) > MAX_BATCH_SIZE:
+        return f'At most {MAX_BATCH_SIZE} {name} are allowed per batch'
+    return None
+
+
+def _body(data):
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    return data
+
+
+def parse_ids(data):
+    """Return the list of integer ids in a batch request body."""
+    ids = _body(data).get('ids')
+    error = _check_size(ids, 'ids')
+    if error:
+        raise ValueError(error)
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError('ids must be integers')
+    return ids
+
+
+def batch_create(model, user_id, data, parse):
+    """Validate every item of the request body with `parse` and insert them in one transaction.
+
+    `parse` turns a request item into column values or raises ValueError.
+    If any item is invalid nothing is inserted and the per-item errors are
+    returned instead. The rows go through a single unit-of-work flush, which
+    SQLAlchemy batches into multi-row INSERTs while still firing the session
+    events that keep derived tables (e.g. expense rollups) in step.
+    """
+    try:
+        items = _body(data).get('items')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    error = _check_size(items, 'items')
+    if error:
+        return jsonify({'message': error}), 400
+
+    records = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Each item must be an object')
+            fields = parse(item)
+        except ValueError as e:
+            errors.append({'index': index, 'status': 'invalid', 'message': str(e)})
+            continue
+        records.append(model(user_id=user_id, **fields))
+
+    if errors:
+        return jsonify({'message': 'Batch rejected, no records were added', 'results': errors}), 400
+
+    db.session.add_all(records)
+    db.session.flush()
+    results = [{'index': i, 'status': 'created', 'id': r.id} for i, r in enumerate(records)]
+    db.session.commit()
+    return jsonify({'message': f'{len(records)} records added successfully', 'results': results}), 201
+
+
+def _owned(model, user_id, ids):
+    return model.query.filter(model.user_id == user_id, model.id.in_(ids)).all()
+
+
+def _results(ids, found, status):
+    return [{'id': i, 'status': status if i in found else 'not_found'} for i in ids]
+
+
+def batch_update(model, user_id, ids, values):
+    """Apply `values` to every listed row owned by `user_id` in one transaction."""
+    records = _owned(model, user_id, ids)
+    found = {record.id for record in records}
+    for record in records:
+        for name, value in values.items():
+            setattr(record, name, value)
+    db.session.commit()
+    return jsonify({'message': f'{len(found)} records updated', 'results': _results(ids, found, 'updated')}), 200
+
+
+def batch_delete(model, user_id, ids):
+    """Delete every listed row owned by `user_id` in one transaction."""
+    records = _owned(model, user_id, ids)
+    found = {record.id for record in records}
+    for record in records:
+        db.session.delete(record)
+    db.session.commit()
+    return jsonify({'message': f'{len(found)} records deleted', 'results': _results(ids, found, 'deleted')}), 200
@@ -0,0 +1,62 @@
+"""Rows/sec for single-row POST /attendance versus POST /attendance/batch.
+
+Runs the Flask app in-process against a temporary SQLite database.
+
+    python benchmarks/bench_batch.py [rows]   (default: 2000)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['RATELIMIT_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from flask_jwt_extended import create_access_token
+
+from app import app, db, User
+from batch import MAX_BATCH_SIZE
+
+
+def setup():
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password='x', security_question='q', security_answer='a')
+        db.session.add(user)
+        db.session.commit()
+        return {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+
+def single_rows(client, headers, rows):
+    t0 = time.perf_counter()
+    for i in range(rows):
+        client.post('/attendance', json={'worker_name': f'worker{i}'}, headers=headers)
+    return time.perf_counter() - t0
+
+
+def batched_rows(client, headers, rows):
+    t0 = time.perf_counter()
+    for start in range(0, rows, MAX_BATCH_SIZE):
+        items = [{'worker_name': f'worker{i}'} for i in range(start, min(rows, start + MAX_BATCH_SIZE))]
+        client.post('/attendance/batch', json={'items': items}, headers=headers)
+    return time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    headers = setup()
+    client = app.test_client()
+    single = single_rows(client, headers, rows)
+    batched = batched_rows(client, headers, rows)
+    print(json.dumps({
+        'rows': rows,
+        'single_rows_per_sec': round(rows / single),
+        'batch_rows_per_sec': round(rows / batched),
+        'speedup': round(single / batched, 1),
+    }))
@@ -0,0 +1,59 @@
+"""Lookup cost of each blocklist backend with N revoked tokens.
+
+    python benchmarks/bench_blocklist.py [tokens] [redis-url]   (default: 1000000)
+
+The Redis backend is only measured when a URL is given.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blocklist import MemoryBlocklist, RedisBlocklist, SQLiteBlocklist
+
+LOOKUPS = 100_000
+
+
+def fill(blocklist, jtis, expires_at):
+    if isinstance(blocklist, SQLiteBlocklist):
+        # Seed in one transaction; add() commits per token like a real logout
+        with blocklist._connect() as conn:
+            conn.executemany('INSERT INTO revoked_token (jti, expires_at) VALUES (?, ?)',
+                             ((jti, expires_at) for jti in jtis))
+    else:
+        for jti in jtis:
+            blocklist.add(jti, expires_at)
+
+
+def measure(blocklist, jtis):
+    probes = [jtis[i * 7 % len(jtis)] if i % 2 else str(uuid.uuid4()) for i in range(LOOKUPS)]
+    t0 = time.perf_counter()
+    for jti in probes:
+        blocklist.is_revoked(jti)
+    elapsed = time.perf_counter() - t0
+    return {'lookups_per_sec': round(LOOKUPS / elapsed), 'us_per_lookup': round(elapsed / LOOKUPS * 1e6, 2)}
+
+
+if __name__ == '__main__':
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    jtis = [str(uuid.uuid4()) for _ in range(tokens)]
+    expires_at = time.time() + 3600
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            'memory': MemoryBlocklist(),
+            'sqlite': SQLiteBlocklist(os.path.join(tmp, 'blocklist.db')),
+        }
+        if len(sys.argv) > 2:
+            backends['redis'] = RedisBlocklist(sys.argv[2])
+
+        for name, blocklist in backends.items():
+            t0 = time.perf_counter()
+            fill(blocklist, jtis, expires_at)
+            result = {'backend': name, 'tokens': tokens, 'fill_sec': round(time.perf_counter() - t0, 2)}
+            result.update(measure(blocklist, jtis))
+            print(json.dumps(result))
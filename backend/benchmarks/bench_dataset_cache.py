@@ -0,0 +1,77 @@
+"""Epoch time of the training data pipeline: ImageFolder decoding vs the dataset cache.
+
+A synthetic ImageFolder of 1024x768 JPEG photos (CLASSES sub-directories)
+is read for EPOCHS epochs in batches of 32, the way database.py feeds the
+model, without running the model itself:
+
+    imagefolder   ImageFolder + Resize((224, 224)) + ToTensor, single process (the old path)
+    cache         CachedImageDataset + to_float, with 0 and several loader workers
+
+The one-off cost of building the cache is reported separately.
+
+    python benchmarks/bench_dataset_cache.py [images] [epochs]   (default: 600 3)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+from torch.utils.data import DataLoader
+from torchvision.datasets import ImageFolder
+
+from dataset_cache import CachedImageDataset, make_loader, prepare_dataset, to_float
+
+CLASSES = 4
+BATCH_SIZE = 32
+
+
+def make_image_folder(root, count):
+    torch.manual_seed(0)
+    for i in range(count):
+        directory = os.path.join(root, f'class_{i % CLASSES}')
+        os.makedirs(directory, exist_ok=True)
+        pixels = torch.randint(0, 256, (768, 1024, 3), dtype=torch.uint8).numpy()
+        Image.fromarray(pixels).save(os.path.join(directory, f'{i}.jpg'), quality=85)
+
+
+def measure(name, loader, epochs, convert=None, **labels):
+    times = []
+    for _ in range(epochs):
+        t0 = time.perf_counter()
+        count = 0
+        for images, _ in loader:
+            if convert:
+                images = convert(images)
+            count += len(images)
+        times.append(time.perf_counter() - t0)
+    print(json.dumps({'path': name, **labels, 'first_epoch_s': round(times[0], 2),
+                      'epoch_s': round(min(times), 2), 'images_per_sec': round(count / min(times))}))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    epochs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_root = os.path.join(tmp, 'images')
+        make_image_folder(image_root, count)
+
+        transform = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+        folder = ImageFolder(root=image_root, transform=transform)
+        measure('imagefolder', DataLoader(folder, batch_size=BATCH_SIZE, shuffle=True), epochs, workers=0)
+
+        t0 = time.perf_counter()
+        cache_dir = prepare_dataset(image_root, os.path.join(tmp, 'cache'))
+        print(json.dumps({'path': 'cache', 'prepare_s': round(time.perf_counter() - t0, 2),
+                          'cache_mb': round(os.path.getsize(os.path.join(cache_dir, 'images.u8')) / 2**20)}))
+
+        dataset = CachedImageDataset(cache_dir)
+        for workers in sorted({0, 2, min(4, os.cpu_count() or 1)}):
+            loader = make_loader(dataset, batch_size=BATCH_SIZE, shuffle=True, workers=workers)
+            measure('cache', loader, epochs, convert=to_float, workers=workers)
@@ -0,0 +1,94 @@
+"""Images/sec and latency of DiagnosisEngine on CPU for several batching settings.
+
+A ResNet-18 with random weights stands in for the trained model (same
+architecture as database.py, so the same cost per image). CLIENTS threads
+each submit IMAGES synthetic 1024x768 JPEG photos, like concurrent /diagnose
+requests, for every (max batch, max wait) setting and intra-op thread count.
+
+    python benchmarks/bench_diagnose.py [clients] [images-per-client]   (default: 16 8)
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from flask import Flask
+from PIL import Image
+from torchvision import models
+
+from diagnosis import DiagnosisEngine
+
+CLASSES = [f'disease_{i}' for i in range(10)]
+# (max batch, max wait ms); a batch of 1 is the unbatched baseline
+BATCHING = ((1, 0), (4, 5), (8, 10), (16, 20))
+
+
+def make_photos(count):
+    torch.manual_seed(0)
+    photos = []
+    for _ in range(count):
+        pixels = torch.randint(0, 256, (768, 1024, 3), dtype=torch.uint8).numpy()
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def make_engine(model_path, classes_path, max_batch, max_wait_ms, threads):
+    app = Flask(__name__)
+    app.config.update(DIAGNOSIS_MODEL_PATH=model_path, DIAGNOSIS_CLASSES_PATH=classes_path,
+                      DIAGNOSIS_MAX_BATCH=max_batch, DIAGNOSIS_MAX_WAIT_MS=max_wait_ms,
+                      DIAGNOSIS_THREADS=threads)
+    engine = DiagnosisEngine(app)
+    engine._ensure_loaded()
+    return engine
+
+
+def measure(engine, photos, clients, per_client):
+    engine.diagnose(photos[0])  # Warm up
+
+    def client(worker):
+        latencies = []
+        for i in range(per_client):
+            start = time.perf_counter()
+            engine.diagnose(photos[(worker + i) % len(photos)])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = sorted(latency for result in executor.map(client, range(clients)) for latency in result)
+    elapsed = time.perf_counter() - t0
+    return {
+        'images_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+    }
+
+
+if __name__ == '__main__':
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    photos = make_photos(16)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.pth')
+        classes_path = os.path.join(tmp, 'classes.json')
+        model = models.resnet18(weights=None)
+        model.fc = torch.nn.Linear(model.fc.in_features, len(CLASSES))
+        torch.save(model, model_path)
+        with open(classes_path, 'w') as f:
+            json.dump(CLASSES, f)
+
+        for threads in sorted({1, os.cpu_count()}):
+            for max_batch, max_wait_ms in BATCHING:
+                engine = make_engine(model_path, classes_path, max_batch, max_wait_ms, threads)
+                result = measure(engine, photos, clients, per_client)
+                print(json.dumps({'threads': threads, 'max_batch': max_batch, 'max_wait_ms': max_wait_ms,
+                                  'clients': clients, **result}))
@@ -0,0 +1,101 @@
+"""List and lookup latency with and without the 0001 per-user indexes.
+
+Seeds a temporary SQLite database with N attendance and expense rows spread
+over a fixed number of users, times the queries behind the list endpoints
+and the mobile-number lookup, then applies the migration and times them again.
+
+    python benchmarks/bench_indexes.py [rows ...]   (default: 10000 100000 1000000)
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+import migrations
+from models import db
+
+USERS = 1000
+REPEAT = 200
+
+QUERIES = {
+    'attendance_page': (
+        'SELECT id, worker_name, attendance_date, notes FROM attendance '
+        'WHERE user_id = :user_id ORDER BY id LIMIT 100'
+    ),
+    'expense_month': (
+        'SELECT id, name, amount, date FROM expense '
+        "WHERE user_id = :user_id AND date BETWEEN '2024-03-01' AND '2024-03-31'"
+    ),
+    'user_by_mobile': 'SELECT id FROM "user" WHERE mobile_number = :mobile',
+}
+
+
+def seed(engine, rows):
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            'INSERT INTO "user" (id, username, password, security_question, security_answer, mobile_number) '
+            "VALUES (:id, :username, 'x', 'q', 'a', :mobile)"
+        ), [{'id': u, 'username': f'user{u}', 'mobile': f'+91{9000000000 + u}'} for u in range(1, USERS + 1)])
+        conn.execute(text(
+            'INSERT INTO attendance (worker_name, attendance_date, user_id) VALUES (:w, :d, :u)'
+        ), [{'w': f'worker{i % 60}', 'd': start + timedelta(minutes=i), 'u': random.randint(1, USERS)}
+            for i in range(rows)])
+        conn.execute(text(
+            'INSERT INTO expense (name, amount, date, category, settled, user_id) '
+            "VALUES ('diesel', :a, :d, 'fuel', 0, :u)"
+        ), [{'a': random.random() * 1000, 'd': date(2024, 1, 1) + timedelta(days=i % 365),
+             'u': random.randint(1, USERS)} for i in range(rows)])
+
+
+def measure(engine):
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            timings = []
+            for _ in range(REPEAT):
+                user = random.randint(1, USERS)
+                params = {'user_id': user, 'mobile': f'+91{9000000000 + user}'}
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append(time.perf_counter() - t0)
+            timings.sort()
+            results[name] = {
+                'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+                'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 3),
+            }
+    return results
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db.metadata.create_all(engine)
+        # Start from the pre-migration schema, keeping an unindexed
+        # mobile_number column so the lookup can be timed before and after
+        migrations.upgrade(engine)
+        migrations.downgrade(engine)
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE "user" ADD COLUMN mobile_number VARCHAR(15)'))
+        seed(engine, rows)
+        before = measure(engine)
+        migrations.upgrade(engine)
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        after = measure(engine)
+        engine.dispose()
+    return {'rows': rows, 'before': before, 'after': after}
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    random.seed(0)
+    for rows in sizes:
+        print(json.dumps(run(rows)))
@@ -0,0 +1,60 @@
+"""Logins/sec through POST /login with hashing in 1, 4 and 8 worker processes.
+
+    python benchmarks/bench_login.py [logins] [workers ...]   (default: 200 1 4 8)
+
+Workers of 0 measures hashing inline on the request threads.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['RATELIMIT_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from app import app, db, passwords, User
+
+
+def run(logins, workers):
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    passwords._pool = None
+    client_threads = max(workers, 1) * 2
+
+    def login(_):
+        client = app.test_client()
+        return client.post('/login', json={'username': 'bench', 'password': 'secret'}).status_code
+
+    # Start the pool before timing
+    login(None)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(client_threads) as executor:
+        statuses = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - t0
+    if passwords._pool is not None:
+        passwords._pool.shutdown()
+    return {
+        'workers': workers,
+        'logins': logins,
+        'ok': statuses.count(200),
+        'logins_per_sec': round(logins / elapsed, 1),
+    }
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 4, 8]
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password=passwords.hash('secret'),
+                            security_question='q', security_answer='a'))
+        db.session.commit()
+    print(json.dumps({'cpus': os.cpu_count(), 'method': passwords.method_prefix}))
+    for workers in worker_counts:
+        print(json.dumps(run(logins, workers)))
@@ -0,0 +1,101 @@
+"""Overhead of metrics.py: CPU time per request with the hooks on vs off.
+
+One process alternates GET /attendance pages and GET /attendance/report
+through the test client, in blocks of `block` requests with the request
+hooks and SQL listeners of metrics.py detached and attached in turn
+(off, on, on, off, off, on, ...). Comparing within one process, block by
+block, keeps the two settings on the same heap, caches and machine load;
+separate processes easily differ by 10% from run to run on their own.
+Blocks are timed in CPU time and the report gives the median per setting,
+plus the median and range of the overhead of each off/on pair.
+
+    python benchmarks/bench_metrics.py [block] [pairs]   (default: 200 40)
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+ROWS = 500
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['METRICS_ENABLED'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from flask_jwt_extended import create_access_token
+
+from app import app, db, metrics, Attendance, User
+
+HOOKS = (
+    (app.before_request_funcs, metrics._start_request),
+    (app.after_request_funcs, metrics._finish_request),
+    (app.teardown_request_funcs, metrics._record_queries),
+)
+LISTENERS = (('before_cursor_execute', metrics._start_query), ('after_cursor_execute', metrics._finish_query))
+
+
+def set_metrics(enabled):
+    with app.app_context():
+        engine = db.engine
+    for funcs, hook in HOOKS:
+        if enabled:
+            funcs[None].append(hook)
+        else:
+            funcs[None].remove(hook)
+    for name, listener in LISTENERS:
+        (event.listen if enabled else event.remove)(engine, name, listener)
+
+
+def seed():
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password='x')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([Attendance(worker_name=f'worker{i % 20}', attendance_date=datetime(2024, 1, 1),
+                                       user_id=user.id) for i in range(ROWS)])
+        db.session.commit()
+        return {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+
+if __name__ == '__main__':
+    block = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    logging.disable(logging.INFO)
+    headers = seed()
+    client = app.test_client()
+    paths = ['/attendance?limit=50', '/attendance/report?month=2024-01']
+
+    def timed_block():
+        t0 = time.process_time()
+        for i in range(block):
+            client.get(paths[i % 2], headers=headers)
+        return (time.process_time() - t0) / block
+
+    timed_block()  # Warm up
+    enabled = True
+    results = {False: [], True: []}
+    for i in range(pairs):
+        # Alternate which setting goes first, so neither is always measured on a warmer process
+        for setting in ((False, True) if i % 2 == 0 else (True, False)):
+            if setting != enabled:
+                set_metrics(setting)
+                enabled = setting
+            results[setting].append(timed_block())
+
+    off, on = statistics.median(results[False]), statistics.median(results[True])
+    overheads = [(n - o) / o * 100 for o, n in zip(results[False], results[True])]
+    print(json.dumps({'metrics': 'off', 'cpu_ms_per_request': round(off * 1000, 3)}))
+    print(json.dumps({'metrics': 'on', 'cpu_ms_per_request': round(on * 1000, 3)}))
+    print(json.dumps({'pairs': pairs, 'overhead_percent': round((on - off) / off * 100, 2),
+                      'pair_overhead_median': round(statistics.median(overheads), 2),
+                      'pair_overhead_min': round(min(overheads), 2),
+                      'pair_overhead_max': round(max(overheads), 2)}))
@@ -0,0 +1,70 @@
+"""/forgot-password latency with a slow SMS gateway.
+
+Starts the fake gateway with a fixed delay, times the endpoint through the
+Flask test client and then waits for the background deliveries to finish.
+
+    python benchmarks/bench_otp_delivery.py [requests] [gateway-delay]   (default: 20 2.0)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_sms_gateway import start_in_background
+
+requests_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+delay = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+server, gateway_url = start_in_background(delay, fail_every=5)
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['SMS_GATEWAY_URL'] = gateway_url
+os.environ['RATELIMIT_ENABLED'] = '0'
+
+import logging
+
+from app import app, db, notification_queue, User
+
+
+if __name__ == '__main__':
+    logging.disable(logging.ERROR)
+    app.config['SMS_RETRY_BACKOFF'] = 0.1
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password='x', security_question='q',
+                            security_answer='a', mobile_number='+919000000000'))
+        db.session.commit()
+
+    client = app.test_client()
+    latencies = []
+    ids = []
+    for _ in range(requests_count):
+        t0 = time.perf_counter()
+        response = client.post('/forgot-password', json={'mobile_number': '+919000000000'})
+        latencies.append(time.perf_counter() - t0)
+        ids.append(response.json['notification_id'])
+
+    t0 = time.perf_counter()
+    with app.app_context():
+        while True:
+            db.session.expire_all()
+            statuses = [notification_queue.status(i).status for i in ids]
+            if all(s in ('sent', 'failed') for s in statuses):
+                break
+            time.sleep(0.05)
+    drained = time.perf_counter() - t0
+
+    latencies.sort()
+    print(json.dumps({
+        'requests': requests_count,
+        'gateway_delay_sec': delay,
+        'request_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'request_max_ms': round(latencies[-1] * 1000, 2),
+        'sent': statuses.count('sent'),
+        'failed': statuses.count('failed'),
+        'gateway_calls': len(server.received),
+        'drain_sec': round(drained, 2),
+    }))
@@ -0,0 +1,145 @@
+"""Throughput of concurrent chunked photo uploads against a threaded HTTP server.
+
+CLIENTS threads each upload distinct 2000x1500 JPEG photos (about 2.7 MB,
+like a phone camera) to a calendar event through /photos/uploads, over
+their own keep-alive connection, for every chunk size. Each run reports
+photos/sec, MB/s and p50/p99 seconds per photo, and `drain_s`: how long the
+PHOTO_WORKERS pool still needed to finish the thumbnails after the last
+upload. A final run re-announces every photo by sha256, which attaches it
+without sending the bytes again.
+
+    python benchmarks/bench_photos.py [photos-per-client] [photo-workers]   (default: 4 2)
+"""
+import hashlib
+import http.client
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+tmp = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+os.environ['PHOTO_DIR'] = os.path.join(tmp, 'photos')
+os.environ['PHOTO_WORKERS'] = sys.argv[2] if len(sys.argv) > 2 else '2'
+os.environ['RATELIMIT_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from datetime import date
+
+from flask_jwt_extended import create_access_token
+from PIL import Image
+from werkzeug.serving import make_server
+
+from app import app, db, upgrade
+from models import Calendar, Photo, User
+from photos import PROCESSING
+
+CLIENTS = (1, 4, 16)
+CHUNKS = (256 * 1024, 1024 * 1024, 4 * 1024 * 1024)
+
+
+def make_photo():
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (2000, 1500), os.urandom(2000 * 1500 * 3)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def seed():
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine)
+        user = User(username='bench', mobile_number='+910000000000', password='x',
+                    security_question='q', security_answer='a')
+        db.session.add(user)
+        db.session.commit()
+        events = [Calendar(user_id=user.id, date=date.today(), description=f'Field photos {i}') for i in (1, 2)]
+        db.session.add_all(events)
+        db.session.commit()
+        return create_access_token(identity=str(user.id)), [event.id for event in events]
+
+
+class Client:
+    def __init__(self, port, token):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def request(self, method, path, body=None, headers=None):
+        self.connection.request(method, path, body=body, headers={**self.headers, **(headers or {})})
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        if response.status >= 400:
+            raise RuntimeError(f'{method} {path}: {response.status} {data}')
+        return data
+
+    def start(self, announce):
+        return self.request('POST', '/photos/uploads', json.dumps(announce), {'Content-Type': 'application/json'})
+
+    def upload(self, photo, event_id, chunk):
+        started = self.start({'size': len(photo), 'calendar_id': event_id})
+        for offset in range(0, len(photo), chunk):
+            self.request('PUT', f"/photos/uploads/{started['upload_id']}", photo[offset:offset + chunk],
+                         {'Upload-Offset': str(offset), 'Content-Type': 'application/octet-stream'})
+
+
+def wait_for_processing():
+    t0 = time.perf_counter()
+    while True:
+        with app.app_context():
+            if not Photo.query.filter_by(status=PROCESSING).count():
+                return time.perf_counter() - t0
+        time.sleep(0.05)
+
+
+def measure(port, token, photos, clients, per_client, work):
+    def client(worker):
+        connection = Client(port, token)
+        latencies = []
+        for i in range(per_client):
+            start = time.perf_counter()
+            work(connection, photos[worker * per_client + i])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = sorted(latency for result in executor.map(client, range(clients)) for latency in result)
+    elapsed = time.perf_counter() - t0
+    total_bytes = sum(len(photo) for photo in photos[:clients * per_client] if isinstance(photo, bytes))
+    return {
+        'clients': clients,
+        'photos_per_sec': round(len(latencies) / elapsed, 1),
+        'mb_per_sec': round(total_bytes / elapsed / 1e6, 1),
+        'p50_s': round(latencies[len(latencies) // 2], 3),
+        'p99_s': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        'drain_s': round(wait_for_processing(), 2),
+    }
+
+
+if __name__ == '__main__':
+    per_client = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    logging.disable(logging.CRITICAL)
+    token, (event_id, other_event_id) = seed()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    base = [make_photo() for _ in range(max(CLIENTS) * per_client)]
+    for run, chunk in enumerate(CHUNKS):
+        for clients in CLIENTS:
+            # Distinct bytes for every upload (decoders ignore data after the JPEG end marker), so nothing is deduplicated
+            photos = [photo + f'{run}-{clients}'.encode() for photo in base]
+            result = measure(server.server_port, token, photos, clients, per_client,
+                             lambda connection, photo: connection.upload(photo, event_id, chunk))
+            print(json.dumps({'mode': 'upload', 'chunk_kb': chunk // 1024, **result}))
+
+    # The last run's photos attached to another event, announced by hash: no bytes and no processing
+    announced = [{'size': len(photo), 'calendar_id': other_event_id, 'sha256': hashlib.sha256(photo).hexdigest()}
+                 for photo in photos]
+    result = measure(server.server_port, token, announced, max(CLIENTS), per_client,
+                     lambda connection, announce: connection.start(announce))
+    print(json.dumps({'mode': 'sha256', **{k: v for k, v in result.items() if k != 'mb_per_sec'}}))
+    server.shutdown()
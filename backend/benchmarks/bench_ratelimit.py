@@ -0,0 +1,56 @@
+"""Rate limit checks/sec for each window store under concurrent threads.
+
+Each check counts a hit for one of USERS users and for one of a few IPs,
+as RateLimiter does for a write request.
+
+    python benchmarks/bench_ratelimit.py [checks] [redis-url]   (default: 20000)
+
+The Redis store is only measured when a URL is given.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from ratelimit import RateLimiter
+
+USERS = 1000
+IPS = 16
+THREADS = (1, 4, 8)
+
+
+def make_limiter(url):
+    app = Flask(__name__)
+    app.config['RATELIMIT_STORAGE_URL'] = url
+    app.config['RATELIMITS'] = {'writes': {'user': '1000000 per minute', 'ip': '1000000 per minute'}}
+    return RateLimiter(app)
+
+
+def measure(limiter, checks, threads):
+    def work(worker):
+        for i in range(worker, checks, threads):
+            limiter.check('writes', str(i % USERS), f'10.0.0.{i % IPS}')
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, range(threads)))
+    elapsed = time.perf_counter() - t0
+    return {'threads': threads, 'checks_per_sec': round(checks / elapsed), 'us_per_check': round(elapsed / checks * 1e6, 1)}
+
+
+if __name__ == '__main__':
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = {'memory': 'memory://', 'sqlite': f"sqlite:///{os.path.join(tmp, 'ratelimit.db')}"}
+        if len(sys.argv) > 2:
+            urls['redis'] = sys.argv[2]
+        for name, url in urls.items():
+            limiter = make_limiter(url)
+            for threads in THREADS:
+                print(json.dumps({'store': name, **measure(limiter, checks, threads)}))
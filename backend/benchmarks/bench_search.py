@@ -0,0 +1,77 @@
+"""FTS5 search versus the LIKE-scan baseline for one user with many rows.
+
+    python benchmarks/bench_search.py [rows-per-user]   (default: 100000)
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from sqlalchemy import text
+
+import migrations
+import search
+from app import app, db
+
+WORDS = ('wheat rice cotton soybean onion tomato sugarcane maize bajra jowar urea potash '
+         'spray harvest sowing irrigation tractor diesel labour market mandi pune nashik nagpur').split()
+QUERIES = ('wheat', 'pun', 'harvest rice', 'nashik tractor', 'zzz')
+REPEAT = 20
+
+
+def phrase(n):
+    return ' '.join(random.choice(WORDS) for _ in range(n))
+
+
+def seed(rows):
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO \"user\" (id, username, password, security_question, security_answer) "
+            "VALUES (1, 'bench', 'x', 'q', 'a'), (2, 'other', 'x', 'q', 'a')"
+        ))
+        for user_id in (1, 2):
+            conn.execute(text('INSERT INTO contact (name, phone_number, email, user_id) VALUES (:n, :p, :e, :u)'),
+                         [{'n': phrase(2), 'p': f'+91{9000000000 + i}', 'e': None, 'u': user_id}
+                          for i in range(rows // 4)])
+            conn.execute(text('INSERT INTO calendar (date, description, user_id) VALUES (:d, :t, :u)'),
+                         [{'d': date(2024, 1, 1), 't': phrase(6), 'u': user_id} for _ in range(rows // 4)])
+            conn.execute(text('INSERT INTO attendance (worker_name, attendance_date, notes, user_id) '
+                              'VALUES (:w, :d, :n, :u)'),
+                         [{'w': phrase(1), 'd': datetime(2024, 1, 1), 'n': phrase(4), 'u': user_id}
+                          for _ in range(rows // 2)])
+
+
+def timed(func, query):
+    timings = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        hits = func(1, query, search.DEFAULT_RESULTS)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    return len(hits), round(timings[len(timings) // 2] * 1000, 2)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    random.seed(0)
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        t0 = time.perf_counter()
+        migrations.upgrade(db.engine)  # Builds the FTS index from the seeded rows
+        print(json.dumps({'rows_per_user': rows, 'index_build_sec': round(time.perf_counter() - t0, 2)}))
+        for query in QUERIES:
+            fts_hits, fts_ms = timed(search.search_fts, query)
+            like_hits, like_ms = timed(search.search_like, query)
+            print(json.dumps({'q': query, 'fts_ms': fts_ms, 'like_ms': like_ms,
+                              'fts_hits': fts_hits, 'like_hits': like_hits}))
@@ -0,0 +1,111 @@
+"""Rows/sec and peak allocations when turning one page of attendance into JSON.
+
+Compares full ORM objects with per-row strftime, the ORM column query used by
+list_response before, and the Core fast path from serialization.py (with
+orjson if installed and with the standard json module).
+
+    python benchmarks/bench_serialization.py [rows-per-page] [pages]   (default: 1000 200)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['METRICS_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+from flask import jsonify
+
+from app import app, db, Attendance, User, ATTENDANCE_FIELDS
+from pagination import serialize_value
+from serialization import json_response, orjson, records, select_fields
+
+
+def orm_objects(user_id, limit):
+    rows = Attendance.query.filter_by(user_id=user_id).order_by(Attendance.id).limit(limit).all()
+    return jsonify([{
+        'id': a.id,
+        'worker_name': a.worker_name,
+        'attendance_date': a.attendance_date.strftime('%Y-%m-%d'),
+        'notes': a.notes,
+    } for a in rows])
+
+
+def orm_columns(user_id, limit):
+    names = list(ATTENDANCE_FIELDS)
+    rows = (
+        Attendance.query.filter_by(user_id=user_id).order_by(Attendance.id)
+        .with_entities(*ATTENDANCE_FIELDS.values()).limit(limit).all()
+    )
+    return jsonify([{n: serialize_value(v) for n, v in zip(names, row)} for row in rows])
+
+
+def core_rows(user_id, limit):
+    names = list(ATTENDANCE_FIELDS)
+    query = select_fields(ATTENDANCE_FIELDS, names).where(Attendance.user_id == user_id)
+    return db.session.execute(query.order_by(Attendance.id).limit(limit)).all(), names
+
+
+def core(user_id, limit):
+    rows, names = core_rows(user_id, limit)
+    return json_response(records(names, rows))
+
+
+def core_stdlib_json(user_id, limit):
+    rows, names = core_rows(user_id, limit)
+    return app.response_class(json.dumps(records(names, rows)), mimetype='application/json')
+
+
+def measure(func, user_id, limit, pages):
+    with app.test_request_context():
+        func(user_id, limit).get_data()  # Warm up caches
+        t0 = time.perf_counter()
+        for _ in range(pages):
+            body = func(user_id, limit).get_data()
+            db.session.remove()
+        elapsed = time.perf_counter() - t0
+
+        tracemalloc.start()
+        func(user_id, limit).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    return {
+        'path': func.__name__,
+        'rows_per_sec': round(limit * pages / elapsed),
+        'peak_alloc_kib': round(peak / 1024),
+        'bytes': len(body),
+    }
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password='x', security_question='q', security_answer='a')
+        db.session.add(user)
+        db.session.commit()
+        start = datetime(2024, 1, 1, 8)
+        db.session.execute(Attendance.__table__.insert(), [
+            {'worker_name': f'worker{i % 50}', 'attendance_date': start + timedelta(hours=i), 'notes': None,
+             'user_id': user.id}
+            for i in range(limit)
+        ])
+        db.session.commit()
+        user_id = user.id
+
+    paths = [orm_objects, orm_columns, core]
+    if orjson is not None:
+        paths.append(core_stdlib_json)
+    for func in paths:
+        print(json.dumps(measure(func, user_id, limit, pages)))
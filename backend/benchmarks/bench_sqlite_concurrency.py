@@ -0,0 +1,91 @@
+"""Concurrent read/write throughput of SQLite with default settings vs db_config tuning.
+
+Each of N worker processes runs a mix of attendance page reads and
+single-row inserts (one commit each) for a fixed time.
+
+    python benchmarks/bench_sqlite_concurrency.py [workers] [seconds] [write-percent]   (default: 8 5 20)
+"""
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from db_config import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+from models import db
+
+USERS = 100
+
+
+def make_engine(url, tuned):
+    engine = create_engine(url)
+    if tuned:
+        event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, DEFAULT_SQLITE_PRAGMAS))
+    return engine
+
+
+def worker(url, tuned, seconds, write_percent, results):
+    engine = make_engine(url, tuned)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = random.randint(1, USERS)
+        try:
+            if random.randint(1, 100) <= write_percent:
+                with engine.begin() as conn:
+                    conn.execute(text('INSERT INTO attendance (worker_name, attendance_date, user_id) '
+                                      "VALUES ('bench', :d, :u)"), {'d': datetime.utcnow(), 'u': user_id})
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT id, worker_name, attendance_date FROM attendance '
+                                      'WHERE user_id = :u ORDER BY id LIMIT 100'), {'u': user_id}).fetchall()
+                reads += 1
+        except OperationalError:
+            errors += 1  # "database is locked"
+    results.put((reads, writes, errors))
+
+
+def run(workers, seconds, write_percent, tuned):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(url, tuned)
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text('INSERT INTO attendance (worker_name, attendance_date, user_id) VALUES (:w, :d, :u)'),
+                         [{'w': 'seed', 'd': datetime.utcnow(), 'u': i % USERS + 1} for i in range(50_000)])
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(url, tuned, seconds, write_percent, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads, writes, errors = (sum(column) for column in zip(*totals))
+    return {
+        'settings': 'tuned' if tuned else 'default',
+        'workers': workers,
+        'reads_per_sec': round(reads / seconds),
+        'writes_per_sec': round(writes / seconds),
+        'locked_errors': errors,
+    }
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    write_percent = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    for tuned in (False, True):
+        print(json.dumps(run(workers, seconds, write_percent, tuned)))
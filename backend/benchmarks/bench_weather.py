@@ -0,0 +1,68 @@
+"""Upstream calls and latency of GET /weather under concurrent load.
+
+A burst of concurrent requests for a handful of villages is sent through
+the Flask test client while the fake upstream takes `delay` seconds.
+
+    python benchmarks/bench_weather.py [requests] [locations] [delay]   (default: 200 5 0.5)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_weather_api import start_in_background
+
+total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+locations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+server, api_url = start_in_background(delay)
+tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+os.environ['WEATHER_API_URL'] = api_url
+# The fake upstream ignores the key, but without one the service refuses to go upstream at all
+os.environ.setdefault('WEATHER_API_KEY', 'bench')
+
+import logging
+
+from flask_jwt_extended import create_access_token
+
+from app import app, db, User
+
+
+def request_weather(i):
+    # Vary case and spacing: they normalize to the same cache key
+    location = f'  Village {i % locations}' if i % 2 else f'village   {i % locations}'
+    t0 = time.perf_counter()
+    status = app.test_client().get('/weather', query_string={'location': location}, headers=headers).status_code
+    return status, time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password='x', security_question='q', security_answer='a')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+    for phase in ('cold', 'warm'):
+        with ThreadPoolExecutor(32) as executor:
+            results = list(executor.map(request_weather, range(total)))
+        latencies = sorted(t for _, t in results)
+        ok = sum(1 for s, _ in results if s == 200)
+        print(json.dumps({
+            'phase': phase,
+            'requests': total,
+            'ok': ok,
+            'upstream_calls': len(server.requests_seen),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        }))
+        if not ok:
+            sys.exit(f'No /weather request succeeded in the {phase} phase; the latencies above are of errors')
@@ -0,0 +1,193 @@
+"""A local stand-in for a Redis server, for tests, benchmarks and manual testing.
+
+    python benchmarks/fake_redis.py [port]   (default: 6390)
+
+Speaks enough of the RESP2/RESP3 protocol for the redis:// backends of
+blocklist.py and ratelimit.py: HELLO, PING, SET (EX/PX/NX), GET, EXISTS,
+DEL, INCR(BY), EXPIRE, TTL, SCAN, KEYS and FLUSHDB, one command or a pipeline
+at a time. Keys expire by the server's `clock` (time.time unless replaced), so
+tests can move time forward instead of sleeping.
+"""
+import fnmatch
+import socketserver
+import sys
+import threading
+import time
+
+
+class Error(Exception):
+    pass
+
+
+def _encode(value, resp3=False):
+    null = b'_\r\n' if resp3 else b'$-1\r\n'
+    if value is None:
+        return null
+    if isinstance(value, bool):
+        return b'+OK\r\n' if value else null
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, Error):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(item, resp3) for item in value)
+    if isinstance(value, dict):
+        # Map; only sent after HELLO 3
+        return b'%%%d\r\n' % len(value) + b''.join(_encode(k, resp3) + _encode(v, resp3)
+                                                     for k, v in value.items())
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class Store:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.data = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, name, args):
+        handler = getattr(self, 'cmd_' + name.decode().lower(), None)
+        if handler is None:
+            return Error(f'unknown command {name.decode()!r}')
+        with self.lock:
+            try:
+                return handler(*args)
+            except (TypeError, ValueError) as e:
+                return Error(str(e))
+
+    def cmd_ping(self, *args):
+        return args[0] if args else b'PONG'
+
+    def cmd_client(self, *args):
+        return True
+
+    def cmd_select(self, db):
+        return True
+
+    def cmd_set(self, key, value, *options):
+        expires_at = None
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._live(key) is not None:
+            return None
+        for unit, scale in ((b'EX', 1), (b'PX', 0.001)):
+            if unit in options:
+                expires_at = self.clock() + int(options[options.index(unit) + 1]) * scale
+        self.data[key] = (value, expires_at)
+        return True
+
+    def cmd_get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None)
+
+    def cmd_del(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None and self.data.pop(key))
+
+    def cmd_incrby(self, key, amount):
+        entry = self._live(key)
+        value = (int(entry[0]) if entry else 0) + int(amount)
+        self.data[key] = (str(value).encode(), entry[1] if entry else None)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b'1')
+
+    def cmd_expire(self, key, seconds):
+        entry = self._live(key)
+        if entry is None:
+            return 0
+        self.data[key] = (entry[0], self.clock() + int(seconds))
+        return 1
+
+    def cmd_ttl(self, key):
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int(round(entry[1] - self.clock()))
+
+    def _keys(self, pattern=b'*'):
+        return [key for key in list(self.data) if self._live(key) is not None
+                and fnmatch.fnmatchcase(key.decode(), pattern.decode())]
+
+    def cmd_keys(self, pattern):
+        return self._keys(pattern)
+
+    def cmd_scan(self, cursor, *options):
+        # Everything in one batch, so the cursor is always 0 afterwards
+        options = list(options)
+        upper = [option.upper() for option in options]
+        pattern = options[upper.index(b'MATCH') + 1] if b'MATCH' in upper else b'*'
+        return [b'0', self._keys(pattern)]
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        return True
+
+
+class Handler(socketserver.StreamRequestHandler):
+    resp3 = False  # Switched on by HELLO 3 (redis-py 8 asks for it when connecting)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # Inline command, as typed into telnet
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _hello(self, protocol=b'2', *args):
+        info = {b'server': b'redis', b'version': b'7.2.0', b'proto': int(protocol), b'id': 1,
+                b'mode': b'standalone', b'role': b'master', b'modules': []}
+        self.resp3 = protocol == b'3'
+        if self.resp3:
+            return info
+        return [item for pair in info.items() for item in pair]
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            if not command:
+                continue
+            if command[0].upper() == b'HELLO':
+                reply = self._hello(*command[1:])
+            else:
+                reply = self.server.store.execute(command[0], command[1:])
+            self.wfile.write(_encode(reply, self.resp3))
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, clock=time.time):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.store = Store(clock)
+
+    @property
+    def url(self):
+        return f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+
+def start_in_background(clock=time.time):
+    server = Server(0, clock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.url
+
+
+if __name__ == '__main__':
+    Server(int(sys.argv[1]) if len(sys.argv) > 1 else 6390).serve_forever()
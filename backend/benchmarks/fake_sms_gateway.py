@@ -0,0 +1,48 @@
+"""A local stand-in for the Fast2SMS API, for benchmarks and manual testing.
+
+    python benchmarks/fake_sms_gateway.py [port] [delay-seconds] [fail-every]
+
+Every request is answered with 200 after `delay` seconds, except every
+`fail-every`-th request which gets a 500 (0 disables failures).
+"""
+import itertools
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_server(port=0, delay=0.0, fail_every=0):
+    counter = itertools.count(1)
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            received.append(body)
+            time.sleep(delay)
+            status = 500 if fail_every and next(counter) % fail_every == 0 else 200
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"return": true}' if status == 200 else b'{"return": false}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.received = received
+    return server
+
+
+def start_in_background(delay=0.0, fail_every=0):
+    server = make_server(0, delay, fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/dev/bulkV2'
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8025
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    fail_every = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    make_server(port, delay, fail_every).serve_forever()
@@ -0,0 +1,67 @@
+"""A local stand-in for the OpenWeatherMap forecast API.
+
+    python benchmarks/fake_weather_api.py [port] [delay-seconds]
+
+Answers GET /data/2.5/forecast?q=<location> after `delay` seconds with a
+small forecast; the location 'nowhere' returns 404.
+"""
+import sys
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def forecast_for(location):
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return {
+        'city': {'name': location},
+        'list': [
+            {
+                'dt_txt': (start + timedelta(hours=3 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+                'main': {'temp': 25 + i % 5},
+                'weather': [{'description': 'clear sky', 'icon': '01d'}],
+            }
+            for i in range(40)
+        ],
+    }
+
+
+def make_server(port=0, delay=0.0):
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            location = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+            requests_seen.append(location)
+            time.sleep(delay)
+            if location == 'nowhere':
+                self.send_response(404)
+                body = {'cod': '404', 'message': 'city not found'}
+            else:
+                self.send_response(200)
+                body = forecast_for(location)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.requests_seen = requests_seen
+    return server
+
+
+def start_in_background(delay=0.0):
+    server = make_server(0, delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/data/2.5/forecast'
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8026
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    make_server(port, delay).serve_forever()
@@ -0,0 +1,448 @@
+"""Load test for the whole API against a seeded synthetic farm dataset.
+
+Seeds a temporary SQLite database with USERS farmers and their attendance,
+expenses, seeds, medicines, calendar events and contacts, then drives every
+endpoint and prints one JSON line per endpoint with throughput and p50/p99
+latency, followed by a total line. An endpoint whose every request failed
+is reported without timings and makes the run exit non-zero.
+
+By default each endpoint gets REQUESTS sequential calls through the Flask test
+client. With --http the app is served on a local port by a separate process
+and PROCESSES load generators send a weighted mix of all endpoints over HTTP
+for DURATION seconds.
+
+    python benchmarks/loadtest.py [--users 2000] [--attendance 1000000] [--expenses 1000000]
+                                  [--requests 200] [--only login,list_attendance]
+                                  [--http] [--processes 4] [--duration 30] [--threaded]
+                                  [--db path/to/keep.db]
+
+Rows are inserted with explicit ids, handed out to users round robin, so a
+row's owner is known without querying; derived tables (rollups, change log,
+search index, ...) are filled by running the migrations' backfills. /weather
+and /forgot-password are left out since they call external services.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = 'secret'
+WORKER_NAMES = ('Ramesh', 'Suresh', 'Sita', 'Gita', 'Mohan', 'Sohan', 'Lakshmi', 'Arjun', 'Kavita', 'Vijay',
+                'Anita', 'Raju', 'Meena', 'Prakash', 'Sunita', 'Deepak', 'Pooja', 'Manoj', 'Rekha', 'Ashok')
+CATEGORIES = ('seeds', 'fertilizer', 'labour', 'fuel', 'equipment', 'transport', None)
+PER_USER = {'seed': 5, 'medicine': 5, 'calendar': 10, 'contact': 10}
+INSERT_CHUNK = 20000
+TODAY = date.today()
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def owner(record_id, users):
+    return (record_id - 1) % users + 1
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ---- Dataset ----
+def _generate(count, users, make_row, rng):
+    for record_id in range(1, count + 1):
+        row = make_row(rng)
+        row['id'] = record_id
+        row['user_id'] = owner(record_id, users)
+        yield row
+
+
+def _insert(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def _day(rng, days=365):
+    return TODAY - timedelta(days=rng.randrange(days))
+
+
+def seed_dataset(engine, password_hash, sizes, seed=0):
+    """Fill an empty database created by `db.create_all()`, then run the migrations' backfills."""
+    import migrations
+    from models import Attendance, Calendar, Contact, Expense, Medicine, Seed, User
+
+    rng = random.Random(seed)
+    users = sizes['users']
+    tables = [
+        (User, users, None),
+        (Attendance, sizes['attendance'], lambda r: {
+            'worker_name': r.choice(WORKER_NAMES),
+            'attendance_date': datetime.combine(_day(r), datetime.min.time()) + timedelta(hours=r.randrange(6, 18)),
+            'notes': None,
+        }),
+        (Expense, sizes['expenses'], lambda r: {
+            'name': 'expense', 'amount': round(r.uniform(10, 5000), 2), 'date': _day(r),
+            'category': r.choice(CATEGORIES), 'settled': r.random() < 0.5,
+        }),
+        (Seed, users * PER_USER['seed'], lambda r: {
+            'name': r.choice(('Wheat', 'Rice', 'Cotton', 'Soybean')), 'price': round(r.uniform(100, 900), 2),
+            'quality': 'A', 'vendor': 'Agro Mart', 'vendor_url': 'https://example.com',
+        }),
+        (Medicine, users * PER_USER['medicine'], lambda r: {
+            'name': r.choice(('Urea', 'Neem oil', 'DAP')), 'quantity': r.randrange(1, 50),
+            'vendor': 'Agro Mart', 'vendor_url': 'https://example.com',
+        }),
+        (Calendar, users * PER_USER['calendar'], lambda r: {
+            'date': _day(r) + timedelta(days=180), 'description': r.choice(('Sowing', 'Irrigation', 'Harvest')),
+        }),
+        (Contact, users * PER_USER['contact'], lambda r: {
+            'name': r.choice(WORKER_NAMES), 'phone_number': f'+91{r.randrange(10 ** 9, 10 ** 10)}', 'email': None,
+        }),
+    ]
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        for model, count, make_row in tables:
+            t0 = time.perf_counter()
+            if model is User:
+                rows = ({'id': i, 'username': f'user{i}', 'mobile_number': f'+919{i:09d}', 'password': password_hash,
+                         'security_question': 'q', 'security_answer': 'a'} for i in range(1, users + 1))
+            else:
+                rows = (dict(row, updated_at=now) for row in _generate(count, users, make_row, rng))
+            _insert(connection, model.__table__, rows)
+            log(f'seeded {count} {model.__tablename__} rows in {time.perf_counter() - t0:.1f}s')
+
+    t0 = time.perf_counter()
+    migrations.upgrade(engine)
+    log(f'backfilled derived tables in {time.perf_counter() - t0:.1f}s')
+
+
+# ---- Workload ----
+class Workload:
+    """Builds the requests of every scenario against the seeded dataset.
+
+    Load generator `worker` of `workers` only deletes ids congruent to its
+    index, so parallel generators never delete the same row twice.
+    """
+
+    def __init__(self, sizes, tokens, worker=0, workers=1, seed=0):
+        self.sizes = sizes
+        self.tokens = tokens
+        self.worker = worker
+        self.rng = random.Random(seed * 1000 + worker)
+        self.registered = 0
+        users = sizes['users']
+        calendar = users * PER_USER['calendar']
+        # Deletes take rows from the top half of each table, updates from the bottom half
+        self.doomed = {
+            'attendance': iter(range(sizes['attendance'] - worker, sizes['attendance'] // 2, -workers)),
+            'expenses': iter(range(sizes['expenses'] - worker, sizes['expenses'] // 2, -workers)),
+            'calendar': iter(range(calendar - worker, calendar // 2, -workers)),
+        }
+
+    def _auth(self, user_id=None):
+        if user_id is None:
+            user_id = self.rng.randint(1, self.sizes['users'])
+        return {'Authorization': 'Bearer ' + self.tokens[user_id - 1]}
+
+    def _doomed(self, collection):
+        # An exhausted pool yields an id that does not exist (a 404)
+        return next(self.doomed[collection], 0)
+
+    def _lower_half(self, count):
+        return self.rng.randint(1, max(count // 2, 1))
+
+    def register(self):
+        self.registered += 1
+        n = self.registered
+        body = {'username': f'load-{self.worker}-{n}', 'mobile_number': f'+917{self.worker:02d}{n:07d}',
+                'password': PASSWORD}
+        return 'POST', '/register', body, {}
+
+    def login(self):
+        body = {'username': f"user{self.rng.randint(1, self.sizes['users'])}", 'password': PASSWORD}
+        return 'POST', '/login', body, {}
+
+    def list(self, path):
+        return 'GET', f'{path}?limit=100', None, self._auth()
+
+    def create_attendance(self):
+        return 'POST', '/attendance', {'worker_name': self.rng.choice(WORKER_NAMES)}, self._auth()
+
+    def create_attendance_batch(self):
+        items = [{'worker_name': name} for name in WORKER_NAMES]
+        return 'POST', '/attendance/batch', {'items': items}, self._auth()
+
+    def create_expense(self):
+        body = {'name': 'diesel', 'amount': 250, 'date': TODAY.isoformat(), 'category': 'fuel'}
+        return 'POST', '/expenses', body, self._auth()
+
+    def create_calendar(self):
+        body = {'date': (TODAY + timedelta(days=30)).isoformat(), 'description': 'Spray pesticide'}
+        return 'POST', '/calendar', body, self._auth()
+
+    def delete_attendance(self):
+        record_id = self._doomed('attendance')
+        return 'DELETE', f'/attendance/{record_id}', None, self._auth(owner(record_id, self.sizes['users']))
+
+    def delete_expense(self):
+        record_id = self._doomed('expenses')
+        return 'DELETE', f'/expenses/{record_id}', None, self._auth(owner(record_id, self.sizes['users']))
+
+    def settle_expense(self):
+        record_id = self._lower_half(self.sizes['expenses'])
+        return 'PUT', '/expenses/settle', {'id': record_id}, self._auth(owner(record_id, self.sizes['users']))
+
+    def update_calendar(self):
+        record_id = self._lower_half(self.sizes['users'] * PER_USER['calendar'])
+        body = {'id': record_id, 'date': (TODAY + timedelta(days=7)).isoformat(), 'description': 'Irrigation'}
+        return 'PUT', '/calendar', body, self._auth(owner(record_id, self.sizes['users']))
+
+    def delete_calendar(self):
+        record_id = self._doomed('calendar')
+        return 'DELETE', '/calendar', {'id': record_id}, self._auth(owner(record_id, self.sizes['users']))
+
+    def expense_summary(self):
+        first = TODAY.replace(day=1)
+        return 'GET', f'/expenses/summary?group_by=month&from={first.replace(year=first.year - 1)}', None, self._auth()
+
+    def attendance_report(self):
+        return 'GET', f"/attendance/report?month={TODAY.strftime('%Y-%m')}", None, self._auth()
+
+    def export_expenses(self):
+        start = TODAY - timedelta(days=30)
+        return 'GET', f'/expenses/export?format=csv&from={start}&to={TODAY}', None, self._auth()
+
+    def search(self):
+        return 'GET', f"/search?q={self.rng.choice(WORKER_NAMES)[:3].lower()}", None, self._auth()
+
+    def sync(self):
+        return 'GET', '/sync', None, self._auth()
+
+
+# (name, weight in the --http mix, request builder)
+SCENARIOS = [
+    ('register', 1, Workload.register),
+    ('login', 2, Workload.login),
+    ('list_attendance', 10, lambda w: w.list('/attendance')),
+    ('list_expenses', 10, lambda w: w.list('/expenses')),
+    ('list_seeds', 4, lambda w: w.list('/seeds')),
+    ('list_medicines', 4, lambda w: w.list('/medicines')),
+    ('list_calendar', 6, lambda w: w.list('/calendar')),
+    ('list_contacts', 4, lambda w: w.list('/contacts')),
+    ('create_attendance', 6, Workload.create_attendance),
+    ('create_attendance_batch', 1, Workload.create_attendance_batch),
+    ('create_expense', 4, Workload.create_expense),
+    ('create_calendar', 2, Workload.create_calendar),
+    ('delete_attendance', 2, Workload.delete_attendance),
+    ('delete_expense', 2, Workload.delete_expense),
+    ('settle_expense', 3, Workload.settle_expense),
+    ('update_calendar', 2, Workload.update_calendar),
+    ('delete_calendar', 1, Workload.delete_calendar),
+    ('expense_summary', 3, Workload.expense_summary),
+    ('attendance_report', 3, Workload.attendance_report),
+    ('export_expenses', 1, Workload.export_expenses),
+    ('search', 3, Workload.search),
+    ('sync', 3, Workload.sync),
+]
+
+
+def summarize(name, latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    if ordered and errors == len(ordered):
+        # The timings of an endpoint that only fails say nothing about the endpoint
+        return {'endpoint': name, 'requests': len(ordered), 'errors': errors, 'failed': True}
+    return {
+        'endpoint': name,
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+    }
+
+
+# ---- In-process run ----
+def run_in_process(app, workload, scenarios, requests):
+    client = app.test_client()
+    results = []
+    all_latencies = []
+    all_errors = 0
+    total_elapsed = 0
+    for name, _, build in scenarios:
+        latencies = []
+        errors = 0
+        t0 = time.perf_counter()
+        for _ in range(requests):
+            method, path, body, headers = build(workload)
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            response.get_data()  # Drain streamed responses
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - t0
+        results.append(summarize(name, latencies, errors, elapsed))
+        all_latencies += latencies
+        all_errors += errors
+        total_elapsed += elapsed
+    return results, summarize('total', all_latencies, all_errors, total_elapsed)
+
+
+# ---- HTTP run ----
+def serve(database_url, port, threaded):
+    os.environ['DATABASE_URL'] = database_url
+    sys.path.insert(0, BACKEND)
+    import logging
+    logging.disable(logging.CRITICAL)  # Failures are counted in the results
+    from app import app
+    app.run(host='127.0.0.1', port=port, threaded=threaded)
+
+
+def generate_load(base_url, sizes, tokens, names, worker, workers, duration, results):
+    import requests
+
+    workload = Workload(sizes, tokens, worker, workers)
+    session = requests.Session()
+    scenarios = [s for s in SCENARIOS if s[0] in names]
+    names = [name for name, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    builders = {name: build for name, _, build in scenarios}
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        name = workload.rng.choices(names, weights)[0]
+        method, path, body, headers = builders[name](workload)
+        start = time.perf_counter()
+        try:
+            ok = session.request(method, base_url + path, json=body, headers=headers).status_code < 400
+        except requests.RequestException:
+            ok = False
+        samples.append((name, time.perf_counter() - start, ok))
+    results.put(samples)
+
+
+def wait_for_server(base_url, timeout=60):
+    import requests
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            requests.get(base_url + '/metrics', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start')
+
+
+def run_http(database_url, sizes, tokens, scenarios, processes, duration, port, threaded):
+    context = multiprocessing.get_context('spawn')
+    server = context.Process(target=serve, args=(database_url, port, threaded), daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_for_server(base_url)
+        queue = context.Queue()
+        generators = [
+            context.Process(target=generate_load,
+                            args=(base_url, sizes, tokens, [name for name, _, _ in scenarios], worker, processes,
+                                  duration, queue))
+            for worker in range(processes)
+        ]
+        t0 = time.perf_counter()
+        for process in generators:
+            process.start()
+        samples = [sample for _ in generators for sample in queue.get()]
+        elapsed = time.perf_counter() - t0
+        for process in generators:
+            process.join()
+    finally:
+        server.terminate()
+        server.join()
+
+    results = []
+    for name, _, _ in scenarios:
+        mine = [(latency, ok) for sample_name, latency, ok in samples if sample_name == name]
+        if mine:
+            results.append(summarize(name, [latency for latency, _ in mine],
+                                     sum(not ok for _, ok in mine), elapsed))
+    return results, summarize('total', [latency for _, latency, _ in samples],
+                              sum(not ok for _, _, ok in samples), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--attendance', type=int, default=1000000)
+    parser.add_argument('--expenses', type=int, default=1000000)
+    parser.add_argument('--requests', type=int, default=200, help='calls per endpoint in-process')
+    parser.add_argument('--only', help='comma separated scenario names')
+    parser.add_argument('--http', action='store_true', help='serve the app and load it over HTTP')
+    parser.add_argument('--processes', type=int, default=4, help='HTTP load generator processes')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of HTTP load')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--threaded', action='store_true', help='serve HTTP with a thread per request')
+    parser.add_argument('--db', help='keep the seeded database at this path instead of a temp file')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the dataset')
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.only:
+        wanted = args.only.split(',')
+        unknown = set(wanted) - {name for name, _, _ in SCENARIOS}
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [s for s in SCENARIOS if s[0] in wanted]
+
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.abspath(args.db) if args.db else os.path.join(tmp.name, 'loadtest.db')
+    if os.path.exists(path):
+        parser.error(f'{path} already exists')
+    database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = database_url
+    # Every request comes from one IP and a few users; set RATELIMIT_ENABLED=1 to measure with limits
+    os.environ.setdefault('RATELIMIT_ENABLED', '0')
+    sys.path.insert(0, BACKEND)
+
+    import logging
+    logging.disable(logging.CRITICAL)  # Failures are counted in the results
+    from flask_jwt_extended import create_access_token
+    from app import app, db, passwords
+
+    sizes = {'users': args.users, 'attendance': args.attendance, 'expenses': args.expenses}
+    with app.app_context():
+        db.create_all()
+        seed_dataset(db.engine, passwords.hash(PASSWORD), sizes, args.seed)
+        tokens = [create_access_token(identity=str(i)) for i in range(1, args.users + 1)]
+
+    if args.http:
+        with app.app_context():
+            db.engine.dispose()
+        results, total = run_http(database_url, sizes, tokens, scenarios, args.processes, args.duration,
+                                  args.port, args.threaded)
+        mode = {'mode': 'http', 'processes': args.processes}
+    else:
+        workload = Workload(sizes, tokens, seed=args.seed)
+        results, total = run_in_process(app, workload, scenarios, args.requests)
+        mode = {'mode': 'in-process'}
+
+    for result in results + [total]:
+        print(json.dumps({**mode, **sizes, **result}))
+    failed = [result['endpoint'] for result in results if result.get('failed')]
+    if failed:
+        sys.exit(f"Every request failed for: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    main()
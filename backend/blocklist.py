@@ -0,0 +1,143 @@
+"""Revoked-token (JWT blocklist) storage backends.
+
+The backend is chosen with a URL:
+
+    memory://                      per-process dict, entries evicted at token expiry
+    sqlite:////path/to/blocklist.db  SQLite file shared by every worker on a host
+    redis://host:6379/0            any Redis-protocol server (needs the `redis` package)
+
+Every backend stores a token's `jti` until its `exp` timestamp, after which
+the token is rejected by signature validation anyway and can be forgotten.
+"""
+import heapq
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+
+class TokenBlocklist(ABC):
+    @abstractmethod
+    def add(self, jti, expires_at):
+        """Revoke `jti` until the Unix timestamp `expires_at`."""
+
+    @abstractmethod
+    def is_revoked(self, jti):
+        """Whether `jti` was revoked and has not expired yet."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of revoked tokens stored (expired ones may still be counted until purged)."""
+
+
+class MemoryBlocklist(TokenBlocklist):
+    """Dict of jti -> expiry plus a min-heap of expiries for eviction.
+
+    Lookups are a dict hit; expired entries are evicted from the heap head
+    on each `add`, so memory is bounded by the number of live revoked tokens.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._heap)
+            if self._expiry.get(jti) == expires_at:
+                del self._expiry[jti]
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._evict(time.time())
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+
+    def is_revoked(self, jti):
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+class SQLiteBlocklist(TokenBlocklist):
+    """Blocklist in a SQLite file so that every worker process sees logouts."""
+
+    # Expired rows are purged once every PURGE_INTERVAL additions
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._adds = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS revoked_token '
+                         '(jti TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_revoked_token_expires_at ON revoked_token (expires_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, jti, expires_at):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO revoked_token (jti, expires_at) VALUES (?, ?)', (jti, expires_at))
+            self._adds += 1
+            if self._adds % self.PURGE_INTERVAL == 0:
+                self.purge()
+
+    def purge(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM revoked_token WHERE expires_at <= ?', (time.time(),))
+
+    def is_revoked(self, jti):
+        row = self._connect().execute(
+            'SELECT 1 FROM revoked_token WHERE jti = ? AND expires_at > ?', (jti, time.time())
+        ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM revoked_token').fetchone()[0]
+
+
+class RedisBlocklist(TokenBlocklist):
+    """Blocklist in Redis (or a Redis-protocol server) using keys with a TTL."""
+
+    PREFIX = 'revoked:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis:// blocklist backend requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+
+    def add(self, jti, expires_at):
+        ttl = int(expires_at - time.time()) + 1
+        if ttl > 0:
+            self._client.set(self.PREFIX + jti, 1, ex=ttl)
+
+    def is_revoked(self, jti):
+        return bool(self._client.exists(self.PREFIX + jti))
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(self.PREFIX + '*'))
+
+
+def create_blocklist(url):
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryBlocklist()
+    if scheme == 'sqlite':
+        return SQLiteBlocklist(url[len('sqlite:///'):])
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisBlocklist(url)
+    raise ValueError(f'Unsupported blocklist URL: {url}')
@@ -1,43 +1,40 @@
-import torch
+import json
+
 import torch.nn as nn
-import torch.optim as optim
-import torchvision
-import torchvision.transforms as transforms
 from torchvision import models
-from torch.utils.data import DataLoader
-from torchvision.datasets import ImageFolder
 
-# Define transformations for the dataset
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor()
-])
+from dataset_cache import CachedImageDataset, prepare_dataset
+from training import Trainer, split_dataset
 
 # Load dataset (Replace 'dataset_path' with actual path)
 dataset_path = 'path_to_your_dataset'
-train_dataset = ImageFolder(root=dataset_path, transform=transform)
-train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True)
-
-# Load a pre-trained model
-model = models.resnet18(pretrained=True)
-num_ftrs = model.fc.in_features
-model.fc = nn.Linear(num_ftrs, len(train_dataset.classes))  # Adjust output layer
-
-# Define loss and optimizer
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
-
-# Train the model (Basic training loop)
-num_epochs = 5
-for epoch in range(num_epochs):
-    for images, labels in train_loader:
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
-    print(f"Epoch {epoch+1}, Loss: {loss.item()}")
-
-# Save the model
-torch.save(model, 'crop_disease_model.pth')
-print("Model saved as 'crop_disease_model.pth'")
+# Images are decoded and resized to 224x224 once, then read from this cache every epoch
+cache_path = 'dataset_cache'
+
+# Training settings
+max_epochs = 20
+patience = 3  # Stop after this many epochs without a better validation loss
+batch_size = 32
+accumulate = 1  # Batches per optimizer step; raise it instead of batch_size when memory is short
+freeze_backbone = False  # Only train the final layer, on cached backbone features
+checkpoint_path = 'training_checkpoint.pth'  # Delete it to start over instead of resuming
+
+if __name__ == '__main__':
+    dataset = CachedImageDataset(prepare_dataset(dataset_path, cache_path))
+    train_set, val_set = split_dataset(dataset, val_fraction=0.2)
+
+    # Load a pre-trained model
+    model = models.resnet18(pretrained=True)
+    num_ftrs = model.fc.in_features
+    model.fc = nn.Linear(num_ftrs, len(dataset.classes))  # Adjust output layer
+
+    # Train, keeping the weights with the best validation loss
+    trainer = Trainer(model, dataset.classes, train_set, val_set, checkpoint_path=checkpoint_path,
+                      output_path='crop_disease_model.pth', batch_size=batch_size, accumulate=accumulate,
+                      lr=0.001, epochs=max_epochs, patience=patience, freeze_backbone=freeze_backbone)
+    trainer.fit()
+    print("Model saved as 'crop_disease_model.pth'")
+
+    # Class names in output order, used by the /diagnose endpoint
+    with open('crop_disease_classes.json', 'w') as f:
+        json.dump(dataset.classes, f)
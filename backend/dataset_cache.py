@@ -0,0 +1,134 @@
+"""Decode-once image cache for training the crop disease model.
+
+`prepare_dataset` reads an ImageFolder-style directory (one sub-directory per
+class), decodes and resizes every image once, exactly as
+transforms.Resize((224, 224)) does, and writes them into one uint8 file of
+shape (N, 3, 224, 224) next to a label array and an index:
+
+    cache_dir/images.u8     raw pixels, channels first
+    cache_dir/labels.npy    int64 class index per image
+    cache_dir/index.json    classes, count, image size and a fingerprint of the source files
+
+The cache is rebuilt only when the source files change. `CachedImageDataset`
+memory-maps the pixel file, so samples are read straight from the page cache
+without decoding or copying; convert batches with `to_float` (the ToTensor
+scaling) after loading, which moves 4x less data between loader workers.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision.datasets import ImageFolder
+
+IMAGE_SIZE = 224
+IMAGES_FILE = 'images.u8'
+LABELS_FILE = 'labels.npy'
+INDEX_FILE = 'index.json'
+
+
+def _fingerprint(samples):
+    digest = hashlib.sha1()
+    for path, label in samples:
+        stat = os.stat(path)
+        digest.update(f'{path}\0{label}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def _decode(path, size):
+    image = Image.open(path).convert('RGB').resize((size, size), Image.BILINEAR)
+    return np.asarray(image).transpose(2, 0, 1)
+
+
+def _decode_range(images_path, count, size, paths, start):
+    images = np.memmap(images_path, dtype=np.uint8, mode='r+', shape=(count, 3, size, size))
+    for offset, path in enumerate(paths):
+        images[start + offset] = _decode(path, size)
+    images.flush()
+
+
+def prepare_dataset(image_root, cache_dir, size=IMAGE_SIZE, workers=None, chunk=256):
+    """Build (or reuse) the cache for `image_root` and return `cache_dir`."""
+    folder = ImageFolder(image_root)
+    fingerprint = _fingerprint(folder.samples)
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        if index['fingerprint'] == fingerprint and index['size'] == size:
+            return cache_dir
+
+    t0 = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    count = len(folder.samples)
+    images_path = os.path.join(cache_dir, IMAGES_FILE)
+    np.memmap(images_path, dtype=np.uint8, mode='w+', shape=(count, 3, size, size)).flush()
+
+    paths = [path for path, _ in folder.samples]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_decode_range, images_path, count, size, paths[start:start + chunk], start)
+            for start in range(0, count, chunk)
+        ]
+        for future in futures:
+            future.result()
+
+    np.save(os.path.join(cache_dir, LABELS_FILE), np.array(folder.targets, dtype=np.int64))
+    # The index is written last, so an interrupted run is redone next time
+    with open(index_path, 'w') as f:
+        json.dump({'classes': folder.classes, 'count': count, 'size': size, 'fingerprint': fingerprint}, f)
+    print(f"Cached {count} images in {cache_dir} in {time.perf_counter() - t0:.1f}s")
+    return cache_dir
+
+
+class CachedImageDataset(Dataset):
+    """uint8 (3, size, size) images and labels read from a prepare_dataset cache."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.classes = index['classes']
+        self.size = index['size']
+        self.count = index['count']
+        self.labels = torch.from_numpy(np.load(os.path.join(cache_dir, LABELS_FILE)))
+        self._images = None  # Mapped on first access, so each loader worker maps it itself
+
+    def _map(self):
+        # Copy-on-write mapping: reads are zero-copy and the file can never be modified
+        return np.memmap(os.path.join(self.cache_dir, IMAGES_FILE), dtype=np.uint8, mode='c',
+                         shape=(self.count, 3, self.size, self.size))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if self._images is None:
+            self._images = self._map()
+        return torch.from_numpy(self._images[index]), self.labels[index]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+
+def to_float(images):
+    """uint8 batch -> float in [0, 1], the same values transforms.ToTensor produces."""
+    return images.float().div_(255)
+
+
+def make_loader(dataset, batch_size=32, shuffle=True, workers=None, sampler=None):
+    """DataLoader with worker processes that stay alive between epochs."""
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+    options = {}
+    if workers:
+        options = {'persistent_workers': True, 'prefetch_factor': 4}
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle and sampler is None, sampler=sampler,
+                      num_workers=workers, pin_memory=torch.cuda.is_available(), **options)
@@ -0,0 +1,156 @@
+"""Crop disease diagnosis with the model trained by database.py.
+
+The model is loaded on the first request of each process, not at import, so
+workers that never diagnose pay nothing and the app runs without torch
+installed. Images are decoded and resized on the request threads, then
+queued for a single inference thread that runs them through the model in
+micro-batches: it takes whatever is queued, waiting at most
+DIAGNOSIS_MAX_WAIT_MS for more, up to DIAGNOSIS_MAX_BATCH images.
+"""
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+# Side of the square input the model was trained on (transforms.Resize((224, 224)) in database.py)
+INPUT_SIZE = 224
+TOP_K = 3
+
+
+class DiagnosisError(Exception):
+    status = 400
+
+
+class ModelUnavailable(DiagnosisError):
+    status = 503
+
+
+class ImageTooLarge(DiagnosisError):
+    status = 413
+
+
+def preprocess(data):
+    """Decode image bytes into the 3x224x224 float tensor used in training (Resize + ToTensor)."""
+    import torch
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        # Pillow only warns between MAX_IMAGE_PIXELS and twice that; refuse those too. Checked by
+        # hand because warnings.catch_warnings() would change the filters of every request thread
+        image = Image.open(io.BytesIO(data))
+        if Image.MAX_IMAGE_PIXELS and image.width * image.height > Image.MAX_IMAGE_PIXELS:
+            raise Image.DecompressionBombError(f'{image.width}x{image.height} pixels')
+        # Let the JPEG decoder downscale by a power of two while decoding large photos
+        image.draft('RGB', (INPUT_SIZE, INPUT_SIZE))
+        image = image.convert('RGB').resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ImageTooLarge('Image has too many pixels, send a photo of at most '
+                            f'{Image.MAX_IMAGE_PIXELS // 1_000_000} megapixels')
+    except (UnidentifiedImageError, OSError):
+        raise DiagnosisError('Could not read the image, send a JPEG or PNG photo')
+    pixels = torch.frombuffer(bytearray(image.tobytes()), dtype=torch.uint8)
+    return pixels.view(INPUT_SIZE, INPUT_SIZE, 3).permute(2, 0, 1).float().div_(255)
+
+
+class DiagnosisEngine:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DIAGNOSIS_MODEL_PATH', 'crop_disease_model.pth')
+        app.config.setdefault('DIAGNOSIS_CLASSES_PATH', 'crop_disease_classes.json')
+        app.config.setdefault('DIAGNOSIS_MAX_BATCH', 16)
+        app.config.setdefault('DIAGNOSIS_MAX_WAIT_MS', 10)
+        app.config.setdefault('DIAGNOSIS_THREADS', 0)  # torch intra-op threads; 0 keeps torch's default
+        app.config.setdefault('DIAGNOSIS_TIMEOUT', 30)  # Seconds a request waits for its result
+        self.app = app
+        self.model = None
+        self.classes = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            import torch
+            from model_export import load_model
+        except ImportError:
+            raise ModelUnavailable("Diagnosis requires the 'torch' package")
+        config = self.app.config
+        path = config['DIAGNOSIS_MODEL_PATH']
+        if not os.path.exists(path):
+            raise ModelUnavailable('The diagnosis model has not been trained yet')
+
+        t0 = time.perf_counter()
+        if config['DIAGNOSIS_THREADS']:
+            torch.set_num_threads(config['DIAGNOSIS_THREADS'])
+        # A checkpoint from database.py or any model exported by model_export.py
+        model, self.classes = load_model(path)
+        if not self.classes and os.path.exists(config['DIAGNOSIS_CLASSES_PATH']):
+            with open(config['DIAGNOSIS_CLASSES_PATH']) as f:
+                self.classes = json.load(f)
+        self.model = model
+        threading.Thread(target=self._run_forever, name='diagnosis', daemon=True).start()
+        logging.info(f"Loaded diagnosis model from {path} in {time.perf_counter() - t0:.2f}s")
+
+    def _ensure_loaded(self):
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self._load()
+
+    def _label(self, index):
+        return self.classes[index] if self.classes and index < len(self.classes) else str(index)
+
+    def diagnose(self, data):
+        """Diagnose one image (bytes); returns the top predictions with their confidence."""
+        self._ensure_loaded()
+        future = Future()
+        self._queue.put((preprocess(data), future))
+        try:
+            return future.result(timeout=self.app.config['DIAGNOSIS_TIMEOUT'])
+        except TimeoutError:
+            raise ModelUnavailable('Diagnosis timed out, please try again')
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        max_batch = self.app.config['DIAGNOSIS_MAX_BATCH']
+        deadline = time.perf_counter() + self.app.config['DIAGNOSIS_MAX_WAIT_MS'] / 1000
+        while len(batch) < max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _predict(self, images):
+        import torch
+
+        with torch.inference_mode():
+            probabilities = self.model(torch.stack(images)).softmax(dim=1)
+            confidences, indices = probabilities.topk(min(TOP_K, probabilities.shape[1]), dim=1)
+        return [
+            [{'label': self._label(i), 'confidence': round(c, 4)} for c, i in zip(row_c.tolist(), row_i.tolist())]
+            for row_c, row_i in zip(confidences, indices)
+        ]
+
+    def _run_forever(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._predict([image for image, _ in batch])
+            except Exception as e:
+                logging.error(f"Diagnosis batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(ModelUnavailable('Diagnosis failed'))
+                continue
+            for (_, future), predictions in zip(batch, results):
+                future.set_result({'diagnosis': predictions[0]['label'],
+                                   'confidence': predictions[0]['confidence'],
+                                   'predictions': predictions})
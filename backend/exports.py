@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from flask import Response, request, jsonify, stream_with_context
+
+from pagination import serialize_value
+
+# Rows fetched from the database cursor (and written to the client) per batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parse_date_range():
+    """Read the optional `from`/`to` (YYYY-MM-DD, inclusive) query arguments."""
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        bounds.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+    return bounds
+
+
+def date_range_filters(column, start, end, is_datetime=False):
+    filters = []
+    if start:
+        filters.append(column >= start)
+    if end:
+        # DateTime columns hold times within the last day, so compare against the next midnight
+        filters.append(column < end + timedelta(days=1) if is_datetime else column <= end)
+    return filters
+
+
+def _csv_chunks(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([serialize_value(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(names, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({name: serialize_value(value) for name, value in zip(names, row)}))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_response(model, user_id, columns, filters, filename):
+    """Stream every `model` row owned by `user_id` as CSV or NDJSON.
+
+    Rows are read from the cursor in batches of EXPORT_BATCH_SIZE and written
+    out as they arrive, so memory use does not depend on the number of rows.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    names = list(columns)
+    query = (
+        model.query.filter_by(user_id=user_id)
+        .filter(*filters)
+        .order_by(model.id)
+        .with_entities(*columns.values())
+        .execution_options(stream_results=True)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    chunks = _csv_chunks(names, query) if fmt == 'csv' else _ndjson_chunks(names, query)
+
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
@@ -0,0 +1,216 @@
+"""Request and SQL instrumentation exposed in the Prometheus text format.
+
+Every request records its latency, response size and status code under the
+route rule that matched it (e.g. /attendance/<int:id>), together with the
+number of SQL statements it ran and the time spent in them. Statements are
+timed with SQLAlchemy's before/after_cursor_execute events; statements
+slower than SLOW_QUERY_MS are logged. To keep the per-statement cost down,
+a request's statement timings are only appended to a list of its own and
+go into the shared histograms, under their locks, once at teardown. Streamed responses (exports) are
+measured up to the point the body starts streaming. Everything is kept in
+process memory, so each worker process reports its own numbers.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import Response, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The current request's _RequestStats, None outside requests
+_current = ContextVar('metrics_request', default=None)
+
+
+class _RequestStats:
+    __slots__ = ('start', 'labels', 'durations')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.labels = None
+        self.durations = []  # Of the SQL statements run so far
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def _get_series(self, label_values):
+        # Caller holds self._lock
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0, 0]
+        return series
+
+    def observe(self, value, label_values=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(label_values)
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def observe_many(self, values, label_values=()):
+        """observe() every value in `values`, taking the lock once."""
+        indexes = [bisect_left(self.buckets, value) for value in values]
+        with self._lock:
+            series = self._get_series(label_values)
+            counts = series[0]
+            for index in indexes:
+                counts[index] += 1
+            series[1] += sum(values)
+            series[2] += len(indexes)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        bucket_labels = self.labels + ('le',)
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_labels, label_values + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Metrics:
+    def __init__(self, app=None, db=None):
+        self.app = None
+        route = ('method', 'route')
+        self.requests = Counter('http_requests_total', 'Requests handled.', route + ('status',))
+        self.latency = Histogram('http_request_duration_seconds', 'Time spent handling a request.',
+                                 LATENCY_BUCKETS, route)
+        self.response_size = Histogram('http_response_size_bytes', 'Size of response bodies.',
+                                       SIZE_BUCKETS, route)
+        self.request_queries = Histogram('http_request_db_queries', 'SQL statements run per request.',
+                                         QUERY_COUNT_BUCKETS, route)
+        self.request_query_time = Histogram('http_request_db_duration_seconds',
+                                            'Time spent in SQL statements per request.', LATENCY_BUCKETS, route)
+        self.queries = Histogram('db_query_duration_seconds', 'Time spent in each SQL statement.', LATENCY_BUCKETS)
+        self.slow_queries = Counter('db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS.')
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('SLOW_QUERY_MS', 0)  # 0 disables the slow query log
+        self.app = app
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._record_queries)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._start_query)
+        event.listen(engine, 'after_cursor_execute', self._finish_query)
+
+    # ---- SQL ----
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    def _finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start']
+        stats = _current.get()
+        if stats is None:
+            # Background work (sweeps, reminders, photo processing) outside any request
+            self.queries.observe(elapsed)
+        else:
+            stats.durations.append(elapsed)
+        if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+            self.slow_queries.inc()
+            logger.warning(f'Slow query ({elapsed * 1000:.1f} ms): {statement}')
+
+    # ---- Requests ----
+    def _start_request(self):
+        _current.set(_RequestStats())
+
+    def _finish_request(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.start
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        labels = stats.labels = (request.method, route)
+        self.requests.inc(labels + (response.status_code,))
+        self.latency.observe(elapsed, labels)
+        # Streamed responses (exports) have no length up front
+        if response.content_length is not None:
+            self.response_size.observe(response.content_length, labels)
+        return response
+
+    def _record_queries(self, exc):
+        stats = _current.get()
+        if stats is None:
+            return
+        _current.set(None)
+        if stats.labels is None:
+            # after_request did not run (an unhandled error)
+            route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+            stats.labels = (request.method, route)
+        self.request_queries.observe(len(stats.durations), stats.labels)
+        self.request_query_time.observe(sum(stats.durations), stats.labels)
+        self.queries.observe_many(stats.durations)
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.response_size, self.request_queries,
+                       self.request_query_time, self.queries, self.slow_queries):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,217 @@
+"""Versioned schema migrations for the FarmApp database.
+
+Each module in `migrations/versions` declares a `revision`, the
+`down_revision` it builds on, and `upgrade(op)` / `downgrade(op)` functions.
+Migrations run either online against a database URI, or offline, in which
+case the SQL is printed instead of executed:
+
+    python -m migrations upgrade [--url URL] [--sql]
+    python -m migrations downgrade <revision> [--url URL] [--sql]
+    python -m migrations current [--url URL]
+"""
+import importlib
+import logging
+import pkgutil
+
+from sqlalchemy import MetaData, create_engine, inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from migrations import versions
+
+VERSION_TABLE = 'schema_version'
+
+
+def _quote(name):
+    # "user" is a reserved word in Postgres, so identifiers are always quoted
+    return f'"{name}"'
+
+
+class Operations:
+    """Schema operations handed to a migration's upgrade/downgrade.
+
+    Online, operations that would be no-ops (index or column already present,
+    e.g. on a database created by `db.create_all()`) are skipped. Offline, the
+    SQL is collected in `statements` instead of being executed.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.statements = []
+
+    @property
+    def dialect(self):
+        """Name of the target database dialect, or None when running offline."""
+        return self.connection.dialect.name if self.connection is not None else None
+
+    def _inspector(self):
+        return inspect(self.connection)
+
+    def _has_column(self, table, column):
+        return any(c['name'] == column for c in self._inspector().get_columns(table))
+
+    def _has_index(self, table, name):
+        return any(i['name'] == name for i in self._inspector().get_indexes(table))
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        if self.connection is not None:
+            self.connection.execute(text(sql))
+
+    def create_table(self, table):
+        """Create a SQLAlchemy `Table` (and its indexes) unless it exists."""
+        if self.connection is None:
+            self.statements.append(str(CreateTable(table)).strip())
+            self.statements.extend(str(CreateIndex(index)).strip() for index in table.indexes)
+            return
+        table.create(self.connection, checkfirst=True)
+        for index in table.indexes:
+            if not self._has_index(table.name, index.name):
+                index.create(self.connection)
+
+    def _ddl(self, element):
+        dialect = self.connection.dialect if self.connection is not None else None
+        return str(element.compile(dialect=dialect)).strip()
+
+    def rebuild_table(self, table):
+        """Recreate `table` from its new definition, keeping its rows.
+
+        For column changes that SQLite cannot ALTER (e.g. dropping NOT NULL):
+        the rows of the columns in `table` are copied into a new table, which
+        then replaces the old one and gets `table`'s indexes.
+        """
+        new = table.to_metadata(MetaData(), name=f'_{table.name}_new')
+        for index in list(new.indexes):
+            new.indexes.discard(index)  # Created under their own names once the table is renamed
+        cols = ', '.join(_quote(c.name) for c in table.columns)
+        self.execute(self._ddl(CreateTable(new)))
+        self.execute(f'INSERT INTO {_quote(new.name)} ({cols}) SELECT {cols} FROM {_quote(table.name)}')
+        self.execute(f'DROP TABLE {_quote(table.name)}')
+        self.execute(f'ALTER TABLE {_quote(new.name)} RENAME TO {_quote(table.name)}')
+        for index in table.indexes:
+            self.execute(self._ddl(CreateIndex(index)))
+
+    def drop_table(self, name):
+        self.execute(f'DROP TABLE IF EXISTS {_quote(name)}')
+
+    def run(self, func):
+        """Run a Python data migration `func(connection)`; skipped offline."""
+        if self.connection is None:
+            self.statements.append(f'-- {func.__module__}.{func.__name__} only runs online')
+            return
+        func(self.connection)
+
+    def add_column(self, table, column, ddl):
+        if self.connection is not None and self._has_column(table, column):
+            return
+        self.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} {ddl}')
+
+    def drop_column(self, table, column):
+        if self.connection is not None and not self._has_column(table, column):
+            return
+        self.execute(f'ALTER TABLE {_quote(table)} DROP COLUMN {_quote(column)}')
+
+    def create_index(self, name, table, columns, unique=False):
+        if self.connection is not None and self._has_index(table, name):
+            return
+        cols = ', '.join(_quote(c) for c in columns)
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        self.execute(f'CREATE {kind} {_quote(name)} ON {_quote(table)} ({cols})')
+
+    def drop_index(self, name, table):
+        if self.connection is not None and not self._has_index(table, name):
+            return
+        self.execute(f'DROP INDEX {_quote(name)}')
+
+
+def load_revisions():
+    """Return the migration modules ordered from oldest to newest."""
+    modules = {}
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f'{versions.__name__}.{info.name}')
+        modules[module.down_revision] = module
+
+    ordered = []
+    current = None
+    while current in modules:
+        module = modules.pop(current)
+        ordered.append(module)
+        current = module.revision
+    if modules:
+        raise RuntimeError('Migration history is not linear: '
+                           + ', '.join(m.revision for m in modules.values()))
+    return ordered
+
+
+def current_revision(connection):
+    if not inspect(connection).has_table(VERSION_TABLE):
+        return None
+    return connection.execute(text(f'SELECT revision FROM {VERSION_TABLE}')).scalar()
+
+
+def _set_revision(op, revision):
+    op.execute(f'DELETE FROM {VERSION_TABLE}')
+    if revision is not None:
+        op.execute(f"INSERT INTO {VERSION_TABLE} (revision) VALUES ('{revision}')")
+
+
+def _pending_upgrades(start, target):
+    revisions = load_revisions()
+    names = [m.revision for m in revisions]
+    begin = names.index(start) + 1 if start else 0
+    end = names.index(target) + 1 if target else len(names)
+    return revisions[begin:end]
+
+
+def upgrade(engine=None, target=None, start=None):
+    """Upgrade to `target` (default: the newest revision).
+
+    With an engine the migrations run in one transaction and the applied SQL
+    is returned. Without one, the SQL for upgrading from `start` is returned
+    without touching any database.
+    """
+    if engine is None:
+        op = Operations()
+        op.execute(f'CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (revision VARCHAR(32) NOT NULL)')
+        for module in _pending_upgrades(start, target):
+            module.upgrade(op)
+            _set_revision(op, module.revision)
+        return op.statements
+
+    with engine.begin() as connection:
+        op = Operations(connection)
+        op.execute(f'CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (revision VARCHAR(32) NOT NULL)')
+        for module in _pending_upgrades(current_revision(connection), target):
+            logging.info(f"Applying migration {module.revision}: {module.__doc__}")
+            module.upgrade(op)
+            _set_revision(op, module.revision)
+        return op.statements
+
+
+def downgrade(engine=None, target=None, start=None):
+    """Downgrade to `target` (None reverts every migration)."""
+    revisions = load_revisions()
+    names = [m.revision for m in revisions]
+
+    def steps(current):
+        end = names.index(target) + 1 if target else 0
+        begin = names.index(current) + 1 if current else 0
+        return list(reversed(revisions[end:begin]))
+
+    if engine is None:
+        op = Operations()
+        for module in steps(start or (names[-1] if names else None)):
+            module.downgrade(op)
+            _set_revision(op, module.down_revision)
+        return op.statements
+
+    with engine.begin() as connection:
+        op = Operations(connection)
+        for module in steps(current_revision(connection)):
+            logging.info(f"Reverting migration {module.revision}")
+            module.downgrade(op)
+            _set_revision(op, module.down_revision)
+        return op.statements
+
+
+def connect(url):
+    return create_engine(url)
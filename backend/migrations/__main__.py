@@ -0,0 +1,43 @@
+import argparse
+import logging
+
+from migrations import connect, current_revision, downgrade, upgrade
+
+DEFAULT_URL = 'sqlite:///instance/farmers_app.db'
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog='python -m migrations')
+    parser.add_argument('--url', default=DEFAULT_URL, help='database URI')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    up = commands.add_parser('upgrade', help='upgrade to the newest (or given) revision')
+    up.add_argument('revision', nargs='?')
+    up.add_argument('--sql', action='store_true', help='print SQL instead of running it')
+    up.add_argument('--from', dest='start', help='starting revision for --sql')
+
+    down = commands.add_parser('downgrade', help='downgrade to the given revision')
+    down.add_argument('revision', help="target revision, or 'base'")
+    down.add_argument('--sql', action='store_true', help='print SQL instead of running it')
+    down.add_argument('--from', dest='start', help='starting revision for --sql')
+
+    commands.add_parser('current', help='show the applied revision')
+
+    args = parser.parse_args()
+    if args.command == 'current':
+        with connect(args.url).connect() as connection:
+            print(current_revision(connection) or 'base')
+        return
+
+    target = None if args.revision in (None, 'base') else args.revision
+    run = upgrade if args.command == 'upgrade' else downgrade
+    if args.sql:
+        for statement in run(target=target, start=args.start):
+            print(f'{statement};')
+    else:
+        run(connect(args.url), target=target)
+
+
+if __name__ == '__main__':
+    main()
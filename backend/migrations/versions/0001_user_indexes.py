@@ -0,0 +1,26 @@
+"""Add User.mobile_number and per-user lookup indexes"""
+
+revision = '0001'
+down_revision = None
+
+
+def upgrade(op):
+    op.add_column('user', 'mobile_number', 'VARCHAR(15)')
+    op.create_index('ix_user_mobile_number', 'user', ['mobile_number'], unique=True)
+    op.create_index('ix_attendance_user_id_attendance_date', 'attendance', ['user_id', 'attendance_date'])
+    op.create_index('ix_expense_user_id_date', 'expense', ['user_id', 'date'])
+    op.create_index('ix_calendar_user_id_date', 'calendar', ['user_id', 'date'])
+    op.create_index('ix_seed_user_id', 'seed', ['user_id'])
+    op.create_index('ix_medicine_user_id', 'medicine', ['user_id'])
+    op.create_index('ix_contact_user_id', 'contact', ['user_id'])
+
+
+def downgrade(op):
+    op.drop_index('ix_contact_user_id', 'contact')
+    op.drop_index('ix_medicine_user_id', 'medicine')
+    op.drop_index('ix_seed_user_id', 'seed')
+    op.drop_index('ix_calendar_user_id_date', 'calendar')
+    op.drop_index('ix_expense_user_id_date', 'expense')
+    op.drop_index('ix_attendance_user_id_attendance_date', 'attendance')
+    op.drop_index('ix_user_mobile_number', 'user')
+    op.drop_column('user', 'mobile_number')
@@ -0,0 +1,34 @@
+"""Add the expense_rollup table and backfill it from existing expenses"""
+from sqlalchemy import Boolean, Column, Date, Float, ForeignKey, Index, Integer, MetaData, String, Table
+
+revision = '0002'
+down_revision = '0001'
+
+metadata = MetaData()
+Table('user', metadata, Column('id', Integer, primary_key=True))
+
+expense_rollup = Table(
+    'expense_rollup', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('month', Date, nullable=False),
+    Column('category', String(50), nullable=False),
+    Column('settled', Boolean, nullable=False),
+    Column('total', Float, nullable=False),
+    Column('count', Integer, nullable=False),
+    Index('ix_expense_rollup_key', 'user_id', 'month', 'category', 'settled', unique=True),
+)
+
+
+def backfill(connection):
+    from reports import rebuild_expense_rollups
+    rebuild_expense_rollups(connection)
+
+
+def upgrade(op):
+    op.create_table(expense_rollup)
+    op.run(backfill)
+
+
+def downgrade(op):
+    op.drop_table('expense_rollup')
@@ -0,0 +1,41 @@
+"""Add updated_at columns and the change log used by /sync"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+
+revision = '0003'
+down_revision = '0002'
+
+SYNCED_TABLES = ('attendance', 'seed', 'medicine', 'expense', 'calendar', 'contact')
+
+metadata = MetaData()
+Table('user', metadata, Column('id', Integer, primary_key=True))
+
+change_log = Table(
+    'change_log', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('collection', String(50), nullable=False),
+    Column('record_id', Integer, nullable=False),
+    Column('op', String(10), nullable=False),
+    Column('changed_at', DateTime),
+    Index('ix_change_log_user_id_id', 'user_id', 'id'),
+    Index('ix_change_log_collection_record_id', 'collection', 'record_id'),
+)
+
+
+def upgrade(op):
+    for table in SYNCED_TABLES:
+        op.add_column(table, 'updated_at', 'DATETIME')
+    op.create_table(change_log)
+    # Existing rows become the initial state a client receives on its first sync
+    op.execute('DELETE FROM change_log')
+    for table in SYNCED_TABLES:
+        op.execute(
+            f"INSERT INTO change_log (user_id, collection, record_id, op, changed_at) "
+            f"SELECT user_id, '{table}', id, 'upsert', CURRENT_TIMESTAMP FROM {table} ORDER BY id"
+        )
+
+
+def downgrade(op):
+    op.drop_table('change_log')
+    for table in reversed(SYNCED_TABLES):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,18 @@
+"""Store cached forecasts per location in the weather table"""
+
+revision = '0004'
+down_revision = '0003'
+
+
+def upgrade(op):
+    op.add_column('weather', 'location', 'VARCHAR(100)')
+    op.add_column('weather', 'forecast', 'TEXT')
+    op.add_column('weather', 'fetched_at', 'DATETIME')
+    op.create_index('ix_weather_location', 'weather', ['location'], unique=True)
+
+
+def downgrade(op):
+    op.drop_index('ix_weather_location', 'weather')
+    op.drop_column('weather', 'fetched_at')
+    op.drop_column('weather', 'forecast')
+    op.drop_column('weather', 'location')
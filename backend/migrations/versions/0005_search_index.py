@@ -0,0 +1,36 @@
+"""Add the SQLite FTS5 search index and fill it from existing rows"""
+
+revision = '0005'
+down_revision = '0004'
+
+# (table, code packed into the rowid, indexed columns); must match search.SEARCHABLE
+SEARCHABLE_TABLES = (
+    ('attendance', 1, ('worker_name', 'notes')),
+    ('seed', 2, ('name', 'vendor')),
+    ('medicine', 3, ('name', 'vendor')),
+    ('calendar', 4, ('description',)),
+    ('contact', 5, ('name', 'phone_number', 'email')),
+)
+
+
+def upgrade(op):
+    # FTS5 is SQLite only; other databases use the LIKE fallback in search.py
+    if op.dialect not in ('sqlite', None):
+        return
+    op.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5('
+        "owner, text, collection UNINDEXED, record_id UNINDEXED, tokenize='unicode61', prefix='2 3')"
+    )
+    op.execute('DELETE FROM search_index')
+    for table, code, columns in SEARCHABLE_TABLES:
+        document = " || ' ' || ".join(f"COALESCE({c}, '')" for c in columns)
+        op.execute(
+            f'INSERT INTO search_index (rowid, owner, text, collection, record_id) '
+            f"SELECT id * 8 + {code}, 'u' || user_id, {document}, '{table}', id FROM {table}"
+        )
+
+
+def downgrade(op):
+    if op.dialect not in ('sqlite', None):
+        return
+    op.execute('DROP TABLE IF EXISTS search_index')
@@ -0,0 +1,32 @@
+"""Add the attendance_daily summary table and backfill it from existing attendance"""
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, MetaData, String, Table
+
+revision = '0006'
+down_revision = '0005'
+
+metadata = MetaData()
+Table('user', metadata, Column('id', Integer, primary_key=True))
+
+attendance_daily = Table(
+    'attendance_daily', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('day', Date, nullable=False),
+    Column('worker_name', String(100), nullable=False),
+    Column('marks', Integer, nullable=False),
+    Index('ix_attendance_daily_key', 'user_id', 'day', 'worker_name', unique=True),
+)
+
+
+def backfill(connection):
+    from reports import rebuild_attendance_daily
+    rebuild_attendance_daily(connection)
+
+
+def upgrade(op):
+    op.create_table(attendance_daily)
+    op.run(backfill)
+
+
+def downgrade(op):
+    op.drop_table('attendance_daily')
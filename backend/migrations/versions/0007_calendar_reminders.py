@@ -0,0 +1,14 @@
+"""Track sent calendar reminders and index events by date for the reminder scheduler"""
+
+revision = '0007'
+down_revision = '0006'
+
+
+def upgrade(op):
+    op.add_column('calendar', 'reminded_at', 'DATETIME')
+    op.create_index('ix_calendar_date_user_id', 'calendar', ['date', 'user_id'])
+
+
+def downgrade(op):
+    op.drop_index('ix_calendar_date_user_id', 'calendar')
+    op.drop_column('calendar', 'reminded_at')
@@ -0,0 +1,53 @@
+"""Add the photo and photo_upload tables for chunked photo uploads"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+
+revision = '0008'
+down_revision = '0007'
+
+metadata = MetaData()
+Table('user', metadata, Column('id', Integer, primary_key=True))
+Table('calendar', metadata, Column('id', Integer, primary_key=True))
+Table('expense', metadata, Column('id', Integer, primary_key=True))
+
+photo = Table(
+    'photo', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('sha256', String(64), nullable=False),
+    Column('size', Integer, nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('width', Integer),
+    Column('height', Integer),
+    Column('content_type', String(32)),
+    Column('calendar_id', Integer, ForeignKey('calendar.id', ondelete='CASCADE')),
+    Column('expense_id', Integer, ForeignKey('expense.id', ondelete='CASCADE')),
+    Column('created_at', DateTime),
+    Index('ix_photo_user_id', 'user_id'),
+    Index('ix_photo_sha256', 'sha256'),
+    Index('ix_photo_calendar_id', 'calendar_id'),
+    Index('ix_photo_expense_id', 'expense_id'),
+)
+
+photo_upload = Table(
+    'photo_upload', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('size', Integer, nullable=False),
+    Column('received', Integer, nullable=False),
+    Column('sha256', String(64)),
+    Column('calendar_id', Integer, ForeignKey('calendar.id', ondelete='CASCADE')),
+    Column('expense_id', Integer, ForeignKey('expense.id', ondelete='CASCADE')),
+    Column('updated_at', DateTime),
+    Index('ix_photo_upload_user_id', 'user_id'),
+    Index('ix_photo_upload_updated_at', 'updated_at'),
+)
+
+
+def upgrade(op):
+    op.create_table(photo)
+    op.create_table(photo_upload)
+
+
+def downgrade(op):
+    op.drop_table('photo_upload')
+    op.drop_table('photo')
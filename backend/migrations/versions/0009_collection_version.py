@@ -0,0 +1,23 @@
+"""Add the collection_version table behind list ETags"""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table
+
+revision = '0009'
+down_revision = '0008'
+
+metadata = MetaData()
+Table('user', metadata, Column('id', Integer, primary_key=True))
+
+collection_version = Table(
+    'collection_version', metadata,
+    Column('user_id', Integer, ForeignKey('user.id'), primary_key=True),
+    Column('collection', String(50), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def upgrade(op):
+    op.create_table(collection_version)
+
+
+def downgrade(op):
+    op.drop_table('collection_version')
@@ -0,0 +1,26 @@
+"""Add the notification table tracking background SMS delivery"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+
+revision = '0010'
+down_revision = '0009'
+
+metadata = MetaData()
+
+notification = Table(
+    'notification', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('mobile_number', String(15), nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('last_error', String(255)),
+    Column('created_at', DateTime),
+    Column('sent_at', DateTime),
+)
+
+
+def upgrade(op):
+    op.create_table(notification)
+
+
+def downgrade(op):
+    op.drop_table('notification')
@@ -0,0 +1,24 @@
+"""Add the password_reset_otp table holding hashed reset codes"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+revision = '0011'
+down_revision = '0010'
+
+metadata = MetaData()
+
+password_reset_otp = Table(
+    'password_reset_otp', metadata,
+    Column('mobile_number', String(15), primary_key=True),
+    Column('code_hash', String(64), nullable=False),
+    Column('expires_at', DateTime, nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Index('ix_password_reset_otp_expires_at', 'expires_at'),
+)
+
+
+def upgrade(op):
+    op.create_table(password_reset_otp)
+
+
+def downgrade(op):
+    op.drop_table('password_reset_otp')
@@ -0,0 +1,40 @@
+"""Make User.security_question and security_answer optional, as /register never asks for them"""
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table
+
+revision = '0012'
+down_revision = '0011'
+
+SECURITY_COLUMNS = ('security_question', 'security_answer')
+
+
+def user_table(nullable):
+    metadata = MetaData()
+    return Table(
+        'user', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('username', String(80), unique=True, nullable=False),
+        Column('mobile_number', String(15)),
+        Column('password', String(200), nullable=False),
+        Column('security_question', String(255), nullable=nullable),
+        Column('security_answer', String(255), nullable=nullable),
+        Index('ix_user_mobile_number', 'mobile_number', unique=True),
+    )
+
+
+def upgrade(op):
+    if op.dialect in ('sqlite', None):
+        # SQLite cannot drop NOT NULL in place
+        op.rebuild_table(user_table(nullable=True))
+    else:
+        for column in SECURITY_COLUMNS:
+            op.execute(f'ALTER TABLE "user" ALTER COLUMN {column} DROP NOT NULL')
+
+
+def downgrade(op):
+    for column in SECURITY_COLUMNS:
+        op.execute(f"UPDATE \"user\" SET {column} = '' WHERE {column} IS NULL")
+    if op.dialect in ('sqlite', None):
+        op.rebuild_table(user_table(nullable=False))
+    else:
+        for column in SECURITY_COLUMNS:
+            op.execute(f'ALTER TABLE "user" ALTER COLUMN {column} SET NOT NULL')
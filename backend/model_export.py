@@ -0,0 +1,258 @@
+"""Export the trained crop disease model for inference hosts.
+
+    python model_export.py [--model crop_disease_model.pth] [--out exported] [--data dataset_cache]
+
+writes four variants of the model to --out and prints one JSON line per
+variant comparing file size, load time, CPU latency and accuracy:
+
+    crop_disease_model.pth        state_dict checkpoint: architecture, class names and weights
+    crop_disease_model.pt         frozen TorchScript trace, loads without torchvision or this code
+    crop_disease_model.onnx       ONNX graph with a dynamic batch dimension
+    crop_disease_model_int8.pt    TorchScript trace of the model with int8 static quantization
+
+The int8 variant quantizes every convolution and the classifier (FX graph
+mode post-training quantization), with activation ranges calibrated on
+--calibration images from the end of the --data cache. Without --data it
+is calibrated on random images, which gives a model of the right size and
+speed but unreliable predictions; its report row says so.
+
+Accuracy is measured on a dataset_cache.py cache when --data is given and
+is otherwise reported only as top-1 agreement with the float model on
+random inputs. ONNX latency needs the optional onnxruntime package.
+DIAGNOSIS_MODEL_PATH can point at any of the .pth or .pt files.
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import time
+
+import torch
+import torch.nn as nn
+
+from diagnosis import INPUT_SIZE
+
+ARCH = 'resnet18'
+CLASSES_FILE = 'classes.json'  # Extra file holding the class names inside TorchScript archives
+
+
+def build_model(num_classes):
+    """The network trained by database.py, with random weights."""
+    from torchvision import models
+
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, num_classes)
+    return model
+
+
+def save_checkpoint(model, classes, path):
+    torch.save({'arch': ARCH, 'classes': list(classes), 'state_dict': model.state_dict()}, path)
+
+
+def load_model(path):
+    """Load any saved form of the model in eval mode; returns (model, class names or None)."""
+    if path.endswith('.pt'):
+        extra_files = {CLASSES_FILE: ''}
+        model = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        classes = json.loads(extra_files[CLASSES_FILE]) if extra_files[CLASSES_FILE] else None
+    else:
+        try:
+            checkpoint = torch.load(path, map_location='cpu', weights_only=True)
+        except pickle.UnpicklingError:
+            # Whole pickled model, as older versions of database.py saved it
+            checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+        if isinstance(checkpoint, dict):
+            if checkpoint.get('arch') != ARCH:
+                raise ValueError(f"Unsupported model architecture {checkpoint.get('arch')!r} in {path}")
+            model = build_model(len(checkpoint['classes']))
+            model.load_state_dict(checkpoint['state_dict'])
+            classes = checkpoint['classes']
+        else:
+            model, classes = checkpoint, None
+    return model.eval(), classes
+
+
+def _example_input(batch=1):
+    return torch.rand(batch, 3, INPUT_SIZE, INPUT_SIZE)
+
+
+def save_torchscript(model, classes, path):
+    """Trace and freeze (folding batch norm into the convolutions) the model, then save it."""
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, _example_input()))
+    torch.jit.save(traced, path, _extra_files={CLASSES_FILE: json.dumps(classes or [])})
+
+
+def save_onnx(model, path):
+    torch.onnx.export(model, _example_input(), path, input_names=['image'], output_names=['logits'],
+                      dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+                      opset_version=17, dynamo=False)
+
+
+def _quantized_engine():
+    engines = torch.backends.quantized.supported_engines
+    return next((engine for engine in ('x86', 'fbgemm', 'qnnpack') if engine in engines), engines[0])
+
+
+def quantize(model, calibration_batches):
+    """int8 copy of `model` with weights and activations quantized (static post-training quantization).
+
+    Observers are inserted with FX graph mode, so the convolutions are
+    quantized along with the classifier, and `calibration_batches` (float
+    image tensors) are run through it to fix the activation ranges.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = _quantized_engine()
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(engine), (_example_input(),))
+    with torch.inference_mode():
+        for images in calibration_batches:
+            prepared(images)
+    return convert_fx(prepared)
+
+
+def _calibration_batches(data_dir, limit, batch_size=32):
+    """Float image batches for quantize(): the last `limit` images of a dataset cache, or random images."""
+    if not data_dir:
+        return [images for images, _ in _evaluation_batches(None, limit, batch_size)]
+    from torch.utils.data import Subset
+
+    from dataset_cache import CachedImageDataset, make_loader, to_float
+
+    dataset = CachedImageDataset(data_dir)
+    # Taken from the end, so they are not the images the report measures accuracy on
+    subset = Subset(dataset, range(max(0, len(dataset) - limit), len(dataset)))
+    return [to_float(images) for images, _ in make_loader(subset, batch_size=batch_size, shuffle=False, workers=0)]
+
+
+def export_all(model, classes, out_dir, data_dir=None, calibration=256):
+    """Write every variant to out_dir; returns {variant name: path}.
+
+    The int8 variant is calibrated on `calibration` images of the `data_dir`
+    cache, or on random images without one.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        'state_dict': os.path.join(out_dir, 'crop_disease_model.pth'),
+        'torchscript': os.path.join(out_dir, 'crop_disease_model.pt'),
+        'onnx': os.path.join(out_dir, 'crop_disease_model.onnx'),
+        'int8': os.path.join(out_dir, 'crop_disease_model_int8.pt'),
+    }
+    save_checkpoint(model, classes, paths['state_dict'])
+    save_torchscript(model, classes, paths['torchscript'])
+    save_onnx(model, paths['onnx'])
+    save_torchscript(quantize(model, _calibration_batches(data_dir, calibration)), classes, paths['int8'])
+    return paths
+
+
+# ---- Comparison report ----
+
+def _onnx_predictor(path):
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+    session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return lambda images: torch.from_numpy(session.run(None, {'image': images.numpy()})[0])
+
+
+def _torch_predictor(path):
+    model, _ = load_model(path)
+
+    def predict(images):
+        with torch.inference_mode():
+            return model(images)
+    return predict
+
+
+def _latency_ms(predict, runs):
+    image = _example_input()
+    predict(image)  # Warm up (TorchScript optimizes on the first calls)
+    predict(image)
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        predict(image)
+        timings.append(time.perf_counter() - t0)
+    return round(sorted(timings)[len(timings) // 2] * 1000, 2)
+
+
+def _evaluation_batches(data_dir, limit, batch_size=32):
+    """(images, labels) batches from a dataset cache, or random images without labels."""
+    if data_dir:
+        from dataset_cache import CachedImageDataset, make_loader, to_float
+
+        dataset = CachedImageDataset(data_dir)
+        seen = 0
+        for images, labels in make_loader(dataset, batch_size=batch_size, shuffle=False, workers=0):
+            yield to_float(images), labels
+            seen += len(images)
+            if seen >= limit:
+                return
+    else:
+        generator = torch.Generator().manual_seed(0)
+        for start in range(0, limit, batch_size):
+            yield torch.rand(min(batch_size, limit - start), 3, INPUT_SIZE, INPUT_SIZE, generator=generator), None
+
+
+def compare(model, paths, data_dir=None, samples=256, runs=50):
+    """One report row per exported variant; agreement is measured against `model`."""
+    batches = list(_evaluation_batches(data_dir, samples))
+    with torch.inference_mode():
+        reference = [model(images).argmax(dim=1) for images, _ in batches]
+
+    rows = []
+    for name, path in paths.items():
+        row = {'variant': name, 'path': path, 'size_mb': round(os.path.getsize(path) / 2**20, 2)}
+        t0 = time.perf_counter()
+        predict = _onnx_predictor(path) if name == 'onnx' else _torch_predictor(path)
+        row['load_s'] = round(time.perf_counter() - t0, 3)
+        if predict is None:
+            row['note'] = 'install onnxruntime to measure the ONNX model'
+            rows.append(row)
+            continue
+
+        agree = correct = total = 0
+        for (images, labels), expected in zip(batches, reference):
+            predicted = predict(images).argmax(dim=1)
+            agree += (predicted == expected).sum().item()
+            if labels is not None:
+                correct += (predicted == labels).sum().item()
+            total += len(images)
+        row['agreement'] = round(agree / total, 4)
+        if data_dir:
+            row['accuracy'] = round(correct / total, 4)
+        row['latency_ms'] = _latency_ms(predict, runs)
+        if name == 'int8' and not data_dir:
+            row['note'] = 'calibrated on random images; pass --data for a usable int8 model'
+        rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the crop disease model and compare the variants on CPU')
+    parser.add_argument('--model', default='crop_disease_model.pth', help='model saved by database.py')
+    parser.add_argument('--out', default='exported', help='directory for the exported files')
+    parser.add_argument('--data', help='dataset_cache.py cache to measure accuracy on')
+    parser.add_argument('--samples', type=int, default=256, help='images used to measure accuracy')
+    parser.add_argument('--calibration', type=int, default=256,
+                        help='images (from the end of --data) used to calibrate the int8 model')
+    parser.add_argument('--runs', type=int, default=50, help='single-image runs used to measure latency')
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0: default)')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, classes = load_model(args.model)
+    if classes is None:
+        if os.path.exists('crop_disease_classes.json'):
+            with open('crop_disease_classes.json') as f:
+                classes = json.load(f)
+        else:
+            classes = [str(i) for i in range(model.fc.out_features)]
+    paths = export_all(model, classes, args.out, args.data, args.calibration)
+    for row in compare(model, paths, args.data, args.samples, args.runs):
+        print(json.dumps(row))
@@ -7,9 +7,10 @@ db = SQLAlchemy()
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
+    mobile_number = db.Column(db.String(15), unique=True, index=True, nullable=True)
     password = db.Column(db.String(200), nullable=False)
-    security_question = db.Column(db.String(255), nullable=False)
-    security_answer = db.Column(db.String(255), nullable=False)
+    security_question = db.Column(db.String(255), nullable=True)
+    security_answer = db.Column(db.String(255), nullable=True)
 
 # ---- Attendance Model ----
 class Attendance(db.Model):
@@ -18,8 +19,11 @@ class Attendance(db.Model):
     attendance_date = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.String(255), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Associate with User
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user = db.relationship('User', backref=db.backref('attendances', lazy=True))
 
+    __table_args__ = (db.Index('ix_attendance_user_id_attendance_date', 'user_id', 'attendance_date'),)
+
     def __repr__(self):
         return f'<Attendance {self.worker_name} on {self.attendance_date}>'
 
@@ -31,7 +35,8 @@ class Seed(db.Model):
     quality = db.Column(db.String(50), nullable=False)
     vendor = db.Column(db.String(100), nullable=False)
     vendor_url = db.Column(db.String(255), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Associate with User
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # Associate with User
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<Seed {self.name}>'
@@ -43,7 +48,8 @@ class Medicine(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     vendor = db.Column(db.String(100), nullable=False)
     vendor_url = db.Column(db.String(255), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Associate with User
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # Associate with User
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 # ---- Expense Model ----
 class Expense(db.Model):
@@ -54,12 +60,85 @@ class Expense(db.Model):
     category = db.Column(db.String(50), nullable=True)
     settled = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Associate with User
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_expense_user_id_date', 'user_id', 'date'),)
+
+# ---- Expense Rollup Model ----
+# Per-user, per-month totals of Expense, kept up to date by reports.py
+class ExpenseRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    category = db.Column(db.String(50), nullable=False, default='')  # '' for uncategorized
+    settled = db.Column(db.Boolean, nullable=False, default=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_expense_rollup_key', 'user_id', 'month', 'category', 'settled', unique=True),)
+
+# ---- Attendance Daily Summary Model ----
+# Marks per worker per day, kept up to date by reports.py; a day counts once however many marks it has
+class AttendanceDaily(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    worker_name = db.Column(db.String(100), nullable=False)
+    marks = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_attendance_daily_key', 'user_id', 'day', 'worker_name', unique=True),)
+
+# ---- Collection Version Model ----
+# Per-user write counter of each list resource, used as its ETag (see versioning.py)
+class CollectionVersion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    collection = db.Column(db.String(50), primary_key=True)  # Table name of the resource
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# ---- Change Log Model ----
+# Latest change of every per-user record, read by the /sync endpoint (see sync.py).
+# Each id is a sync token: clients ask for the changes with a higher id.
+class ChangeLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    collection = db.Column(db.String(50), nullable=False)  # Table name of the resource
+    record_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_change_log_user_id_id', 'user_id', 'id'),
+        db.Index('ix_change_log_collection_record_id', 'collection', 'record_id'),
+    )
+
+# ---- Notification Model ----
+# Delivery status of an outbound SMS; the message itself is only kept in memory
+class Notification(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # Random hex id, safe to hand to clients
+    mobile_number = db.Column(db.String(15), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, retrying, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+# ---- Password Reset OTP Model ----
+# One outstanding OTP per mobile number, stored as a keyed hash (see otp_store.py)
+class PasswordResetOTP(db.Model):
+    mobile_number = db.Column(db.String(15), primary_key=True)
+    code_hash = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
 
 # ---- Weather Model ----
+# Cached forecast per normalized location (see weather.py)
 class Weather(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     condition = db.Column(db.String(200), nullable=False)
     date = db.Column(db.Date, nullable=False)
+    location = db.Column(db.String(100), nullable=True, unique=True, index=True)
+    forecast = db.Column(db.Text, nullable=True)  # Upstream JSON response
+    fetched_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<Weather {self.condition} on {self.date}>'
@@ -70,6 +149,40 @@ class Calendar(db.Model):
     date = db.Column(db.Date, nullable=False)
     description = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    reminded_at = db.Column(db.DateTime, nullable=True)  # When the reminder SMS was queued
+
+    __table_args__ = (
+        db.Index('ix_calendar_user_id_date', 'user_id', 'date'),
+        # Due reminders are found by date across all users
+        db.Index('ix_calendar_date_user_id', 'date', 'user_id'),
+    )
+
+# ---- Photo Models ----
+# A photo attached to a calendar event or an expense; the image files are stored once per sha256 (photos.py)
+class Photo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False)  # processing, ready or failed
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(32), nullable=True)  # Of the original, e.g. image/jpeg
+    calendar_id = db.Column(db.Integer, db.ForeignKey('calendar.id', ondelete='CASCADE'), nullable=True, index=True)
+    expense_id = db.Column(db.Integer, db.ForeignKey('expense.id', ondelete='CASCADE'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# An upload in progress; its bytes so far are in PHOTO_DIR/incoming/<id>
+class PhotoUpload(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # Random token, so upload URLs can't be guessed
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    size = db.Column(db.Integer, nullable=False)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), nullable=True)  # Announced by the client, checked on completion
+    calendar_id = db.Column(db.Integer, db.ForeignKey('calendar.id', ondelete='CASCADE'), nullable=True)
+    expense_id = db.Column(db.Integer, db.ForeignKey('expense.id', ondelete='CASCADE'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 # ---- Contact Model ----
 class Contact(db.Model):
@@ -77,4 +190,5 @@ class Contact(db.Model):
     name = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(15), nullable=False)
     email = db.Column(db.String(100), nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Associate with User
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # Associate with User
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,135 @@
+"""Background delivery of SMS notifications (password-reset OTPs).
+
+Request handlers create a `Notification` row and call `queue.enqueue(...)`;
+a bounded thread pool then delivers the message through the SMS gateway with
+a timeout, retrying with exponential backoff, and records the outcome on the
+row so clients can poll for it. SMS_BACKEND selects the sender: 'fast2sms'
+for the real gateway or 'log' to only log messages during development.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from models import db, Notification
+
+
+class SMSError(Exception):
+    pass
+
+
+class Fast2SMSSender:
+    """Sends SMS through the Fast2SMS bulk API over a pooled HTTP session."""
+
+    def __init__(self, url, api_key, timeout, pool_size):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, mobile_number, message):
+        payload = {
+            'authorization': self.api_key,
+            'sender_id': 'FSTSMS',
+            'message': message,
+            'language': 'english',
+            'route': 'p',
+            'numbers': mobile_number
+        }
+        headers = {'cache-control': 'no-cache'}
+        try:
+            response = self.session.post(self.url, data=payload, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SMSError(str(e))
+        logging.info(f"SMS gateway response: {response.status_code}, {response.text[:200]}")
+        if response.status_code != 200:
+            raise SMSError(f'Gateway returned {response.status_code}')
+
+
+class LogSender:
+    """Logs messages instead of sending them and keeps them in `sent`."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, mobile_number, message):
+        logging.info(f"SMS to {mobile_number}: {message}")
+        self.sent.append((mobile_number, message))
+
+
+class NotificationQueue:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SMS_GATEWAY_URL', 'https://www.fast2sms.com/dev/bulkV2')
+        app.config.setdefault('SMS_API_KEY', '')
+        app.config.setdefault('SMS_TIMEOUT', 5)  # Seconds per gateway call
+        app.config.setdefault('SMS_MAX_ATTEMPTS', 4)
+        app.config.setdefault('SMS_RETRY_BACKOFF', 2)  # Seconds before the first retry, doubled each time
+        app.config.setdefault('NOTIFICATION_WORKERS', 4)
+        app.config.setdefault('SMS_BACKEND', 'fast2sms')
+
+        self.app = app
+        workers = app.config['NOTIFICATION_WORKERS']
+        if app.config['SMS_BACKEND'] == 'log':
+            self.sender = LogSender()
+        elif app.config['SMS_BACKEND'] == 'fast2sms':
+            self.sender = Fast2SMSSender(app.config['SMS_GATEWAY_URL'], app.config['SMS_API_KEY'],
+                                         app.config['SMS_TIMEOUT'], workers)
+        else:
+            raise ValueError(f"Unsupported SMS_BACKEND: {app.config['SMS_BACKEND']}")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notify')
+
+    def enqueue(self, mobile_number, message):
+        """Record a pending notification and schedule its delivery.
+
+        Must be called inside a request or app context; the row is committed
+        before the send is scheduled. Returns the notification id.
+        """
+        notification = Notification(id=uuid.uuid4().hex, mobile_number=mobile_number)
+        db.session.add(notification)
+        db.session.commit()
+        self.executor.submit(self._deliver, notification.id, mobile_number, message)
+        return notification.id
+
+    def _deliver(self, notification_id, mobile_number, message):
+        with self.app.app_context():
+            notification = db.session.get(Notification, notification_id)
+            notification.attempts += 1
+            try:
+                self.sender.send(mobile_number, message)
+            except SMSError as e:
+                logging.error(f"Notification {notification_id} attempt {notification.attempts} failed: {e}")
+                notification.last_error = str(e)[:255]
+                if notification.attempts >= self.app.config['SMS_MAX_ATTEMPTS']:
+                    notification.status = 'failed'
+                else:
+                    notification.status = 'retrying'
+                    delay = self.app.config['SMS_RETRY_BACKOFF'] * 2 ** (notification.attempts - 1)
+                    self._retry_later(delay, notification_id, mobile_number, message)
+            except Exception as e:
+                logging.error(f"Notification {notification_id} failed: {e}")
+                notification.status = 'failed'
+                notification.last_error = str(e)[:255]
+            else:
+                notification.status = 'sent'
+                notification.sent_at = datetime.utcnow()
+            db.session.commit()
+
+    def _retry_later(self, delay, *args):
+        timer = threading.Timer(delay, self.executor.submit, (self._deliver, *args))
+        timer.daemon = True
+        timer.start()
+
+    def status(self, notification_id):
+        return db.session.get(Notification, notification_id)
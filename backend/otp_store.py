@@ -0,0 +1,98 @@
+"""Password-reset OTPs kept in their own table instead of on the User row.
+
+Codes are stored as an HMAC of the mobile number and code, expire after
+OTP_TTL, and are locked after OTP_MAX_ATTEMPTS wrong guesses. Expired rows
+are purged by a background sweep every OTP_SWEEP_INTERVAL seconds.
+"""
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+from models import db, PasswordResetOTP
+
+# Results of OTPStore.verify
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+class OTPStore:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OTP_TTL', timedelta(minutes=5))
+        app.config.setdefault('OTP_MAX_ATTEMPTS', 5)
+        app.config.setdefault('OTP_SWEEP_INTERVAL', 60)  # Seconds; 0 disables the sweep
+        self.app = app
+        if app.config['OTP_SWEEP_INTERVAL']:
+            threading.Thread(target=self._sweep_forever, name='otp-sweep', daemon=True).start()
+
+    def _hash(self, mobile_number, code):
+        key = self.app.config['JWT_SECRET_KEY'].encode()
+        return hmac.new(key, f'{mobile_number}:{code}'.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, mobile_number):
+        """Create (or replace) the OTP for `mobile_number` and return the code."""
+        code = f'{secrets.randbelow(900000) + 100000}'
+        db.session.merge(PasswordResetOTP(
+            mobile_number=mobile_number,
+            code_hash=self._hash(mobile_number, code),
+            expires_at=datetime.utcnow() + self.app.config['OTP_TTL'],
+            attempts=0,
+        ))
+        db.session.commit()
+        return code
+
+    def verify(self, mobile_number, code):
+        """Check `code` against the stored OTP with a constant-time comparison.
+
+        Every guess first claims one of the OTP's OTP_MAX_ATTEMPTS attempts
+        with a single conditional UPDATE, so concurrent guesses cannot get
+        past the limit by reading the same count. A valid OTP is consumed;
+        once the attempts are used up it stays locked until it expires.
+        """
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(PasswordResetOTP)
+            .where(PasswordResetOTP.mobile_number == mobile_number,
+                   PasswordResetOTP.expires_at > now,
+                   PasswordResetOTP.attempts < self.app.config['OTP_MAX_ATTEMPTS'])
+            .values(attempts=PasswordResetOTP.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        otp = db.session.get(PasswordResetOTP, mobile_number)
+        if not claimed:
+            return EXPIRED if otp is None or otp.expires_at <= now else LOCKED
+        if otp is None or not hmac.compare_digest(otp.code_hash, self._hash(mobile_number, str(code))):
+            return INVALID
+
+        # Deleted only if still the same code, so a concurrent reset cannot consume it twice
+        consumed = db.session.execute(
+            delete(PasswordResetOTP)
+            .where(PasswordResetOTP.mobile_number == mobile_number, PasswordResetOTP.code_hash == otp.code_hash)
+        ).rowcount
+        db.session.commit()
+        return VALID if consumed else EXPIRED
+
+    def purge_expired(self):
+        deleted = PasswordResetOTP.query.filter(PasswordResetOTP.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        return deleted
+
+    def _sweep_forever(self):
+        stop = threading.Event()
+        while not stop.wait(self.app.config['OTP_SWEEP_INTERVAL']):
+            try:
+                with self.app.app_context():
+                    self.purge_expired()
+            except Exception as e:
+                logging.error(f"Error purging expired OTPs: {e}")
@@ -0,0 +1,102 @@
+from datetime import date, datetime
+
+from flask import Response, request, jsonify
+
+from models import db
+from serialization import json_response, records, select_fields
+from versioning import collection_etag
+
+# Page size when only `after` is given, and the largest `limit` accepted.
+# Without `limit` or `after` a list endpoint returns every row, as it always did,
+# because clients that don't follow X-Next-Cursor would otherwise lose rows silently.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def serialize_value(value):
+    # All list endpoints expose dates as plain YYYY-MM-DD strings
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def parse_page_args(columns):
+    """Read `limit`, `after` and `fields` from the query string.
+
+    `columns` maps the public field names of a resource to model columns.
+    Returns (limit, after, selected_field_names); limit is None when the
+    client asked for neither `limit` nor `after`, i.e. for all rows.
+    """
+    limit = request.args.get('limit')
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE if 'after' in request.args else None
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('limit must be an integer')
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise PaginationError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise PaginationError('after must be an integer cursor')
+
+    fields = request.args.get('fields')
+    if fields:
+        selected = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in selected if f not in columns]
+        if unknown:
+            raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+        # The id is always returned since it is the pagination cursor
+        if 'id' not in selected:
+            selected.insert(0, 'id')
+    else:
+        selected = list(columns)
+
+    return limit, after, selected
+
+
+def list_response(model, user_id, columns, filters=()):
+    """Return the `model` rows owned by `user_id`, keyset-paginated when asked.
+
+    Clients opt in to pages by sending `limit` or `after`; otherwise every
+    row is returned in one response. Only the requested columns are
+    selected, as plain tuples with dates already formatted by the database
+    (see serialization.py). When a page is full, the id of its last row is
+    sent back in the `X-Next-Cursor` header and can be passed as `after` to
+    fetch the next page. Responses carry an ETag derived from the user's
+    collection version; a matching If-None-Match gets a 304 without querying
+    `model` at all.
+    """
+    try:
+        limit, after, selected = parse_page_args(columns)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
+
+    etag = collection_etag(user_id, model.__tablename__)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    query = select_fields(columns, selected).where(model.user_id == user_id, *filters)
+    if after is not None:
+        query = query.where(model.id > after)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = db.session.execute(query).all()
+
+    response = json_response(records(selected, rows))
+    if limit is not None and len(rows) == limit:
+        response.headers['X-Next-Cursor'] = str(rows[-1][selected.index('id')])
+    response.set_etag(etag, weak=True)
+    return response
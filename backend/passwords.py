@@ -0,0 +1,51 @@
+"""Password hashing with a configurable algorithm and optional process pool.
+
+PASSWORD_HASH_METHOD is any werkzeug method string (e.g. 'scrypt' or
+'pbkdf2:sha256:600000'). Hashes made with a different method or cost are
+upgraded on the next successful login. With PASSWORD_HASH_WORKERS > 0 the
+hashing runs in that many worker processes, so concurrent logins use every
+core instead of queueing behind the GIL.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 0)  # 0 hashes on the request thread
+        self.app = app
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        # werkzeug fills in default parameters, so learn the full method string once
+        self.method_prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _run(self, func, *args):
+        workers = self.app.config['PASSWORD_HASH_WORKERS']
+        if not workers:
+            return func(*args)
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, not fork: the app process already runs background threads
+                    self._pool = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pool.submit(func, *args).result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != self.method_prefix
@@ -0,0 +1,370 @@
+"""Chunked, resumable photo uploads with background thumbnailing.
+
+A photo is attached to one calendar event or expense and uploaded in pieces:
+
+    POST /photos/uploads        {"size": bytes, "calendar_id" | "expense_id", "sha256": optional}
+    PUT  /photos/uploads/<id>   raw bytes of the next chunk, with its position in the Upload-Offset header
+    GET  /photos/uploads/<id>   bytes received so far, to resume after a dropped connection
+
+Chunks are streamed to PHOTO_DIR/incoming (PHOTO_DIR is instance/photos
+unless configured) as they arrive and never held whole in memory. When the
+last one lands, the file is hashed and moved to PHOTO_DIR/originals/<sha256>,
+so identical content is stored and processed once however many entries it
+is attached to. A user announcing the sha256 of a photo they already
+uploaded gets it attached without sending it again.
+
+A pool of PHOTO_WORKERS threads (Pillow releases the GIL while decoding and
+resizing) then writes a JPEG thumbnail no larger than PHOTO_THUMBNAIL_SIZE
+and the 224x224 image the diagnosis model takes, and moves the photo's status
+from 'processing' to 'ready', or 'failed' if the file is not an image.
+Uploads left unfinished for PHOTO_UPLOAD_TTL are swept every
+PHOTO_SWEEP_INTERVAL seconds.
+"""
+import hashlib
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, or_, select, update
+from sqlalchemy.orm import Session
+
+from diagnosis import INPUT_SIZE
+from models import db, Calendar, Expense, Photo, PhotoUpload
+
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+KINDS = ('original', 'thumbnail', 'input')
+COPY_BUFFER = 64 * 1024
+SHA256_HEX = set('0123456789abcdef')
+# session.info keys for files to remove once a deletion is committed
+DELETED_PHOTOS = 'deleted_photos'
+DELETED_UPLOADS = 'deleted_uploads'
+
+
+class PhotoError(Exception):
+    status = 400
+
+
+class PhotoTooLarge(PhotoError):
+    status = 413
+
+
+class OffsetMismatch(PhotoError):
+    status = 409
+
+    def __init__(self, offset):
+        super().__init__(f'Expected Upload-Offset {offset}')
+        self.offset = offset
+
+
+def make_derivatives(original, thumbnail, model_input, thumbnail_size):
+    """Write the thumbnail and model input of `original` (unless present).
+
+    Returns the original's (width, height, content type).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(original) as image:
+        width, height = image.size
+        content_type = Image.MIME.get(image.format, 'application/octet-stream')
+        if os.path.exists(thumbnail) and os.path.exists(model_input):
+            return width, height, content_type
+        # Let the JPEG decoder downscale by a power of two, to no less than the largest output
+        image.draft('RGB', (max(thumbnail_size, INPUT_SIZE),) * 2)
+        image = image.convert('RGB')
+
+        preview = ImageOps.exif_transpose(image)
+        preview.thumbnail((thumbnail_size, thumbnail_size))
+        _save(preview, thumbnail, 'JPEG', quality=85)
+        # Resized as diagnosis.preprocess does, so it can be fed to the model as is
+        _save(image.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR), model_input, 'PNG')
+    return width, height, content_type
+
+
+def _save(image, path, image_format, **options):
+    # Written aside and renamed, so a half-written file is never served
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(temporary, image_format, **options)
+    os.replace(temporary, path)
+
+
+@event.listens_for(Session, 'before_flush')
+def delete_entry_photos(session, flush_context, instances):
+    """Delete the photos and uploads of calendar events and expenses being deleted.
+
+    Runs before the flush deletes the entries, so it also wins over the
+    database's own ON DELETE action where foreign keys are enforced.
+    """
+    calendar_ids = [obj.id for obj in session.deleted if isinstance(obj, Calendar)]
+    expense_ids = [obj.id for obj in session.deleted if isinstance(obj, Expense)]
+    if not calendar_ids and not expense_ids:
+        return
+
+    connection = session.connection()
+    photos = connection.execute(
+        delete(Photo).where(or_(Photo.calendar_id.in_(calendar_ids), Photo.expense_id.in_(expense_ids)))
+        .returning(Photo.sha256)
+    ).scalars().all()
+    uploads = connection.execute(
+        delete(PhotoUpload).where(or_(PhotoUpload.calendar_id.in_(calendar_ids),
+                                      PhotoUpload.expense_id.in_(expense_ids)))
+        .returning(PhotoUpload.id)
+    ).scalars().all()
+    # The files go after the commit (PhotoStore._remove_deleted_files), not if the deletion is rolled back
+    session.info.setdefault(DELETED_PHOTOS, set()).update(photos)
+    session.info.setdefault(DELETED_UPLOADS, set()).update(uploads)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_deleted_files(session):
+    session.info.pop(DELETED_PHOTOS, None)
+    session.info.pop(DELETED_UPLOADS, None)
+
+
+def photo_record(photo):
+    return {
+        'id': photo.id,
+        'sha256': photo.sha256,
+        'size': photo.size,
+        'status': photo.status,
+        'width': photo.width,
+        'height': photo.height,
+        'content_type': photo.content_type,
+        'calendar_id': photo.calendar_id,
+        'expense_id': photo.expense_id,
+        'created_at': photo.created_at.isoformat() if photo.created_at else None,
+    }
+
+
+class PhotoStore:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PHOTO_DIR', os.path.join(app.instance_path, 'photos'))
+        app.config.setdefault('PHOTO_MAX_BYTES', 25 * 1024 * 1024)
+        app.config.setdefault('PHOTO_CHUNK_BYTES', 4 * 1024 * 1024)  # Largest body accepted per PUT
+        app.config.setdefault('PHOTO_THUMBNAIL_SIZE', 320)  # Pixels, longest side
+        app.config.setdefault('PHOTO_WORKERS', 2)  # 0 processes photos on the request thread
+        app.config.setdefault('PHOTO_UPLOAD_TTL', timedelta(days=1))
+        app.config.setdefault('PHOTO_SWEEP_INTERVAL', 3600)  # Seconds; 0 disables the sweep
+        self.app = app
+        self.root = os.path.abspath(app.config['PHOTO_DIR'])
+        os.makedirs(os.path.join(self.root, 'incoming'), exist_ok=True)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        event.listen(Session, 'after_commit', self._remove_deleted_files)
+        if app.config['PHOTO_SWEEP_INTERVAL']:
+            threading.Thread(target=self._sweep_forever, name='photo-sweep', daemon=True).start()
+
+    def path(self, kind, sha256):
+        """Where the `kind` ('original', 'thumbnail' or 'input') file of a photo is stored."""
+        extension = {'original': '', 'thumbnail': '.jpg', 'input': '.png'}[kind]
+        # Fanned out over 256 directories so none grows too large
+        return os.path.join(self.root, kind + 's', sha256[:2], sha256 + extension)
+
+    def _incoming(self, upload_id):
+        return os.path.join(self.root, 'incoming', upload_id)
+
+    # ---- Uploads ----
+
+    def _entry(self, user_id, calendar_id, expense_id):
+        if bool(calendar_id) == bool(expense_id):
+            raise PhotoError('Exactly one of calendar_id and expense_id is required')
+        model, entry_id = (Calendar, calendar_id) if calendar_id else (Expense, expense_id)
+        if not model.query.filter_by(id=entry_id, user_id=user_id).first():
+            raise PhotoError(f'{"Calendar event" if calendar_id else "Expense"} not found')
+        return {'calendar_id': calendar_id, 'expense_id': expense_id}
+
+    def _attached(self, user_id, sha256, link):
+        return Photo.query.filter_by(user_id=user_id, sha256=sha256, **link).first()
+
+    def create_upload(self, user_id, data):
+        """Start an upload; returns (PhotoUpload, None), or (None, Photo) when no bytes need sending."""
+        size = data.get('size')
+        if not isinstance(size, int) or size <= 0:
+            raise PhotoError('size must be a positive number of bytes')
+        if size > self.app.config['PHOTO_MAX_BYTES']:
+            raise PhotoTooLarge('Photo is too large')
+        sha256 = data.get('sha256')
+        if sha256 is not None and not (isinstance(sha256, str) and len(sha256) == 64 and set(sha256) <= SHA256_HEX):
+            raise PhotoError('sha256 must be 64 lowercase hex digits')
+        link = self._entry(user_id, data.get('calendar_id'), data.get('expense_id'))
+
+        # Only content this user already uploaded is attached by hash, so a hash alone never grants a photo
+        if sha256:
+            existing = Photo.query.filter_by(user_id=user_id, sha256=sha256).first()
+            if existing:
+                photo = self._attached(user_id, sha256, link)
+                if photo is None:
+                    photo = Photo(user_id=user_id, sha256=sha256, size=existing.size, status=existing.status,
+                                  width=existing.width, height=existing.height,
+                                  content_type=existing.content_type, **link)
+                    db.session.add(photo)
+                    db.session.commit()
+                return None, photo
+
+        upload = PhotoUpload(id=secrets.token_hex(16), user_id=user_id, size=size, sha256=sha256, **link)
+        open(self._incoming(upload.id), 'wb').close()
+        db.session.add(upload)
+        db.session.commit()
+        return upload, None
+
+    def write_chunk(self, upload, offset, stream, length):
+        """Append the next chunk from `stream`; returns the Photo once the upload is complete, else None."""
+        if offset != upload.received:
+            raise OffsetMismatch(upload.received)
+        if length is None:
+            raise PhotoError('Content-Length is required')
+        if length > self.app.config['PHOTO_CHUNK_BYTES']:
+            raise PhotoTooLarge(f"Chunks may be at most {self.app.config['PHOTO_CHUNK_BYTES']} bytes")
+        if offset + length > upload.size:
+            raise PhotoError('Chunk goes past the declared size')
+
+        written = 0
+        with open(self._incoming(upload.id), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(COPY_BUFFER, length - written))
+                if not block:
+                    break  # Client went away; what arrived is kept and the upload resumes from there
+                f.write(block)
+                written += len(block)
+
+        # Only one of two racing requests for the same offset moves it on
+        moved = db.session.execute(
+            update(PhotoUpload)
+            .where(PhotoUpload.id == upload.id, PhotoUpload.received == offset)
+            .values(received=offset + written)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not moved:
+            received = db.session.query(PhotoUpload.received).filter_by(id=upload.id).scalar()
+            if received is None:
+                raise PhotoError('The upload was completed by another request')
+            raise OffsetMismatch(received)
+        db.session.refresh(upload)
+        if written < length:
+            raise PhotoError('Chunk ended early')
+        return self._complete(upload) if upload.received == upload.size else None
+
+    def _hash(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _complete(self, upload):
+        incoming = self._incoming(upload.id)
+        sha256 = self._hash(incoming)
+        link = {'calendar_id': upload.calendar_id, 'expense_id': upload.expense_id}
+        db.session.delete(upload)
+        if upload.sha256 and upload.sha256 != sha256:
+            db.session.commit()
+            os.remove(incoming)
+            raise PhotoError('The uploaded bytes do not match sha256')
+
+        original = self.path('original', sha256)
+        if os.path.exists(original):
+            os.remove(incoming)  # Already stored for another upload
+        else:
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            os.replace(incoming, original)
+
+        photo = self._attached(upload.user_id, sha256, link)
+        if photo is None:
+            photo = Photo(user_id=upload.user_id, sha256=sha256, size=upload.size, status=PROCESSING, **link)
+            db.session.add(photo)
+        db.session.commit()
+        if photo.status != READY:
+            self._submit(sha256)
+        return photo
+
+    def delete(self, photo):
+        """Remove a photo, and its files unless another photo has the same content."""
+        db.session.info.setdefault(DELETED_PHOTOS, set()).add(photo.sha256)
+        db.session.delete(photo)
+        db.session.commit()
+
+    def _remove_deleted_files(self, session):
+        hashes = session.info.pop(DELETED_PHOTOS, set())
+        for upload_id in session.info.pop(DELETED_UPLOADS, ()):
+            if os.path.exists(self._incoming(upload_id)):
+                os.remove(self._incoming(upload_id))
+        if not hashes:
+            return
+        # The session can't run queries once committed, so check for other references on a connection of its own
+        with db.engine.connect() as connection:
+            hashes -= set(connection.execute(select(Photo.sha256).where(Photo.sha256.in_(hashes))).scalars())
+        for sha256 in hashes:
+            for kind in KINDS:
+                if os.path.exists(self.path(kind, sha256)):
+                    os.remove(self.path(kind, sha256))
+
+    # ---- Processing ----
+
+    def _submit(self, sha256):
+        paths = [self.path(kind, sha256) for kind in KINDS]
+        for path in paths[1:]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        args = (*paths, self.app.config['PHOTO_THUMBNAIL_SIZE'])
+
+        workers = self.app.config['PHOTO_WORKERS']
+        if not workers:
+            future = Future()
+            try:
+                future.set_result(make_derivatives(*args))
+            except Exception as e:
+                future.set_exception(e)
+            self._finished(sha256, future)
+            return
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photos')
+        self._pool.submit(make_derivatives, *args).add_done_callback(lambda future: self._finished(sha256, future))
+
+    def _finished(self, sha256, future):
+        try:
+            width, height, content_type = future.result()
+            values = {'status': READY, 'width': width, 'height': height, 'content_type': content_type}
+        except Exception as e:
+            logging.error(f"Could not process photo {sha256}: {e}")
+            values = {'status': FAILED}
+        # Every photo with this content, including ones attached while it was processing
+        with self.app.app_context():
+            db.session.execute(update(Photo).where(Photo.sha256 == sha256, Photo.status == PROCESSING).values(**values))
+            db.session.commit()
+
+    # ---- Sweep ----
+
+    def purge_stale(self):
+        """Drop uploads idle for longer than PHOTO_UPLOAD_TTL; needs an app context."""
+        cutoff = datetime.utcnow() - self.app.config['PHOTO_UPLOAD_TTL']
+        stale = [upload_id for (upload_id,) in
+                 db.session.query(PhotoUpload.id).filter(PhotoUpload.updated_at < cutoff)]
+        if stale:
+            PhotoUpload.query.filter(PhotoUpload.id.in_(stale)).delete(synchronize_session=False)
+            db.session.commit()
+        for upload_id in stale:
+            if os.path.exists(self._incoming(upload_id)):
+                os.remove(self._incoming(upload_id))
+        return len(stale)
+
+    def _sweep_forever(self):
+        stop = threading.Event()
+        while not stop.wait(self.app.config['PHOTO_SWEEP_INTERVAL']):
+            try:
+                with self.app.app_context():
+                    self.purge_stale()
+            except Exception as e:
+                logging.error(f"Error purging stale photo uploads: {e}")
@@ -0,0 +1,238 @@
+"""Per-user and per-IP rate limits with counters in shared storage.
+
+Each request is assigned a route family: 'auth', 'exports', 'diagnose' and
+'uploads' are marked on the view with `@rate_limits.family(...)`, other
+POST/PUT/PATCH/DELETE requests are 'writes' and plain reads are not limited.
+A family has a limit per user and a looser one per client IP, so farmers
+behind one carrier NAT do not share a single bucket. The user is the JWT
+identity, or for the unauthenticated auth routes the username/mobile number
+being tried together with the client IP, so that someone hammering an
+account from elsewhere cannot lock its owner out. Behind a reverse proxy,
+set TRUSTED_PROXIES in app.py so the client IP is taken from X-Forwarded-For.
+
+Limits use a sliding window counter: the count of the current fixed window
+plus the previous window's count weighted by how much of it still overlaps
+the sliding window. The counters live in a store chosen by URL:
+
+    memory://                        per-process dict (each worker counts separately)
+    sqlite:////path/to/ratelimit.db  SQLite file shared by every worker on a host
+    redis://host:6379/0              any Redis-protocol server (needs the `redis` package)
+"""
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# family -> {'user': limit, 'ip': limit}; None means unlimited
+DEFAULT_LIMITS = {
+    'auth': {'user': '5 per minute', 'ip': '60 per minute'},
+    'writes': {'user': '120 per minute', 'ip': '1200 per minute'},
+    'exports': {'user': '10 per minute', 'ip': '60 per minute'},
+    'diagnose': {'user': '30 per minute', 'ip': '300 per minute'},
+    # Photo chunks: a batch of photos sent in small chunks takes many requests
+    'uploads': {'user': '600 per minute', 'ip': '6000 per minute'},
+}
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """'5 per minute' -> (5, 60)."""
+    match = re.fullmatch(r'\s*(\d+)\s*(?:per|/)\s*(second|minute|hour|day)s?\s*', limit or '')
+    if not match:
+        raise ValueError(f'Invalid rate limit: {limit!r}')
+    return int(match.group(1)), PERIODS[match.group(2)]
+
+
+class WindowStore(ABC):
+    @abstractmethod
+    def hit(self, key, window, now):
+        """Count a hit on `key` and return (current, previous) fixed-window counts.
+
+        `window` is the window length in seconds; windows are numbered
+        floor(now / window).
+        """
+
+
+class MemoryWindowStore(WindowStore):
+    # Counters older than the previous window are dropped once every SWEEP_INTERVAL seconds
+    SWEEP_INTERVAL = 1
+
+    def __init__(self):
+        self._counts = {}  # (key, window, window index) -> count
+        self._lock = threading.Lock()
+        self._swept = 0
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        with self._lock:
+            current = self._counts.get((key, window, index), 0) + 1
+            self._counts[(key, window, index)] = current
+            previous = self._counts.get((key, window, index - 1), 0)
+            if now - self._swept >= self.SWEEP_INTERVAL:
+                self._swept = now
+                self._counts = {k: v for k, v in self._counts.items() if k[2] >= int(now // k[1]) - 1}
+        return current, previous
+
+
+class SQLiteWindowStore(WindowStore):
+    """Counters in a SQLite file so that every worker process shares them."""
+
+    # Old windows are purged once every PURGE_INTERVAL hits
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limit '
+                         '(key TEXT NOT NULL, window INTEGER NOT NULL, expires_at REAL NOT NULL, '
+                         'count INTEGER NOT NULL, PRIMARY KEY (key, window)) WITHOUT ROWID')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        with self._connect() as conn:
+            current = conn.execute(
+                'INSERT INTO rate_limit (key, window, expires_at, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (key, window) DO UPDATE SET count = count + 1 RETURNING count',
+                (key, index, (index + 2) * window),
+            ).fetchone()[0]
+            row = conn.execute('SELECT count FROM rate_limit WHERE key = ? AND window = ?',
+                               (key, index - 1)).fetchone()
+            self._hits += 1
+            if self._hits % self.PURGE_INTERVAL == 0:
+                conn.execute('DELETE FROM rate_limit WHERE expires_at <= ?', (now,))
+        return current, row[0] if row else 0
+
+
+class RedisWindowStore(WindowStore):
+    """Counters in Redis (or a Redis-protocol server), one key per window with a TTL."""
+
+    PREFIX = 'ratelimit:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis:// rate limit store requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        current_key = f'{self.PREFIX}{key}:{index}'
+        pipe = self._client.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(f'{self.PREFIX}{key}:{index - 1}')
+        current, _, previous = pipe.execute()
+        return current, int(previous or 0)
+
+
+def create_store(url):
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryWindowStore()
+    if scheme == 'sqlite':
+        return SQLiteWindowStore(url[len('sqlite:///'):])
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisWindowStore(url)
+    raise ValueError(f'Unsupported rate limit storage URL: {url}')
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', 'memory://')
+        app.config.setdefault('RATELIMITS', DEFAULT_LIMITS)
+        self.app = app
+        self.limits = {
+            family: {scope: parse_limit(limit) for scope, limit in scopes.items() if limit}
+            for family, scopes in app.config['RATELIMITS'].items()
+        }
+        self.store = create_store(app.config['RATELIMIT_STORAGE_URL'])
+        if app.config['RATELIMIT_ENABLED']:
+            app.before_request(self._check)
+
+    def family(self, name):
+        """Put a view in the `name` route family instead of the one its method implies."""
+        def decorator(view):
+            view.rate_limit_family = name
+            return view
+        return decorator
+
+    def _family(self):
+        view = self.app.view_functions.get(request.endpoint)
+        family = getattr(view, 'rate_limit_family', None)
+        if family is None and request.method in WRITE_METHODS:
+            family = 'writes'
+        return family
+
+    def _user(self, family):
+        if family == 'auth':
+            data = request.get_json(silent=True)
+            account = (data.get('username') or data.get('mobile_number')) if isinstance(data, dict) else None
+            # Keyed on the IP too: attempts from another address must not use up the owner's budget
+            return f'{account}@{request.remote_addr}' if account else None
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            # Bad or expired tokens are rejected by the view; only count the IP
+            return None
+        return str(identity) if identity is not None else None
+
+    def check(self, family, user, ip, now=None):
+        """Count one request and return the seconds to wait if it exceeds a limit, else None."""
+        now = time.time() if now is None else now
+        retry_after = None
+        for scope, subject in (('user', user), ('ip', ip)):
+            limit = self.limits.get(family, {}).get(scope)
+            if limit is None or subject is None:
+                continue
+            allowed, window = limit
+            current, previous = self.store.hit(f'{family}:{scope}:{subject}:{window}', window, now)
+            # Weight the previous window by how much of it the sliding window still covers
+            elapsed = now % window
+            if previous * (window - elapsed) / window + current > allowed:
+                retry_after = max(retry_after or 0, math.ceil(window - elapsed))
+        return retry_after
+
+    def _check(self):
+        family = self._family()
+        if family is None or family not in self.limits:
+            return None
+        try:
+            retry_after = self.check(family, self._user(family), request.remote_addr)
+        except Exception as e:
+            # Fail open: a storage outage should not take the API down with it
+            logging.warning(f'Rate limit check failed: {e}')
+            return None
+        if retry_after is None:
+            return None
+        response = jsonify({'message': 'Too many requests, please try again later'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
@@ -0,0 +1,120 @@
+"""SMS reminders for upcoming calendar events.
+
+Every REMINDER_INTERVAL seconds the scheduler looks for events dated from
+today up to REMINDER_WINDOW_DAYS ahead that have not been reminded yet,
+using the (date, user_id) index on Calendar. Scans take the users with due
+events REMINDER_BATCH_SIZE at a time and read all of a user's due events in
+the same batch, so each user gets one SMS listing all of them, sent through
+the NotificationQueue (and so through whichever SMS_BACKEND it uses).
+Events are claimed by setting reminded_at before the message is queued, so
+scans in several worker processes never remind the same event twice.
+
+REMINDER_INTERVAL defaults to 0, which leaves the scheduler off, so merely
+importing the app never texts anyone; deployments enable it by setting the
+REMINDER_INTERVAL environment variable (e.g. to 300).
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import update
+
+from models import db, Calendar, User
+
+# Events listed in one SMS; the rest are summarized as "and N more"
+MAX_EVENTS_PER_MESSAGE = 5
+
+
+def reminder_message(events):
+    lines = [f'{event_date.strftime("%d %b")}: {description}'
+             for event_date, description in events[:MAX_EVENTS_PER_MESSAGE]]
+    if len(events) > MAX_EVENTS_PER_MESSAGE:
+        lines.append(f'and {len(events) - MAX_EVENTS_PER_MESSAGE} more')
+    return 'FarmApp reminder: ' + '; '.join(lines)
+
+
+class ReminderScheduler:
+    def __init__(self, app=None, queue=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app, queue)
+
+    def init_app(self, app, queue):
+        app.config.setdefault('REMINDER_INTERVAL', 0)  # Seconds between scans; 0 disables the scheduler
+        app.config.setdefault('REMINDER_WINDOW_DAYS', 1)  # Remind about events up to this many days ahead
+        app.config.setdefault('REMINDER_BATCH_SIZE', 1000)  # Users whose events are read per scan
+        self.app = app
+        self.queue = queue
+        if app.config['REMINDER_INTERVAL']:
+            threading.Thread(target=self._run_forever, name='reminders', daemon=True).start()
+
+    def due_events(self, today):
+        """Unreminded events in the window for the next batch of users, ordered by user then date.
+
+        Users are picked before their events are read, so a batch never ends
+        part way through a user's events.
+        """
+        last_day = today + timedelta(days=self.app.config['REMINDER_WINDOW_DAYS'])
+        due = (Calendar.date >= today, Calendar.date <= last_day,
+               Calendar.reminded_at.is_(None), User.mobile_number.isnot(None))
+        user_ids = [user_id for user_id, in (
+            db.session.query(Calendar.user_id)
+            .join(User, User.id == Calendar.user_id)
+            .filter(*due)
+            .distinct()
+            .order_by(Calendar.user_id)
+            .limit(self.app.config['REMINDER_BATCH_SIZE'])
+        )]
+        if not user_ids:
+            return []
+        return (
+            db.session.query(Calendar.id, Calendar.user_id, Calendar.date, Calendar.description, User.mobile_number)
+            .join(User, User.id == Calendar.user_id)
+            .filter(Calendar.user_id.in_(user_ids), *due)
+            .order_by(Calendar.user_id, Calendar.date)
+            .all()
+        )
+
+    def _claim(self, event_ids):
+        # Only the scan whose UPDATE flips reminded_at gets the event back
+        claimed = db.session.execute(
+            update(Calendar)
+            .where(Calendar.id.in_(event_ids), Calendar.reminded_at.is_(None))
+            .values(reminded_at=datetime.utcnow(), updated_at=Calendar.updated_at)
+            .returning(Calendar.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.session.commit()
+        return set(claimed)
+
+    def run_once(self, today=None):
+        """Send the reminders due now; returns the number of SMS queued. Needs an app context."""
+        today = today or date.today()
+        sent = 0
+        while True:
+            rows = self.due_events(today)
+            by_user = defaultdict(list)
+            for row in rows:
+                by_user[(row.user_id, row.mobile_number)].append(row)
+
+            for (user_id, mobile_number), events in by_user.items():
+                claimed = self._claim([event.id for event in events])
+                events = [(event.date, event.description) for event in events if event.id in claimed]
+                if events:
+                    self.queue.enqueue(mobile_number, reminder_message(events))
+                    sent += 1
+
+            if len(by_user) < self.app.config['REMINDER_BATCH_SIZE']:
+                return sent
+
+    def _run_forever(self):
+        stop = threading.Event()
+        while not stop.wait(self.app.config['REMINDER_INTERVAL']):
+            try:
+                with self.app.app_context():
+                    sent = self.run_once()
+                if sent:
+                    logging.info(f"Queued {sent} calendar reminder SMS")
+            except Exception as e:
+                logging.error(f"Error sending calendar reminders: {e}")
@@ -0,0 +1,276 @@
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, attributes
+
+from models import db, Attendance, AttendanceDaily, Expense, ExpenseRollup
+
+SUMMARY_GROUPS = ('category', 'month', 'week', 'settled')
+
+
+def _month(value):
+    return date(value.year, value.month, 1)
+
+
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def _week_key(value):
+    year, week, _ = value.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+# ---- Rollup maintenance ----
+def _value(expense, name, old):
+    if old:
+        history = attributes.get_history(expense, name)
+        if history.deleted:
+            return history.deleted[0]
+        if history.unchanged:
+            return history.unchanged[0]
+    return getattr(expense, name)
+
+
+def _rollup_key(expense, old=False):
+    return (
+        int(_value(expense, 'user_id', old)),
+        _month(_value(expense, 'date', old)),
+        _value(expense, 'category', old) or '',
+        bool(_value(expense, 'settled', old)),
+    )
+
+
+def _upsert_increments(connection, table, keys, counters, rows):
+    """Insert `rows`, or add their `counters` to the existing row with the same `keys`."""
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_={c: table.c[c] + stmt.excluded[c] for c in counters},
+    )
+    connection.execute(stmt, rows)
+
+
+def _upsert(connection, deltas):
+    _upsert_increments(connection, ExpenseRollup.__table__, ('user_id', 'month', 'category', 'settled'),
+                       ('total', 'count'), [
+        {'user_id': user_id, 'month': month, 'category': category, 'settled': settled,
+         'total': total, 'count': count}
+        for (user_id, month, category, settled), (total, count) in deltas.items()
+    ])
+
+
+@event.listens_for(Session, 'after_flush')
+def update_expense_rollups(session, flush_context):
+    """Apply the expenses added, deleted or changed by a flush to ExpenseRollup."""
+    deltas = defaultdict(lambda: [0.0, 0])
+
+    def apply(key, amount, sign):
+        deltas[key][0] += sign * amount
+        deltas[key][1] += sign
+
+    for obj in session.new:
+        if isinstance(obj, Expense):
+            apply(_rollup_key(obj), obj.amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Expense):
+            apply(_rollup_key(obj, old=True), _value(obj, 'amount', True), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Expense) and session.is_modified(obj):
+            apply(_rollup_key(obj, old=True), _value(obj, 'amount', True), -1)
+            apply(_rollup_key(obj), obj.amount, 1)
+
+    changed = {key: value for key, value in deltas.items() if value[1] or value[0]}
+    if changed:
+        _upsert(session.connection(), changed)
+
+
+def rebuild_expense_rollups(connection):
+    """Recompute ExpenseRollup from scratch (used to backfill existing data)."""
+    connection.execute(ExpenseRollup.__table__.delete())
+    expense = Expense.__table__
+    # Group per day in SQL, which every dialect supports, and fold days into months here
+    rows = connection.execute(
+        select(expense.c.user_id, expense.c.date, expense.c.category, expense.c.settled,
+               func.sum(expense.c.amount), func.count())
+        .group_by(expense.c.user_id, expense.c.date, expense.c.category, expense.c.settled)
+    )
+    deltas = defaultdict(lambda: [0.0, 0])
+    for user_id, day, category, settled, total, count in rows:
+        key = (int(user_id), _month(day), category or '', bool(settled))
+        deltas[key][0] += total
+        deltas[key][1] += count
+    if deltas:
+        _upsert(connection, deltas)
+
+
+def _day(value):
+    # func.date() comes back as a string on SQLite
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _attendance_key(attendance, old=False):
+    return (
+        int(_value(attendance, 'user_id', old)),
+        _day(_value(attendance, 'attendance_date', old)),
+        _value(attendance, 'worker_name', old),
+    )
+
+
+def _upsert_daily(connection, deltas):
+    _upsert_increments(connection, AttendanceDaily.__table__, ('user_id', 'day', 'worker_name'), ('marks',), [
+        {'user_id': user_id, 'day': day, 'worker_name': worker_name, 'marks': marks}
+        for (user_id, day, worker_name), marks in deltas.items()
+    ])
+
+
+@event.listens_for(Session, 'after_flush')
+def update_attendance_daily(session, flush_context):
+    """Apply the attendance marks added, deleted or changed by a flush to AttendanceDaily."""
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Attendance):
+            deltas[_attendance_key(obj)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            deltas[_attendance_key(obj, old=True)] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Attendance) and session.is_modified(obj):
+            deltas[_attendance_key(obj, old=True)] -= 1
+            deltas[_attendance_key(obj)] += 1
+
+    changed = {key: marks for key, marks in deltas.items() if marks}
+    if changed:
+        _upsert_daily(session.connection(), changed)
+
+
+def rebuild_attendance_daily(connection):
+    """Recompute AttendanceDaily from scratch (used to backfill existing data)."""
+    connection.execute(AttendanceDaily.__table__.delete())
+    attendance = Attendance.__table__
+    day = func.date(attendance.c.attendance_date)
+    rows = connection.execute(
+        select(attendance.c.user_id, day, attendance.c.worker_name, func.count())
+        .group_by(attendance.c.user_id, day, attendance.c.worker_name)
+    )
+    deltas = defaultdict(int)
+    for user_id, marked_on, worker_name, marks in rows:
+        deltas[(int(user_id), _day(marked_on), worker_name)] += marks
+    if deltas:
+        _upsert_daily(connection, deltas)
+
+
+# ---- Summary queries ----
+def _is_month_aligned(start, end):
+    return (start is None or start.day == 1) and (end is None or (end + timedelta(days=1)).day == 1)
+
+
+def _from_rollups(user_id, group_by, start, end):
+    column = {
+        'category': ExpenseRollup.category,
+        'month': ExpenseRollup.month,
+        'settled': ExpenseRollup.settled,
+    }[group_by]
+    query = db.session.query(column, func.sum(ExpenseRollup.total), func.sum(ExpenseRollup.count)) \
+        .filter(ExpenseRollup.user_id == user_id, ExpenseRollup.count > 0)
+    if start:
+        query = query.filter(ExpenseRollup.month >= start)
+    if end:
+        query = query.filter(ExpenseRollup.month <= _month(end))
+
+    groups = {}
+    for key, total, count in query.group_by(column):
+        if group_by == 'month':
+            key = _month_key(key)
+        elif group_by == 'category':
+            key = key or None
+        groups[key] = [total, count]
+    return groups
+
+
+def _from_expenses(user_id, group_by, start, end):
+    if group_by in ('category', 'settled'):
+        column = getattr(Expense, group_by)
+    else:
+        # Group per day in SQL and fold the days into months or ISO weeks here
+        column = Expense.date
+    query = db.session.query(column, func.sum(Expense.amount), func.count(Expense.id)) \
+        .filter(Expense.user_id == user_id)
+    if start:
+        query = query.filter(Expense.date >= start)
+    if end:
+        query = query.filter(Expense.date <= end)
+
+    groups = defaultdict(lambda: [0.0, 0])
+    for key, total, count in query.group_by(column):
+        if group_by == 'month':
+            key = _month_key(key)
+        elif group_by == 'week':
+            key = _week_key(key)
+        elif group_by == 'settled':
+            key = bool(key)
+        groups[key][0] += total
+        groups[key][1] += count
+    return groups
+
+
+def expense_summary(user_id, group_by, start=None, end=None):
+    """Total expenses of `user_id` grouped by category, month, week or settled.
+
+    Whole-month queries are answered from ExpenseRollup, so their cost grows
+    with the number of months rather than the number of expenses. Weekly or
+    partial-month ranges fall back to a GROUP BY over the (user_id, date) index.
+    """
+    if group_by != 'week' and _is_month_aligned(start, end):
+        groups = _from_rollups(user_id, group_by, start, end)
+    else:
+        groups = _from_expenses(user_id, group_by, start, end)
+
+    results = [
+        {'key': key, 'total': round(total, 2), 'count': count}
+        for key, (total, count) in groups.items()
+        if count
+    ]
+    results.sort(key=lambda g: (g['key'] is not None, str(g['key'])))
+    return {
+        'group_by': group_by,
+        'total': round(sum(g['total'] for g in results), 2),
+        'count': sum(g['count'] for g in results),
+        'groups': results,
+    }
+
+
+def attendance_report(user_id, year, month):
+    """Worker x day presence matrix and days present per worker for one month.
+
+    Reads only the month's AttendanceDaily rows, so the cost depends on the
+    number of workers and days rather than on the number of raw marks.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    first = date(year, month, 1)
+    last = date(year, month, days_in_month)
+
+    rows = db.session.query(AttendanceDaily.worker_name, AttendanceDaily.day) \
+        .filter(AttendanceDaily.user_id == user_id, AttendanceDaily.day >= first,
+                AttendanceDaily.day <= last, AttendanceDaily.marks > 0)
+
+    presence = defaultdict(lambda: [0] * days_in_month)
+    for worker_name, day in rows:
+        presence[worker_name][day.day - 1] = 1
+
+    workers = [
+        {'worker_name': name, 'days_present': sum(days), 'presence': days}
+        for name, days in sorted(presence.items())
+    ]
+    return {
+        'month': first.strftime('%Y-%m'),
+        'days': [(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days_in_month)],
+        'workers': workers,
+        'total_worker_days': sum(w['days_present'] for w in workers),
+    }
@@ -0,0 +1,152 @@
+"""Full-text search over a user's seeds, medicines, contacts, calendar and attendance.
+
+On SQLite the text lives in the `search_index` FTS5 table (created by
+migration 0005) and is kept in step by a session after_flush listener. Each
+entry's rowid encodes the collection and record id, so updating or removing
+an entry is a rowid lookup. Other databases fall back to a LIKE scan.
+"""
+import logging
+import re
+
+from sqlalchemy import event, or_, text
+from sqlalchemy.orm import Session
+
+from models import db, Attendance, Seed, Medicine, Calendar, Contact
+from serialization import records, select_fields
+
+# Indexed text per model, and the code packed into the low bits of the FTS rowid
+SEARCHABLE = {
+    Attendance: (1, ('worker_name', 'notes')),
+    Seed: (2, ('name', 'vendor')),
+    Medicine: (3, ('name', 'vendor')),
+    Calendar: (4, ('description',)),
+    Contact: (5, ('name', 'phone_number', 'email')),
+}
+ROWID_SHIFT = 8
+
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 100
+
+_fts_available = set()  # Engine URLs known to have search_index
+_fts_missing_logged = set()
+
+
+def _has_fts(connection):
+    # Only a positive answer is cached: the table may be missing merely because
+    # migration 0005 has not run yet, and the lookup in sqlite_master is cheap
+    if connection.dialect.name != 'sqlite':
+        return False
+    url = str(connection.engine.url)
+    if url in _fts_available:
+        return True
+    if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")).scalar() is not None:
+        _fts_available.add(url)
+        return True
+    if url not in _fts_missing_logged:
+        _fts_missing_logged.add(url)
+        logging.info("search_index not available, /search will use LIKE scans")
+    return False
+
+
+def _rowid(model, record_id):
+    return record_id * ROWID_SHIFT + SEARCHABLE[model][0]
+
+
+def _document(obj):
+    return ' '.join(str(getattr(obj, name)) for name in SEARCHABLE[type(obj)][1] if getattr(obj, name))
+
+
+@event.listens_for(Session, 'after_flush')
+def update_search_index(session, flush_context):
+    removed = []
+    added = []
+    for obj in session.new:
+        if type(obj) in SEARCHABLE:
+            added.append(obj)
+    for obj in session.dirty:
+        if type(obj) in SEARCHABLE and session.is_modified(obj):
+            removed.append(obj)
+            added.append(obj)
+    for obj in session.deleted:
+        if type(obj) in SEARCHABLE:
+            removed.append(obj)
+    if not (removed or added):
+        return
+
+    connection = session.connection()
+    if not _has_fts(connection):
+        return
+    if removed:
+        connection.execute(text('DELETE FROM search_index WHERE rowid = :rowid'),
+                           [{'rowid': _rowid(type(obj), obj.id)} for obj in removed])
+    if added:
+        connection.execute(text(
+            'INSERT INTO search_index (rowid, owner, text, collection, record_id) '
+            'VALUES (:rowid, :owner, :text, :collection, :record_id)'
+        ), [{'rowid': _rowid(type(obj), obj.id), 'owner': f'u{int(obj.user_id)}', 'text': _document(obj),
+             'collection': obj.__tablename__, 'record_id': obj.id} for obj in added])
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_fts(user_id, query, limit):
+    """Return [(table_name, record_id, score)] best match first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    # Every term is a prefix match against the text column, within the user's own entries
+    match = f'owner : u{int(user_id)} AND ' + ' AND '.join(f'text : "{t}"*' for t in terms)
+    rows = db.session.execute(text(
+        'SELECT collection, record_id, bm25(search_index, 0.0, 1.0) AS score FROM search_index '
+        'WHERE search_index MATCH :match ORDER BY score LIMIT :limit'
+    ), {'match': match, 'limit': limit})
+    return [(collection, record_id, -score) for collection, record_id, score in rows]
+
+
+def _contains(term):
+    """ILIKE pattern for `term` anywhere in a column, with the wildcards `%` and `_` (a word character) escaped."""
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def search_like(user_id, query, limit):
+    """LIKE-scan equivalent of search_fts, used when FTS5 is unavailable."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    results = []
+    for model, (_, names) in SEARCHABLE.items():
+        columns = [getattr(model, name) for name in names]
+        conditions = [or_(*[c.ilike(_contains(t), escape='\\') for c in columns]) for t in terms]
+        ids = model.query.filter(model.user_id == user_id, *conditions) \
+            .with_entities(model.id).limit(limit)
+        results.extend((model.__tablename__, row.id, 0.0) for row in ids)
+    return results[:limit]
+
+
+def search(user_id, query, collections, limit=DEFAULT_RESULTS):
+    """Search a user's records and return them ranked, serialized like the list endpoints.
+
+    `collections` maps public resource names to (model, fields) pairs.
+    """
+    if _has_fts(db.session.connection()):
+        hits = search_fts(user_id, query, limit)
+    else:
+        hits = search_like(user_id, query, limit)
+
+    by_table = {model.__tablename__: (name, model, fields) for name, (model, fields) in collections.items()}
+    found = {}
+    for table_name in {hit[0] for hit in hits}:
+        name, model, fields = by_table[table_name]
+        ids = [record_id for t, record_id, _ in hits if t == table_name]
+        rows = db.session.execute(
+            select_fields(fields, fields).where(model.user_id == user_id, model.id.in_(ids)))
+        for record in records(list(fields), rows):
+            found[(table_name, record['id'])] = (name, record)
+
+    return [
+        {'type': found[(t, record_id)][0], 'score': score, 'record': found[(t, record_id)][1]}
+        for t, record_id, score in hits
+        if (t, record_id) in found
+    ]
@@ -0,0 +1,67 @@
+"""Fast path from database rows to JSON responses.
+
+Records are read with a Core select() of just the requested columns, with
+Date/DateTime columns formatted as YYYY-MM-DD by the database, so the rows
+come back as tuples of plain JSON values. They are encoded with orjson when
+it is installed and the standard json module otherwise.
+"""
+import json
+
+from flask import Response
+from sqlalchemy import Date, DateTime, String, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+try:
+    import orjson
+except ImportError:  # Optional speedup
+    orjson = None
+
+
+class format_date(FunctionElement):
+    """A Date or DateTime column as a YYYY-MM-DD string."""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(format_date)
+def _format_date_default(element, compiler, **kw):
+    return f'CAST(CAST({compiler.process(element.clauses, **kw)} AS DATE) AS VARCHAR(10))'
+
+
+@compiles(format_date, 'sqlite')
+def _format_date_sqlite(element, compiler, **kw):
+    return f"strftime('%Y-%m-%d', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(format_date, 'postgresql')
+def _format_date_postgresql(element, compiler, **kw):
+    return f"to_char({compiler.process(element.clauses, **kw)}, 'YYYY-MM-DD')"
+
+
+def _is_date(column):
+    return isinstance(column.type, (Date, DateTime))
+
+
+def select_fields(columns, names):
+    """select() of the `columns` entries named in `names`, with dates formatted in SQL."""
+    return select(*[
+        (format_date(columns[name]) if _is_date(columns[name]) else columns[name]).label(name)
+        for name in names
+    ])
+
+
+def records(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj)
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
@@ -0,0 +1,90 @@
+"""Delta sync for offline-first clients.
+
+ChangeLog keeps one entry for the latest change of every per-user record:
+each flush deletes the record's previous entry and appends a new one, so the
+log stays as small as the data plus tombstones for deleted rows. A client
+sends the highest entry id it has seen as its sync token and receives only
+the records changed after it.
+"""
+from collections import defaultdict
+
+from flask import request, jsonify
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import Session
+
+from models import db, ChangeLog
+from serialization import json_response, select_fields
+from versioning import VERSIONED_MODELS
+
+# Largest number of change log entries returned by one /sync call
+SYNC_PAGE_SIZE = 500
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    changes = {}
+    for obj in session.new:
+        if isinstance(obj, VERSIONED_MODELS):
+            changes[(obj.__tablename__, obj.id)] = (int(obj.user_id), 'upsert')
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj):
+            changes[(obj.__tablename__, obj.id)] = (int(obj.user_id), 'upsert')
+    for obj in session.deleted:
+        if isinstance(obj, VERSIONED_MODELS):
+            changes[(obj.__tablename__, obj.id)] = (int(obj.user_id), 'delete')
+    if not changes:
+        return
+
+    connection = session.connection()
+    table = ChangeLog.__table__
+    connection.execute(table.delete().where(tuple_(table.c.collection, table.c.record_id).in_(list(changes))))
+    connection.execute(table.insert(), [
+        {'user_id': user_id, 'collection': collection, 'record_id': record_id, 'op': op}
+        for (collection, record_id), (user_id, op) in changes.items()
+    ])
+
+
+def sync_response(user_id, collections):
+    """Return the records changed since the `since` token.
+
+    `collections` maps the public resource names to (model, fields) pairs,
+    where `fields` is the column mapping used by the list endpoints.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'message': 'since must be a sync token returned by /sync'}), 400
+
+    entries = (
+        ChangeLog.query.filter(ChangeLog.user_id == user_id, ChangeLog.id > since)
+        .order_by(ChangeLog.id)
+        .with_entities(ChangeLog.id, ChangeLog.collection, ChangeLog.record_id, ChangeLog.op)
+        .limit(SYNC_PAGE_SIZE + 1)
+        .all()
+    )
+    more = len(entries) > SYNC_PAGE_SIZE
+    entries = entries[:SYNC_PAGE_SIZE]
+
+    upserted = defaultdict(list)
+    deleted = defaultdict(list)
+    for entry in entries:
+        (upserted if entry.op == 'upsert' else deleted)[entry.collection].append(entry.record_id)
+
+    changes = {}
+    for name, (model, fields) in collections.items():
+        table_name = model.__tablename__
+        result = {'upserted': [], 'deleted': deleted.get(table_name, [])}
+        ids = upserted.get(table_name)
+        if ids:
+            query = select_fields(fields, fields).add_columns(model.updated_at) \
+                .where(model.user_id == user_id, model.id.in_(ids))
+            names = list(fields)
+            for row in db.session.execute(query):
+                record = dict(zip(names, row))
+                record['updated_at'] = row[-1].isoformat() if row[-1] else None
+                result['upserted'].append(record)
+        if result['upserted'] or result['deleted']:
+            changes[name] = result
+
+    token = entries[-1].id if entries else since
+    return json_response({'token': str(token), 'more': more, 'changes': changes})
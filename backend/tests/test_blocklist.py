@@ -0,0 +1,86 @@
+"""Revoke, lookup and expiry for every blocklist backend; redis:// runs against benchmarks/fake_redis.py."""
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blocklist
+from benchmarks import fake_redis
+from blocklist import TokenBlocklist, create_blocklist
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(blocklist, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def tokens(request, clock, tmp_path):
+    if request.param == 'memory':
+        yield create_blocklist('memory://')
+    elif request.param == 'sqlite':
+        yield create_blocklist(f"sqlite:///{tmp_path / 'blocklist.db'}")
+    else:
+        pytest.importorskip('redis')
+        server, url = fake_redis.start_in_background(clock.time)
+        yield create_blocklist(url)
+        server.shutdown()
+        server.server_close()
+
+
+def test_revoke_and_lookup(tokens, clock):
+    assert not tokens.is_revoked('a')
+    tokens.add('a', clock.now + 3600)
+    tokens.add('b', clock.now + 3600)
+    assert tokens.is_revoked('a')
+    assert tokens.is_revoked('b')
+    assert not tokens.is_revoked('c')
+    assert len(tokens) == 2
+
+
+def test_forgotten_once_the_token_expires(tokens, clock):
+    tokens.add('short', clock.now + 60)
+    tokens.add('long', clock.now + 3600)
+    clock.now += 59
+    assert tokens.is_revoked('short')
+
+    clock.now += 2
+    assert not tokens.is_revoked('short')
+    assert tokens.is_revoked('long')
+
+    clock.now += 3600
+    assert not tokens.is_revoked('long')
+
+
+def test_already_expired_token_is_not_revoked(tokens, clock):
+    tokens.add('old', clock.now - 1)
+    assert not tokens.is_revoked('old')
+
+
+def test_expired_entries_are_dropped(tokens, clock):
+    tokens.add('a', clock.now + 60)
+    clock.now += 120
+    tokens.add('b', clock.now + 60)
+    if isinstance(tokens, blocklist.SQLiteBlocklist):
+        tokens.purge()
+    assert len(tokens) == 1
+
+
+def test_backends_implement_the_interface():
+    with pytest.raises(TypeError):
+        TokenBlocklist()
+    with pytest.raises(ValueError):
+        create_blocklist('ftp://nowhere')
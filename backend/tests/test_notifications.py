@@ -0,0 +1,133 @@
+"""NotificationQueue against a fake SMS gateway running on a local HTTP server."""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Notification
+from notifications import NotificationQueue
+
+
+class FakeGateway(BaseHTTPRequestHandler):
+    """Answers 500 to the first `failures` requests and 200 after that."""
+
+    failures = 0
+    requests = []
+    url = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        FakeGateway.requests.append(body)
+        status = 500 if len(FakeGateway.requests) <= FakeGateway.failures else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"return": true}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gateway():
+    FakeGateway.failures = 0
+    FakeGateway.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGateway)
+    FakeGateway.url = f'http://127.0.0.1:{server.server_port}/dev/bulkV2'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield FakeGateway
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def queue(gateway, tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SMS_BACKEND'] = 'fast2sms'
+    app.config['SMS_GATEWAY_URL'] = gateway.url
+    app.config['SMS_API_KEY'] = 'test-key'
+    app.config['SMS_MAX_ATTEMPTS'] = 3
+    app.config['SMS_RETRY_BACKOFF'] = 0.2
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    queue = NotificationQueue(app)
+    yield queue
+    queue.executor.shutdown(wait=True)
+
+
+def history(queue, notification_id, until, timeout=10):
+    """Poll the notification until its status is in `until`, returning every (status, attempts) seen."""
+    seen = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with queue.app.app_context():
+            notification = db.session.get(Notification, notification_id)
+            state = (notification.status, notification.attempts)
+        if not seen or seen[-1] != state:
+            seen.append(state)
+        if state[0] in until:
+            return seen, notification
+        time.sleep(0.01)
+    raise AssertionError(f'Notification stuck after {seen}')
+
+
+def enqueue(queue, message='Your OTP for password reset is: 123456'):
+    with queue.app.app_context():
+        return queue.enqueue('+919999999999', message)
+
+
+def test_sent_on_first_attempt(queue, gateway):
+    notification_id = enqueue(queue)
+    seen, notification = history(queue, notification_id, {'sent', 'failed'})
+
+    assert seen[-1] == ('sent', 1)
+    assert notification.sent_at is not None
+    assert notification.last_error is None
+    assert len(gateway.requests) == 1
+    assert 'numbers=%2B919999999999' in gateway.requests[0]
+    assert 'authorization=test-key' in gateway.requests[0]
+
+
+def test_retried_until_the_gateway_recovers(queue, gateway):
+    gateway.failures = 2
+    notification_id = enqueue(queue)
+    seen, notification = history(queue, notification_id, {'sent', 'failed'})
+
+    assert ('retrying', 1) in seen
+    assert ('retrying', 2) in seen
+    assert seen[-1] == ('sent', 3)
+    assert notification.last_error == 'Gateway returned 500'
+    assert len(gateway.requests) == 3
+
+
+def test_failed_after_max_attempts(queue, gateway):
+    gateway.failures = 10
+    notification_id = enqueue(queue)
+    started = time.monotonic()
+    seen, notification = history(queue, notification_id, {'sent', 'failed'})
+
+    assert [status for status, _ in seen if status != 'pending'] == ['retrying', 'retrying', 'failed']
+    assert seen[-1] == ('failed', 3)
+    assert notification.sent_at is None
+    assert notification.last_error == 'Gateway returned 500'
+    assert len(gateway.requests) == 3
+    # Backoff of 0.2s then 0.4s between the attempts
+    assert time.monotonic() - started >= 0.6
+
+
+def test_unreachable_gateway_is_retried(queue, gateway):
+    queue.sender.url = 'http://127.0.0.1:1/dev/bulkV2'
+    notification_id = enqueue(queue)
+    seen, notification = history(queue, notification_id, {'sent', 'failed'})
+
+    assert seen[-1] == ('failed', 3)
+    assert notification.last_error
+    assert not gateway.requests
@@ -0,0 +1,99 @@
+"""OTPStore: consuming codes, the attempt lockout (also under concurrent guesses) and expiry."""
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, PasswordResetOTP
+from otp_store import EXPIRED, INVALID, LOCKED, VALID, OTPStore
+
+MOBILE = '+919999999999'
+
+
+@pytest.fixture
+def otps(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+    app.config['OTP_MAX_ATTEMPTS'] = 3
+    app.config['OTP_SWEEP_INTERVAL'] = 0
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield OTPStore(app)
+
+
+def wrong(code):
+    return '000000' if code != '000000' else '111111'
+
+
+def test_valid_code_is_consumed(otps):
+    code = otps.issue(MOBILE)
+    assert otps.verify(MOBILE, code) == VALID
+    assert otps.verify(MOBILE, code) == EXPIRED
+
+
+def test_locked_after_max_attempts(otps):
+    code = otps.issue(MOBILE)
+    assert [otps.verify(MOBILE, wrong(code)) for _ in range(3)] == [INVALID] * 3
+    # Even the right code is refused once the attempts are used up
+    assert otps.verify(MOBILE, code) == LOCKED
+    assert db.session.get(PasswordResetOTP, MOBILE).attempts == 3
+
+
+def test_right_code_on_the_last_attempt(otps):
+    code = otps.issue(MOBILE)
+    assert [otps.verify(MOBILE, wrong(code)) for _ in range(2)] == [INVALID] * 2
+    assert otps.verify(MOBILE, code) == VALID
+
+
+def test_reissue_resets_the_attempts(otps):
+    code = otps.issue(MOBILE)
+    for _ in range(3):
+        otps.verify(MOBILE, wrong(code))
+    code = otps.issue(MOBILE)
+    assert otps.verify(MOBILE, code) == VALID
+
+
+def test_concurrent_guesses_cannot_exceed_the_limit(otps):
+    code = otps.issue(MOBILE)
+    app = otps.app
+    guesses = 12
+    barrier = threading.Barrier(guesses)
+    results = []
+
+    def guess():
+        with app.app_context():
+            barrier.wait()
+            results.append(otps.verify(MOBILE, wrong(code)))
+
+    threads = [threading.Thread(target=guess) for _ in range(guesses)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(INVALID) == 3
+    assert results.count(LOCKED) == guesses - 3
+    assert db.session.get(PasswordResetOTP, MOBILE).attempts == 3
+
+
+def test_expired_code(otps):
+    code = otps.issue(MOBILE)
+    db.session.get(PasswordResetOTP, MOBILE).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert otps.verify(MOBILE, code) == EXPIRED
+    # An expired code does not use up attempts
+    assert db.session.get(PasswordResetOTP, MOBILE).attempts == 0
+    assert otps.purge_expired() == 1
+    assert otps.verify(MOBILE, code) == EXPIRED
+
+
+def test_unknown_number(otps):
+    assert otps.verify(MOBILE, '123456') == EXPIRED
@@ -0,0 +1,113 @@
+"""Rate limiting through a small app, and the window counts of every store; redis:// runs against benchmarks/fake_redis.py."""
+import os
+import sys
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_redis
+from ratelimit import RateLimiter, WindowStore, create_store
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+    app.config['RATELIMITS'] = {
+        'auth': {'user': '3 per hour', 'ip': '10 per hour'},
+        'writes': {'user': '2 per hour', 'ip': None},
+    }
+    JWTManager(app)
+    rate_limits = RateLimiter(app)
+    app.extensions['rate_limits'] = rate_limits
+
+    @app.route('/login', methods=['POST'])
+    @rate_limits.family('auth')
+    def login():
+        return jsonify({'message': 'ok'})
+
+    @app.route('/items', methods=['GET', 'POST'])
+    def items():
+        return jsonify({'message': 'ok'})
+
+    return app
+
+
+def login(client, username, ip='10.0.0.1'):
+    return client.post('/login', json={'username': username, 'password': 'x'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_over_the_limit_gets_429_with_retry_after(app):
+    client = app.test_client()
+    assert [login(client, 'ravi').status_code for _ in range(3)] == [200, 200, 200]
+    response = login(client, 'ravi')
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 3600
+
+
+def test_auth_attempts_are_keyed_on_account_and_ip(app):
+    client = app.test_client()
+    for _ in range(4):
+        login(client, 'ravi')
+    assert login(client, 'ravi').status_code == 429
+    # The owner on another address, and other accounts from the same one, still get through
+    assert login(client, 'ravi', ip='10.0.0.2').status_code == 200
+    assert login(client, 'sita').status_code == 200
+    # Until the per-IP limit is used up as well; refused attempts count too
+    for _ in range(3):
+        login(client, 'sita')
+    login(client, 'mohan')
+    assert login(client, 'gita').status_code == 429
+
+
+def test_writes_are_keyed_on_the_jwt_identity_and_reads_are_not_limited(app):
+    client = app.test_client()
+    with app.app_context():
+        first, second = ({'Authorization': 'Bearer ' + create_access_token(identity=user)} for user in ('1', '2'))
+    assert [client.post('/items', headers=first).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.post('/items', headers=second).status_code == 200
+    assert all(client.get('/items', headers=first).status_code == 200 for _ in range(5))
+
+
+class BrokenStore(WindowStore):
+    def hit(self, key, window, now):
+        raise ConnectionError('store is down')
+
+
+def test_store_errors_fail_open(app):
+    app.extensions['rate_limits'].store = BrokenStore()
+    client = app.test_client()
+    assert all(login(client, 'ravi').status_code == 200 for _ in range(5))
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        yield create_store('memory://')
+    elif request.param == 'sqlite':
+        yield create_store(f"sqlite:///{tmp_path / 'ratelimit.db'}")
+    else:
+        pytest.importorskip('redis')
+        server, url = fake_redis.start_in_background()
+        yield create_store(url)
+        server.shutdown()
+
+
+def test_store_counts_current_and_previous_window(store):
+    now = 1_700_000_040.0 + 20  # 20s into a minute
+    assert store.hit('k', 60, now) == (1, 0)
+    assert store.hit('k', 60, now + 1) == (2, 0)
+    assert store.hit('other', 60, now) == (1, 0)
+    # The next window starts from zero and sees the last one's count
+    assert store.hit('k', 60, now + 45) == (1, 2)
+
+
+def test_store_interface():
+    with pytest.raises(TypeError):
+        WindowStore()
+    with pytest.raises(ValueError):
+        create_store('ftp://example.com')
@@ -0,0 +1,107 @@
+"""ReminderScheduler with the log SMS backend: batching per user, claiming, and reminding again after a move."""
+import importlib
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Calendar, User
+from notifications import NotificationQueue
+from reminders import ReminderScheduler
+
+TODAY = date(2024, 6, 1)
+
+
+def sent(queue):
+    # One notification worker runs tasks in order, so a no-op finishing means every SMS was handed over
+    queue.executor.submit(lambda: None).result()
+    return sorted(queue.sender.sent)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SMS_BACKEND'] = 'log'
+    app.config['NOTIFICATION_WORKERS'] = 1
+    app.config['REMINDER_BATCH_SIZE'] = 2
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    app.extensions['queue'] = queue = NotificationQueue(app)
+    app.extensions['reminders'] = ReminderScheduler(app, queue)
+    with app.app_context():
+        yield app
+        db.session.remove()
+    queue.executor.shutdown()
+
+
+def add_user(name, mobile_number, *days):
+    user = User(username=name, password='x', mobile_number=mobile_number)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([Calendar(user_id=user.id, date=TODAY + timedelta(days=day), description=f'{name} {day}')
+                        for day in days])
+    db.session.commit()
+    return user
+
+
+def test_each_user_gets_one_sms_even_when_their_events_span_batches(app):
+    # With (date, user_id) order and a row limit, ravi's second event would fall into a later batch
+    add_user('ravi', '9000000001', 0, 1)
+    add_user('sita', '9000000002', 0, 0, 1)
+    add_user('mohan', '9000000003', 1)
+    add_user('nomobile', None, 0)
+    add_user('later', '9000000004', 5)
+
+    assert app.extensions['reminders'].run_once(TODAY) == 3
+    messages = sent(app.extensions['queue'])
+    assert [mobile for mobile, _ in messages] == ['9000000001', '9000000002', '9000000003']
+    assert messages[0][1] == 'FarmApp reminder: 01 Jun: ravi 0; 02 Jun: ravi 1'
+    assert messages[1][1].count('sita') == 3
+
+
+def test_events_are_claimed_and_not_reminded_twice(app):
+    add_user('ravi', '9000000001', 0)
+    reminders = app.extensions['reminders']
+    assert reminders.run_once(TODAY) == 1
+    assert db.session.query(Calendar).one().reminded_at is not None
+    assert reminders.run_once(TODAY) == 0
+    assert reminders._claim([db.session.query(Calendar.id).scalar()]) == set()
+    assert len(sent(app.extensions['queue'])) == 1
+
+
+def test_moving_an_event_resets_reminded_at(tmp_path, monkeypatch):
+    # The reset lives in the PUT /calendar view, so this goes through app.py itself
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv('SMS_BACKEND', 'log')
+    monkeypatch.setenv('RATELIMIT_ENABLED', '0')
+    app_module = importlib.import_module('app')
+    from flask_jwt_extended import create_access_token
+
+    with app_module.app.app_context():
+        db.create_all()
+        user = add_user('ravi', '9000000001', 0)
+        event = db.session.query(Calendar).one()
+        event.reminded_at = datetime(2024, 5, 31, 6)
+        db.session.commit()
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+        client = app_module.app.test_client()
+        # A new description on the same day keeps the reminder that was sent
+        response = client.put('/calendar', headers=headers,
+                              json={'id': event.id, 'date': '2024-06-01', 'description': 'Spray'})
+        assert response.status_code == 200
+        db.session.refresh(event)
+        assert event.reminded_at is not None
+
+        response = client.put('/calendar', headers=headers,
+                              json={'id': event.id, 'date': '2024-06-03', 'description': 'Spray'})
+        assert response.status_code == 200
+        db.session.refresh(event)
+        assert event.reminded_at is None
+        db.session.remove()
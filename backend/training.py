@@ -0,0 +1,216 @@
+"""Resumable training runner for the crop disease model.
+
+Trainer fits the model on a dataset_cache.py dataset and keeps the run
+safe to interrupt:
+
+- a checkpoint (weights, optimizer, epoch and position within it) is
+  written every `checkpoint_every` optimizer steps and after every epoch;
+  running again resumes from it, replaying the same shuffled order
+- the model is scored on a held-out validation split after each epoch and
+  the best weights are saved to `output_path`; training stops after
+  `patience` epochs without improvement
+- gradients of `accumulate` batches are summed before each optimizer step,
+  for a larger effective batch without the memory of one
+- each epoch reports its throughput and how much of its time went to
+  waiting for data versus computing
+
+With `freeze_backbone` only the final `fc` layer is trained: the backbone
+runs once over the data to cache the 512-dimensional pooled features, and
+every epoch after that is a pass over those small tensors.
+"""
+import json
+import os
+import time
+
+import torch
+import torch.nn as nn
+from torch.utils.data import Sampler, TensorDataset, random_split
+
+from dataset_cache import make_loader, to_float
+from model_export import ARCH, save_checkpoint
+
+
+def split_dataset(dataset, val_fraction=0.2, seed=0):
+    """(train, validation) subsets, the same for the same seed."""
+    val_size = max(1, int(len(dataset) * val_fraction))
+    return random_split(dataset, [len(dataset) - val_size, val_size], generator=torch.Generator().manual_seed(seed))
+
+
+class EpochSampler(Sampler):
+    """Shuffles differently each epoch but reproducibly, so an interrupted epoch resumes at `start`."""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def __iter__(self):
+        order = torch.randperm(self.size, generator=torch.Generator().manual_seed(self.seed + self.epoch))
+        return iter(order[self.start:].tolist())
+
+    def __len__(self):
+        return self.size - self.start
+
+
+class Trainer:
+    def __init__(self, model, classes, train_set, val_set, checkpoint_path='training_checkpoint.pth',
+                 output_path='crop_disease_model.pth', batch_size=32, accumulate=1, lr=0.001, epochs=20,
+                 patience=3, checkpoint_every=200, freeze_backbone=False, workers=None, seed=0):
+        self.model = model
+        self.classes = list(classes)
+        self.checkpoint_path = checkpoint_path
+        self.output_path = output_path
+        self.accumulate = accumulate
+        self.epochs = epochs
+        self.patience = patience
+        self.checkpoint_every = checkpoint_every
+        self.freeze_backbone = freeze_backbone
+        self.criterion = nn.CrossEntropyLoss()
+
+        if freeze_backbone:
+            for parameter in model.parameters():
+                parameter.requires_grad = False
+            for parameter in model.fc.parameters():
+                parameter.requires_grad = True
+            self.net = model.fc
+            self.prepare = lambda inputs: inputs
+            train_set = self._features(train_set, batch_size, workers)
+            val_set = self._features(val_set, batch_size, workers)
+            workers = 0  # Features are already in memory
+        else:
+            self.net = model
+            self.prepare = to_float
+
+        self.optimizer = torch.optim.Adam([p for p in model.parameters() if p.requires_grad], lr=lr)
+        self.sampler = EpochSampler(len(train_set), seed)
+        self.train_loader = make_loader(train_set, batch_size, workers=workers, sampler=self.sampler)
+        self.val_loader = make_loader(val_set, batch_size, shuffle=False, workers=workers)
+
+        self.epoch = 0
+        self.position = 0  # Samples of the current epoch already trained on
+        self.steps = 0
+        self.best_loss = float('inf')
+        self.bad_epochs = 0
+        self.history = []
+
+    def _features(self, dataset, batch_size, workers):
+        """Pooled backbone outputs for every image, as an in-memory TensorDataset."""
+        t0 = time.perf_counter()
+        fc, self.model.fc = self.model.fc, nn.Identity()
+        self.model.eval()
+        features, labels = [], []
+        try:
+            with torch.inference_mode():
+                for images, batch_labels in make_loader(dataset, batch_size, shuffle=False, workers=workers):
+                    features.append(self.model(to_float(images)))
+                    labels.append(batch_labels)
+        finally:
+            self.model.fc = fc
+        print(f"Cached backbone features of {len(dataset)} images in {time.perf_counter() - t0:.1f}s")
+        return TensorDataset(torch.cat(features), torch.cat(labels))
+
+    # ---- Checkpoints ----
+
+    def _save(self):
+        state = {
+            'arch': ARCH, 'classes': self.classes, 'state_dict': self.model.state_dict(),
+            'optimizer': self.optimizer.state_dict(), 'epoch': self.epoch, 'position': self.position,
+            'steps': self.steps, 'best_loss': self.best_loss, 'bad_epochs': self.bad_epochs,
+            'history': self.history, 'freeze_backbone': self.freeze_backbone,
+        }
+        # Written aside and renamed, so an interruption never leaves a torn checkpoint
+        torch.save(state, self.checkpoint_path + '.tmp')
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def _resume(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        state = torch.load(self.checkpoint_path, map_location='cpu', weights_only=True)
+        if state['freeze_backbone'] != self.freeze_backbone:
+            raise ValueError(f"{self.checkpoint_path} was written with freeze_backbone={state['freeze_backbone']}")
+        self.model.load_state_dict(state['state_dict'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        for name in ('epoch', 'position', 'steps', 'best_loss', 'bad_epochs', 'history'):
+            setattr(self, name, state[name])
+        print(f"Resuming from {self.checkpoint_path} at epoch {self.epoch + 1}, sample {self.position}")
+
+    # ---- Training ----
+
+    def _train_epoch(self):
+        self.net.train()
+        self.sampler.epoch, self.sampler.start = self.epoch, self.position
+        stats = {'data_wait_s': 0.0, 'compute_s': 0.0, 'checkpoint_s': 0.0}
+        loss_sum = seen = pending = 0
+        self.optimizer.zero_grad()
+
+        started = time.perf_counter()
+        for images, labels in self.train_loader:
+            loaded = time.perf_counter()
+            stats['data_wait_s'] += loaded - started
+            loss = self.criterion(self.net(self.prepare(images)), labels)
+            (loss / self.accumulate).backward()
+            loss_sum += loss.item() * len(labels)
+            seen += len(labels)
+            self.position += len(labels)
+            pending += 1
+            if pending == self.accumulate:
+                self.optimizer.step()
+                self.optimizer.zero_grad()
+                pending = 0
+                self.steps += 1
+            started = time.perf_counter()
+            stats['compute_s'] += started - loaded
+
+            if not pending and self.checkpoint_every and self.steps % self.checkpoint_every == 0:
+                self._save()
+                stats['checkpoint_s'] += time.perf_counter() - started
+                started = time.perf_counter()
+
+        if pending:
+            self.optimizer.step()
+            self.optimizer.zero_grad()
+            self.steps += 1
+        stats['train_loss'] = loss_sum / seen if seen else None
+        stats['images'] = seen
+        return stats
+
+    def evaluate(self):
+        """(loss, accuracy) on the validation split."""
+        self.net.eval()
+        loss_sum = correct = total = 0
+        with torch.inference_mode():
+            for inputs, labels in self.val_loader:
+                outputs = self.net(self.prepare(inputs))
+                loss_sum += self.criterion(outputs, labels).item() * len(labels)
+                correct += (outputs.argmax(dim=1) == labels).sum().item()
+                total += len(labels)
+        return loss_sum / total, correct / total
+
+    def fit(self):
+        """Train until `epochs` or early stopping, leaving the best weights in the model and at output_path."""
+        self._resume()
+        while self.epoch < self.epochs and self.bad_epochs < self.patience:
+            t0 = time.perf_counter()
+            stats = self._train_epoch()
+            val_loss, val_accuracy = self.evaluate()
+            elapsed = time.perf_counter() - t0
+
+            if val_loss < self.best_loss:
+                self.best_loss, self.bad_epochs = val_loss, 0
+                save_checkpoint(self.model, self.classes, self.output_path)
+            else:
+                self.bad_epochs += 1
+
+            stats = {'epoch': self.epoch + 1, 'val_loss': round(val_loss, 4), 'val_accuracy': round(val_accuracy, 4),
+                     'epoch_s': round(elapsed, 2), 'images_per_sec': round(stats.pop('images') / elapsed, 1),
+                     **{name: round(value, 4) if value is not None else None for name, value in stats.items()}}
+            self.history.append(stats)
+            print(json.dumps(stats))
+            self.epoch += 1
+            self.position = 0
+            self._save()
+
+        if os.path.exists(self.output_path):
+            self.model.load_state_dict(torch.load(self.output_path, map_location='cpu', weights_only=True)['state_dict'])
+        return self.history
@@ -0,0 +1,60 @@
+"""Per-user version counters for the list resources.
+
+Every flush that adds, changes or deletes rows of a versioned model bumps
+the owning user's counter for that collection. List endpoints expose the
+counter as an ETag, so a matching If-None-Match is answered with a 304 after
+a single primary-key lookup.
+"""
+import hashlib
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, Attendance, Seed, Medicine, Expense, Calendar, Contact, CollectionVersion
+
+VERSIONED_MODELS = (Attendance, Seed, Medicine, Expense, Calendar, Contact)
+
+
+@event.listens_for(Session, 'after_flush')
+def bump_collection_versions(session, flush_context):
+    changed = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, VERSIONED_MODELS):
+            changed.add((int(obj.user_id), obj.__tablename__))
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj):
+            changed.add((int(obj.user_id), obj.__tablename__))
+    if not changed:
+        return
+
+    connection = session.connection()
+    table = CollectionVersion.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.collection],
+        set_={'version': table.c.version + 1},
+    )
+    connection.execute(stmt, [
+        {'user_id': user_id, 'collection': collection, 'version': 1}
+        for user_id, collection in changed
+    ])
+
+
+def collection_version(user_id, collection):
+    version = db.session.query(CollectionVersion.version).filter_by(
+        user_id=int(user_id), collection=collection
+    ).scalar()
+    return version or 0
+
+
+def collection_etag(user_id, collection):
+    """ETag of the current request's view of a user's collection.
+
+    Query arguments (page, fields, filters) select different representations
+    of the same version, so they are folded into the tag.
+    """
+    args = hashlib.sha1(request.query_string).hexdigest()[:12]
+    return f'{collection}-{collection_version(user_id, collection)}-{args}'
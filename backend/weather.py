@@ -0,0 +1,154 @@
+"""Server-side proxy for the OpenWeatherMap 5 day forecast.
+
+Forecasts are cached per normalized location in an in-process LRU with a
+TTL, backed by the Weather table so a restarted (or another) worker does not
+have to go upstream. Concurrent misses for the same location share one
+upstream request.
+"""
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from models import db, Weather
+
+
+class WeatherError(Exception):
+    status = 502
+
+
+class LocationNotFound(WeatherError):
+    status = 404
+
+
+class NotConfigured(WeatherError):
+    status = 503
+
+
+def normalize_location(location):
+    return re.sub(r'\s+', ' ', (location or '').strip()).lower()
+
+
+class _Pending:
+    """An upstream fetch that other requests for the same location wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.forecast = None
+        self.error = None
+
+
+class WeatherService:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/forecast')
+        app.config.setdefault('WEATHER_API_KEY', '')
+        app.config.setdefault('WEATHER_CACHE_TTL', timedelta(minutes=10))
+        app.config.setdefault('WEATHER_CACHE_SIZE', 1024)  # Locations kept in memory
+        app.config.setdefault('WEATHER_TIMEOUT', 5)  # Seconds per upstream call
+
+        if not app.config['WEATHER_API_KEY']:
+            logging.warning("WEATHER_API_KEY is not set, /weather only serves cached forecasts")
+
+        self.app = app
+        self._cache = OrderedDict()  # location -> (fetched_at, forecast)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=16)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _fresh(self, fetched_at):
+        return fetched_at is not None and datetime.utcnow() - fetched_at < self.app.config['WEATHER_CACHE_TTL']
+
+    def _remember(self, location, fetched_at, forecast):
+        # Caller holds self._lock
+        self._cache[location] = (fetched_at, forecast)
+        self._cache.move_to_end(location)
+        while len(self._cache) > self.app.config['WEATHER_CACHE_SIZE']:
+            self._cache.popitem(last=False)
+
+    def forecast(self, location):
+        """Return the forecast JSON for `location`, going upstream at most once per TTL."""
+        key = normalize_location(location)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and self._fresh(cached[0]):
+                self._cache.move_to_end(key)
+                return cached[1]
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+
+        if not leader:
+            pending.done.wait(self.app.config['WEATHER_TIMEOUT'] * 2)
+            if pending.error:
+                raise pending.error
+            if pending.forecast is None:
+                raise WeatherError('Timed out waiting for the weather service')
+            return pending.forecast
+
+        try:
+            fetched_at, forecast = self._load(key)
+            if not self._fresh(fetched_at):
+                fetched_at, forecast = datetime.utcnow(), self._fetch(key)
+                self._store(key, fetched_at, forecast)
+            pending.forecast = forecast
+            with self._lock:
+                self._remember(key, fetched_at, forecast)
+            return forecast
+        except WeatherError as e:
+            pending.error = e
+            raise
+        except Exception as e:
+            logging.error(f"Error fetching weather for {key}: {e}")
+            pending.error = WeatherError('Weather service unavailable')
+            raise pending.error
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def _load(self, key):
+        row = Weather.query.filter_by(location=key).first()
+        if row is None or row.forecast is None:
+            return None, None
+        return row.fetched_at, json.loads(row.forecast)
+
+    def _fetch(self, key):
+        if not self.app.config['WEATHER_API_KEY']:
+            raise NotConfigured('Weather service is not configured')
+        params = {'q': key, 'units': 'metric', 'appid': self.app.config['WEATHER_API_KEY']}
+        try:
+            response = self.session.get(self.app.config['WEATHER_API_URL'], params=params,
+                                        timeout=self.app.config['WEATHER_TIMEOUT'])
+        except requests.RequestException as e:
+            logging.error(f"Weather API request failed: {e}")
+            raise WeatherError('Weather service unavailable')
+        if response.status_code == 404:
+            raise LocationNotFound('Location not found')
+        if response.status_code != 200:
+            logging.error(f"Weather API response: {response.status_code}, {response.text[:200]}")
+            raise WeatherError('Weather service unavailable')
+        return response.json()
+
+    def _store(self, key, fetched_at, forecast):
+        row = Weather.query.filter_by(location=key).first() or Weather(location=key)
+        entries = forecast.get('list') or [{}]
+        row.condition = ((entries[0].get('weather') or [{}])[0].get('description') or '')[:200]
+        row.date = fetched_at.date()
+        row.forecast = json.dumps(forecast)
+        row.fetched_at = fetched_at
+        db.session.add(row)
+        db.session.commit()
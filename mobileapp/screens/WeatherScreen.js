@@ -2,8 +2,10 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, TextInput, TouchableOpacity, StyleSheet, Alert, FlatList, ImageBackground, Dimensions, Image } from 'react-native';
 import { LinearGradient } from 'expo-linear-gradient';
 import axios from 'axios';
+import AsyncStorage from '@react-native-async-storage/async-storage';
 
 const { width } = Dimensions.get('window');
+const API_BASE_URL = 'https://your-ngrok-url.ngrok.io'; // Replace with your backend's IP and port
 
 const WeatherScreen = () => {
   const [location, setLocation] = useState('');
@@ -16,10 +18,10 @@ const WeatherScreen = () => {
     }
 
     try {
-      const apiKey = 'b1802b5931225a2a600cedba20993147';
-      const url = `https://api.openweathermap.org/data/2.5/forecast?q=${location.trim()}&units=metric&appid=${apiKey}`;
-
-      const response = await axios.get(url);
+      // The backend proxies OpenWeatherMap and caches forecasts per location
+      const token = await AsyncStorage.getItem('token');
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = await axios.get(`${API_BASE_URL}/weather`, { headers, params: { location: location.trim() } });
 
       if (!response.data.list || response.data.list.length === 0) {
         Alert.alert('Error', 'No weather data available for this location.');
@@ -43,7 +45,7 @@ const WeatherScreen = () => {
     } catch (error) {
       if (error.response) {
         if (error.response.status === 401) {
-          Alert.alert('Error', 'Invalid API key. Please check your API key.');
+          Alert.alert('Error', 'Your session has expired. Please log in again.');
         } else if (error.response.status === 404) {
           Alert.alert('Error', 'Location not found. Please enter a valid location.');
         } else {